@@ -14,7 +14,7 @@ from app.database import db_pool
 from app.dal.stored_procedures import sp
 from app.config import settings
 from app.utils.logger import logger
-from app.utils.exceptions import AuthenticationError, BusinessError
+from app.utils.exceptions import AuthenticationError, BusinessError, ServiceUnavailableError
 
 router = APIRouter()
 
@@ -25,7 +25,7 @@ async def register(request: RegisterRequest):
     用户注册
     """
     try:
-        with db_pool.get_cursor(commit=True) as cursor:
+        async with db_pool.acquire(commit=True) as cursor:
             # 使用请求中的角色，如果未提供则默认为学生
             role = request.role if request.role else "学生"
             
@@ -33,8 +33,8 @@ async def register(request: RegisterRequest):
             if role not in ["学生", "教师"]:
                 role = "学生"
             
-            user_id, message = sp.sp_add_user(
-                cursor,
+            user_id, message = await cursor.run(
+                sp.sp_add_user,
                 request.username,
                 request.name,
                 request.password,
@@ -69,7 +69,7 @@ async def login(request: LoginRequest):
     - **password**: 密码
     """
     try:
-        with db_pool.get_cursor() as cursor:
+        async with db_pool.acquire() as cursor:
             # 查询用户
             sql = """
                 SELECT u.`用户ID`, u.`学号_工号`, u.`姓名`, u.`密码哈希`, 
@@ -78,8 +78,8 @@ async def login(request: LoginRequest):
                 JOIN `院系信息表` d ON u.`院系ID` = d.`院系ID`
                 WHERE u.`学号_工号` = %s
             """
-            cursor.execute(sql, (request.username,))
-            user = cursor.fetchone()
+            await cursor.execute(sql, (request.username,))
+            user = await cursor.fetchone()
             
             if not user:
                 raise AuthenticationError("用户名不存在")
@@ -144,7 +144,7 @@ async def login(request: LoginRequest):
                 data=token_response
             )
             
-    except AuthenticationError:
+    except (AuthenticationError, ServiceUnavailableError):
         raise
     except Exception as e:
         logger.error(f"登录失败: {str(e)}")
@@ -170,7 +170,7 @@ async def refresh_token(request: RefreshTokenRequest):
     user_id = payload.get("user_id")
     
     try:
-        with db_pool.get_cursor() as cursor:
+        async with db_pool.acquire() as cursor:
             # 重新获取用户信息
             sql = """
                 SELECT u.`用户ID`, u.`学号_工号`, u.`姓名`, 
@@ -179,8 +179,8 @@ async def refresh_token(request: RefreshTokenRequest):
                 JOIN `院系信息表` d ON u.`院系ID` = d.`院系ID`
                 WHERE u.`用户ID` = %s
             """
-            cursor.execute(sql, (user_id,))
-            user = cursor.fetchone()
+            await cursor.execute(sql, (user_id,))
+            user = await cursor.fetchone()
             
             if not user:
                 raise AuthenticationError("用户不存在")
@@ -219,6 +219,8 @@ async def refresh_token(request: RefreshTokenRequest):
                 data=token_response
             )
             
+    except ServiceUnavailableError:
+        raise
     except Exception as e:
         logger.error(f"刷新令牌失败: {str(e)}")
         raise AuthenticationError("刷新令牌失败")
@@ -237,9 +239,9 @@ async def change_password(
     - **new_password**: 新密码（至少6位）
     """
     try:
-        with db_pool.get_cursor(commit=True) as cursor:
-            message = sp.sp_change_password(
-                cursor,
+        async with db_pool.acquire(commit=True) as cursor:
+            message = await cursor.run(
+                sp.sp_change_password,
                 user_id,
                 request.old_password,
                 request.new_password
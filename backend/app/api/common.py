@@ -17,10 +17,10 @@ async def get_departments():
     获取所有院系列表
     """
     try:
-        with db_pool.get_cursor() as cursor:
+        async with db_pool.acquire(readonly=True) as cursor:
             sql = "SELECT `院系ID`, `院系名称` FROM `院系信息表` ORDER BY `院系ID`"
-            cursor.execute(sql)
-            results = cursor.fetchall()
+            await cursor.execute(sql)
+            results = await cursor.fetchall()
             
             departments = [
                 DepartmentResponse(
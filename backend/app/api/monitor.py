@@ -0,0 +1,67 @@
+"""
+运行监控 API 路由
+"""
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.models.common import ResponseModel
+from app.database import db_pool
+from app.utils.metrics import metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    导出全部指标（Prometheus 文本格式）
+    """
+    return PlainTextResponse(metrics.render_prometheus())
+
+
+@router.get("/pool", response_model=ResponseModel[dict])
+async def get_pool_stats():
+    """
+    查询数据库连接池状态
+
+    按分区返回使用中/空闲连接数、等待请求数、耗尽次数以及获取连接、持有连接的延迟分位数
+    """
+    return ResponseModel(
+        success=True,
+        code=200,
+        message="连接池状态",
+        data={
+            "stats": db_pool.stats(),
+            "metrics": metrics.snapshot(prefix="db_pool_")
+        }
+    )
+
+
+@router.get("/procedures", response_model=ResponseModel[dict])
+async def get_procedure_stats():
+    """
+    查询各存储过程的调用耗时、返回行数和错误次数
+
+    耗时分位数按直方图分桶上界估算
+    """
+    data = {}
+    for name, entries in metrics.snapshot(prefix="dal_call_seconds").items():
+        for entry in entries:
+            histogram = metrics.histogram(name, labels=entry["labels"])
+            data[entry["labels"]["procedure"]] = {
+                "calls": entry["value"]["count"],
+                "mean_ms": entry["value"]["mean"] * 1000,
+                "p50_ms": histogram.quantile(0.5) * 1000,
+                "p95_ms": histogram.quantile(0.95) * 1000,
+                "p99_ms": histogram.quantile(0.99) * 1000,
+                "max_ms": entry["value"]["max"] * 1000,
+            }
+    return ResponseModel(
+        success=True,
+        code=200,
+        message="存储过程调用统计",
+        data={
+            "procedures": data,
+            "metrics": metrics.snapshot(prefix="dal_")
+        }
+    )
@@ -22,9 +22,9 @@ async def get_enrollment_statistics(
     调用存储过程 sp_get_enrollment_statistics
     """
     try:
-        with db_pool.get_cursor() as cursor:
+        async with db_pool.acquire(readonly=True) as cursor:
             # 调用存储过程
-            stats = sp.sp_get_enrollment_statistics(cursor, semester_id)
+            stats = await cursor.run(sp.sp_get_enrollment_statistics, semester_id)
             
             # 转换为响应格式
             stats_list = [
@@ -61,49 +61,49 @@ async def get_system_overview():
     获取系统概览统计
     """
     try:
-        with db_pool.get_cursor() as cursor:
+        async with db_pool.acquire(readonly=True) as cursor:
             # 统计各类数据
             overview = {}
             
             # 院系数量
-            cursor.execute("SELECT COUNT(*) as count FROM `院系信息表`")
-            overview['departments'] = cursor.fetchone()['count']
+            await cursor.execute("SELECT COUNT(*) as count FROM `院系信息表`")
+            overview['departments'] = (await cursor.fetchone())['count']
             
             # 用户统计
-            cursor.execute("""
+            await cursor.execute("""
                 SELECT `角色`, COUNT(*) as count 
                 FROM `用户信息表` 
                 GROUP BY `角色`
             """)
-            users = cursor.fetchall()
+            users = await cursor.fetchall()
             overview['users'] = {u['角色']: u['count'] for u in users}
             
             # 课程数量
-            cursor.execute("SELECT COUNT(*) as count FROM `课程信息表`")
-            overview['courses'] = cursor.fetchone()['count']
+            await cursor.execute("SELECT COUNT(*) as count FROM `课程信息表`")
+            overview['courses'] = (await cursor.fetchone())['count']
             
             # 教室数量
-            cursor.execute("SELECT COUNT(*) as count FROM `教室信息表`")
-            overview['classrooms'] = cursor.fetchone()['count']
+            await cursor.execute("SELECT COUNT(*) as count FROM `教室信息表`")
+            overview['classrooms'] = (await cursor.fetchone())['count']
             
             # 当前学期开课数量
-            cursor.execute("""
+            await cursor.execute("""
                 SELECT COUNT(*) as count 
                 FROM `开课实例表` oi
                 JOIN `学期信息表` s ON oi.`学期ID` = s.`学期ID`
                 WHERE s.`是否当前学期` = TRUE
             """)
-            overview['current_instances'] = cursor.fetchone()['count']
+            overview['current_instances'] = (await cursor.fetchone())['count']
             
             # 当前学期选课总数
-            cursor.execute("""
+            await cursor.execute("""
                 SELECT COUNT(*) as count 
                 FROM `选课记录表` sc
                 JOIN `开课实例表` oi ON sc.`开课实例ID` = oi.`开课实例ID`
                 JOIN `学期信息表` s ON oi.`学期ID` = s.`学期ID`
                 WHERE s.`是否当前学期` = TRUE
             """)
-            overview['current_enrollments'] = cursor.fetchone()['count']
+            overview['current_enrollments'] = (await cursor.fetchone())['count']
             
             return ResponseModel(
                 success=True,
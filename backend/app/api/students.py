@@ -1,20 +1,37 @@
 """
 学生 API 路由
 """
-from fastapi import APIRouter, Path, Query
-from typing import List
+from fastapi import APIRouter, Depends, Header, Path, Query, Response
+from typing import List, Optional
 
 from app.models.common import ResponseModel
 from app.models.enrollment import (
-    EnrollRequest, DropRequest, AvailableCourse, StudentSchedule
+    EnrollRequest, DropRequest, SwapRequest, AvailableCourse, StudentSchedule,
+    BatchEnrollRequest, BatchEnrollItem, BatchEnrollResult,
+    WaitlistRequest, WaitlistJoinResult, WaitlistEntry, IntentRequest, IntentEntry
 )
-from app.database import db_pool
+from app.database import db_pool, db_partition
 from app.dal.stored_procedures import sp
+from app.services.batch_enroll import ALL_OR_NOTHING, ROLLED_BACK, enroll_planned, find_conflicts
+from app.services.enroll_dispatcher import enroll_dispatcher
+from app.services.idempotency import idempotency_store
+from app.services.seat_cache import seat_cache
+from app.services.timetable import timetable_cache
+from app.services.waitlist import waitlist_promoter
 from app.utils.logger import logger
-from app.utils.exceptions import BusinessError
+from app.utils.exceptions import BusinessError, ValidationError
 
 router = APIRouter()
 
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+def idempotency_key(
+    key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=64,
+                                description="客户端生成的唯一键（如 UUID），超时重试时保持不变")
+) -> Optional[str]:
+    return key
+
 
 @router.get("/{student_id}/available-courses", 
            response_model=ResponseModel[List[AvailableCourse]])
@@ -27,138 +44,140 @@ async def get_available_courses(
     调用存储过程 sp_get_available_courses
     """
     try:
-        # 增加重试机制
-        max_retries = 3
-        last_error = None
-        
-        for attempt in range(max_retries):
-            try:
-                with db_pool.get_cursor() as cursor:
-                    # 调用存储过程
-                    courses = sp.sp_get_available_courses(cursor, student_id)
-                    
-                    # 获取附加信息（教师和时间段）
-                    teachers_map = {}
-                    slots_map = {}
-                    
-                    if courses:
-                        instance_ids = [str(c['开课实例ID']) for c in courses]
-                        ids_str = ",".join(instance_ids)
-                        
-                        # 获取教师信息
-                        cursor.execute(f"""
-                            SELECT t.`开课实例ID`, u.`姓名`
-                            FROM `授课关系表` t
-                            JOIN `用户信息表` u ON t.`教师ID` = u.`用户ID`
-                            WHERE t.`开课实例ID` IN ({ids_str})
-                        """)
-                        for row in cursor.fetchall():
-                            iid = row['开课实例ID']
-                            if iid not in teachers_map:
-                                teachers_map[iid] = []
-                            teachers_map[iid].append({"name": row['姓名']})
-                            
-                        # 获取时间段信息
-                        cursor.execute(f"""
-                            SELECT t.`开课实例ID`, ts.`星期`, ts.`开始时间`, ts.`结束时间`
-                            FROM `上课时间表` t
-                            JOIN `时间段信息表` ts ON t.`时间段ID` = ts.`时间段ID`
-                            WHERE t.`开课实例ID` IN ({ids_str})
-                        """)
-                        for row in cursor.fetchall():
-                            iid = row['开课实例ID']
-                            if iid not in slots_map:
-                                slots_map[iid] = []
-                            
-                            slots_map[iid].append({
-                                "day_of_week": row['星期'],
-                                "start_time": str(row['开始时间']),
-                                "end_time": str(row['结束时间'])
-                            })
-
-                    # 转换为响应模型
-                    course_list = [
-                        AvailableCourse(
-                            instance_id=c['开课实例ID'],
-                            course_id=c['课程ID'],
-                            course_name=c['课程名称'],
-                            credit=float(c['学分']),
-                            department=c['开课院系'],
-                            building=c['教学楼'],
-                            room=c['房间号'],
-                            remaining_quota=c['剩余名额'],
-                            # 兼容旧版存储过程，如果缺少总名额字段则默认为0
-                            total_quota=c.get('总名额', 0),
-                            enroll_type=c['选课类型'],
-                            teachers=teachers_map.get(c['开课实例ID'], []),
-                            time_slots=slots_map.get(c['开课实例ID'], [])
-                        )
-                        for c in courses
-                    ]
-                    
-                    return ResponseModel(
-                        success=True,
-                        code=200,
-                        message=f"查询到 {len(course_list)} 门可选课程",
-                        data=course_list
-                    )
-            except Exception as e:
-                last_error = e
-                error_str = str(e)
-                # 检查是否是连接错误 (2006: Gone away, 2013: Lost connection)
-                if '2006' in error_str or '2013' in error_str or 'Lost connection' in error_str:
-                    if attempt < max_retries - 1:
-                        logger.warning(f"数据库连接中断，重试查询可选课程 {attempt + 1}/{max_retries}")
-                        continue
-                raise last_error
+        async def _query(cursor):
+            # 调用存储过程
+            courses = await cursor.run(sp.sp_get_available_courses, student_id)
+
+            # 获取附加信息（教师和时间段）
+            teachers_map = {}
+            slots_map = {}
+
+            if courses:
+                instance_ids = [str(c['开课实例ID']) for c in courses]
+                ids_str = ",".join(instance_ids)
+
+                # 获取教师信息
+                await cursor.execute(f"""
+                    SELECT t.`开课实例ID`, u.`姓名`
+                    FROM `授课关系表` t
+                    JOIN `用户信息表` u ON t.`教师ID` = u.`用户ID`
+                    WHERE t.`开课实例ID` IN ({ids_str})
+                """)
+                for row in await cursor.fetchall():
+                    iid = row['开课实例ID']
+                    if iid not in teachers_map:
+                        teachers_map[iid] = []
+                    teachers_map[iid].append({"name": row['姓名']})
+
+                # 获取时间段信息
+                await cursor.execute(f"""
+                    SELECT t.`开课实例ID`, ts.`星期`, ts.`开始时间`, ts.`结束时间`
+                    FROM `上课时间表` t
+                    JOIN `时间段信息表` ts ON t.`时间段ID` = ts.`时间段ID`
+                    WHERE t.`开课实例ID` IN ({ids_str})
+                """)
+                for row in await cursor.fetchall():
+                    iid = row['开课实例ID']
+                    if iid not in slots_map:
+                        slots_map[iid] = []
+
+                    slots_map[iid].append({
+                        "day_of_week": row['星期'],
+                        "start_time": str(row['开始时间']),
+                        "end_time": str(row['结束时间'])
+                    })
+
+            # 转换为响应模型
+            course_list = [
+                AvailableCourse(
+                    instance_id=c['开课实例ID'],
+                    course_id=c['课程ID'],
+                    course_name=c['课程名称'],
+                    credit=float(c['学分']),
+                    department=c['开课院系'],
+                    building=c['教学楼'],
+                    room=c['房间号'],
+                    remaining_quota=c['剩余名额'],
+                    # 兼容旧版存储过程，如果缺少总名额字段则默认为0
+                    total_quota=c.get('总名额', 0),
+                    enroll_type=c['选课类型'],
+                    teachers=teachers_map.get(c['开课实例ID'], []),
+                    time_slots=slots_map.get(c['开课实例ID'], [])
+                )
+                for c in courses
+            ]
+
+            return course_list
+        
+        # 只读查询，连接中断等错误由 run_transaction 统一退避重试
+        course_list = await db_pool.run_transaction(
+            _query, operation="available_courses",
+            readonly=True, consistency_key=f"student:{student_id}"
+        )
+        
+        return ResponseModel(
+            success=True,
+            code=200,
+            message=f"查询到 {len(course_list)} 门可选课程",
+            data=course_list
+        )
             
     except Exception as e:
         logger.error(f"查询可选课程失败: {str(e)}")
         raise
 
 
-@router.post("/{student_id}/enroll", response_model=ResponseModel[None])
+@router.post("/{student_id}/enroll", response_model=ResponseModel[None],
+             dependencies=[Depends(db_partition("enroll"))])
 async def enroll_course(
     request: EnrollRequest,
-    student_id: int = Path(..., description="学生ID", gt=0)
+    response: Response,
+    student_id: int = Path(..., description="学生ID", gt=0),
+    key: Optional[str] = Depends(idempotency_key)
 ):
     """
     学生选课
     
-    调用存储过程 sp_student_enroll
+    经选课分发器按开课实例排队、批量调用 sp_enroll_core（分发器关闭时直接调用 sp_student_enroll）
     
     触发器会自动检查：
     - 名额限制（对内/对外）
     - 时间冲突
     - 选课时间窗口
     - 重复选课
+    
+    带 Idempotency-Key 请求头重试时直接返回第一次的结果（响应头 Idempotent-Replayed: true）
     """
+    async def _enroll() -> str:
+        # 名额肯定已满时直接拒绝，不访问数据库
+        full_message = seat_cache.check(student_id, request.instance_id)
+        if full_message:
+            raise BusinessError(full_message)
+        
+        # 同一开课实例的选课串行写入；并发死锁、连接中断时按 enroll 策略退避重试
+        try:
+            message = await enroll_dispatcher.submit(student_id, request.instance_id)
+        except BusinessError as e:
+            seat_cache.on_rejected(student_id, request.instance_id, e.message)
+            raise
+        seat_cache.on_enrolled(student_id, request.instance_id)
+        
+        logger.info(f"学生 {student_id} 选课成功: 开课实例 {request.instance_id}")
+        return message
+
     try:
-        with db_pool.get_cursor(commit=True) as cursor:
-            # 调用存储过程（带重试机制处理并发死锁）
-            max_retries = 3
-            for attempt in range(max_retries):
-                try:
-                    message = sp.sp_student_enroll(cursor, student_id, request.instance_id)
-                    
-                    logger.info(f"学生 {student_id} 选课成功: 开课实例 {request.instance_id}")
-                    
-                    return ResponseModel(
-                        success=True,
-                        code=200,
-                        message=message,
-                        data=None
-                    )
-                    
-                except Exception as e:
-                    error_str = str(e)
-                    # 检查是否是死锁错误或连接错误
-                    if '1213' in error_str or 'Deadlock' in error_str or \
-                       '2006' in error_str or '2013' in error_str or 'Lost connection' in error_str:
-                        if attempt < max_retries - 1:
-                            logger.warning(f"数据库操作异常(死锁或连接中断)，重试 {attempt + 1}/{max_retries}")
-                            continue
-                    raise
+        message, replayed = await idempotency_store.run(
+            f"enroll:{student_id}", key, str(request.instance_id), _enroll
+        )
+        if replayed:
+            response.headers[REPLAYED_HEADER] = "true"
+        
+        return ResponseModel(
+            success=True,
+            code=200,
+            message=message,
+            data=None
+        )
             
     except BusinessError:
         raise
@@ -167,33 +186,423 @@ async def enroll_course(
         raise
 
 
-@router.post("/{student_id}/drop", response_model=ResponseModel[None])
+@router.post("/{student_id}/enroll/batch", response_model=ResponseModel[BatchEnrollResult],
+             dependencies=[Depends(db_partition("enroll"))])
+async def enroll_batch_courses(
+    request: BatchEnrollRequest,
+    student_id: int = Path(..., description="学生ID", gt=0)
+):
+    """
+    批量选课（一次提交整张计划课表）
+    
+    先在内存中检查所选课程之间的时间冲突和名额缓存，再在一个事务中依次调用 sp_enroll_core：
+    - best_effort：每门课单独回滚，返回每门课的结果
+    - all_or_nothing：任意一门失败则全部不选
+    """
+    instance_ids = request.instance_ids
+    if len(set(instance_ids)) != len(instance_ids):
+        raise ValidationError("开课实例ID不能重复")
+    
+    try:
+        # 内存预检：同批次时间冲突、名额肯定已满
+        try:
+            bitmaps = await timetable_cache.bitmaps()
+        except Exception as e:
+            logger.warning(f"加载课表时间位图失败，时间冲突交给数据库检查: {str(e)}")
+            bitmaps = {}
+        rejected = find_conflicts(instance_ids, bitmaps)
+        for instance_id in instance_ids:
+            full_message = seat_cache.check(student_id, instance_id)
+            if full_message and instance_id not in rejected:
+                rejected[instance_id] = full_message
+        
+        if rejected and request.mode == ALL_OR_NOTHING:
+            outcomes = {i: BusinessError(rejected.get(i, ROLLED_BACK)) for i in instance_ids}
+        else:
+            pending = [i for i in instance_ids if i not in rejected]
+            outcomes = {i: BusinessError(message) for i, message in rejected.items()}
+            if pending:
+                async def _enroll(cursor):
+                    return await cursor.run(enroll_planned, student_id, pending, request.mode)
+                
+                results = await db_pool.run_transaction(
+                    _enroll, operation="enroll", commit=True,
+                    consistency_key=f"student:{student_id}"
+                )
+                outcomes.update(zip(pending, results))
+        
+        items = []
+        for instance_id in instance_ids:
+            outcome = outcomes[instance_id]
+            if isinstance(outcome, Exception):
+                message = getattr(outcome, "message", str(outcome))
+                seat_cache.on_rejected(student_id, instance_id, message)
+                items.append(BatchEnrollItem(instance_id=instance_id, success=False, message=message))
+            else:
+                seat_cache.on_enrolled(student_id, instance_id)
+                items.append(BatchEnrollItem(instance_id=instance_id, success=True, message=outcome))
+        
+        enrolled = sum(item.success for item in items)
+        logger.info(f"学生 {student_id} 批量选课({request.mode}): "
+                    f"成功 {enrolled} 门，失败 {len(items) - enrolled} 门")
+        
+        return ResponseModel(
+            success=True,
+            code=200,
+            message=f"批量选课完成: 成功 {enrolled} 门，失败 {len(items) - enrolled} 门",
+            data=BatchEnrollResult(
+                mode=request.mode, enrolled=enrolled, failed=len(items) - enrolled, items=items
+            )
+        )
+    
+    except BusinessError:
+        raise
+    except Exception as e:
+        logger.error(f"批量选课失败: {str(e)}")
+        raise
+
+
+@router.post("/{student_id}/drop", response_model=ResponseModel[None],
+             dependencies=[Depends(db_partition("enroll"))])
 async def drop_course(
     request: DropRequest,
-    student_id: int = Path(..., description="学生ID", gt=0)
+    response: Response,
+    student_id: int = Path(..., description="学生ID", gt=0),
+    key: Optional[str] = Depends(idempotency_key)
 ):
     """
     学生退课
     
-    调用存储过程 sp_student_drop
+    调用存储过程 sp_student_drop；带 Idempotency-Key 请求头重试时直接返回第一次的结果
     """
+    async def _drop_once() -> str:
+        async def _drop(cursor):
+            return await cursor.run(sp.sp_student_drop, student_id, request.instance_id)
+        
+        message = await db_pool.run_transaction(
+            _drop, operation="drop", commit=True,
+            consistency_key=f"student:{student_id}"
+        )
+        seat_cache.on_dropped(student_id, request.instance_id)
+        # 释放的名额优先补给候补队列中的学生
+        waitlist_promoter.notify(request.instance_id)
+        
+        logger.info(f"学生 {student_id} 退课成功: 开课实例 {request.instance_id}")
+        return message
+
     try:
-        with db_pool.get_cursor(commit=True) as cursor:
-            message = sp.sp_student_drop(cursor, student_id, request.instance_id)
-            
-            logger.info(f"学生 {student_id} 退课成功: 开课实例 {request.instance_id}")
+        message, replayed = await idempotency_store.run(
+            f"drop:{student_id}", key, str(request.instance_id), _drop_once
+        )
+        if replayed:
+            response.headers[REPLAYED_HEADER] = "true"
+        
+        return ResponseModel(
+            success=True,
+            code=200,
+            message=message,
+            data=None
+        )
             
-            return ResponseModel(
-                success=True,
-                code=200,
-                message=message,
-                data=None
+    except BusinessError:
+        raise
+    except Exception as e:
+        logger.error(f"退课失败: {str(e)}")
+        raise
+
+
+@router.post("/{student_id}/swap", response_model=ResponseModel[None],
+             dependencies=[Depends(db_partition("enroll"))])
+async def swap_course(
+    request: SwapRequest,
+    response: Response,
+    student_id: int = Path(..., description="学生ID", gt=0),
+    key: Optional[str] = Depends(idempotency_key)
+):
+    """
+    学生换课
+    
+    调用存储过程 sp_student_swap，在一个事务内退选原课程并选修新课程：
+    时间冲突检查不包含被退选的课程；新课程选课失败时整体回滚，原课程保留。
+    带 Idempotency-Key 请求头重试时直接返回第一次的结果
+    """
+    async def _swap_once() -> str:
+        # 新课程名额肯定已满时直接拒绝
+        full_message = seat_cache.check(student_id, request.to_instance_id)
+        if full_message:
+            raise BusinessError(full_message.replace("选课失败", "换课失败"))
+        
+        async def _swap(cursor):
+            return await cursor.run(sp.sp_student_swap, student_id,
+                                    request.from_instance_id, request.to_instance_id)
+        
+        try:
+            message = await db_pool.run_transaction(
+                _swap, operation="enroll", commit=True,
+                consistency_key=f"student:{student_id}"
             )
+        except BusinessError as e:
+            seat_cache.on_rejected(student_id, request.to_instance_id, e.message)
+            raise
+        seat_cache.on_dropped(student_id, request.from_instance_id)
+        seat_cache.on_enrolled(student_id, request.to_instance_id)
+        waitlist_promoter.notify(request.from_instance_id)
+        
+        logger.info(f"学生 {student_id} 换课成功: 开课实例 "
+                    f"{request.from_instance_id} -> {request.to_instance_id}")
+        return message
+
+    try:
+        message, replayed = await idempotency_store.run(
+            f"swap:{student_id}", key,
+            f"{request.from_instance_id}->{request.to_instance_id}", _swap_once
+        )
+        if replayed:
+            response.headers[REPLAYED_HEADER] = "true"
+        
+        return ResponseModel(
+            success=True,
+            code=200,
+            message=message,
+            data=None
+        )
             
     except BusinessError:
         raise
     except Exception as e:
-        logger.error(f"退课失败: {str(e)}")
+        logger.error(f"换课失败: {str(e)}")
+        raise
+
+
+@router.post("/{student_id}/waitlist", response_model=ResponseModel[WaitlistJoinResult],
+             dependencies=[Depends(db_partition("enroll"))])
+async def join_waitlist(
+    request: WaitlistRequest,
+    student_id: int = Path(..., description="学生ID", gt=0)
+):
+    """
+    加入候补队列
+    
+    调用存储过程 sp_waitlist_join。只有学生所属类别（对内/对外）名额已满时才能候补，
+    有人退课后按加入顺序自动补选，无需反复请求选课接口。重复提交返回当前位次。
+    """
+    try:
+        async def _join(cursor):
+            return await cursor.run(sp.sp_waitlist_join, student_id, request.instance_id)
+        
+        position, message = await db_pool.run_transaction(
+            _join, operation="waitlist_join", commit=True,
+            consistency_key=f"student:{student_id}"
+        )
+        
+        logger.info(f"学生 {student_id} 加入候补: 开课实例 {request.instance_id}, 位次 {position}")
+        
+        return ResponseModel(
+            success=True,
+            code=200,
+            message=message,
+            data=WaitlistJoinResult(instance_id=request.instance_id, position=position)
+        )
+    
+    except BusinessError:
+        raise
+    except Exception as e:
+        logger.error(f"加入候补队列失败: {str(e)}")
+        raise
+
+
+@router.get("/{student_id}/waitlist", response_model=ResponseModel[List[WaitlistEntry]])
+async def get_waitlist(
+    student_id: int = Path(..., description="学生ID", gt=0)
+):
+    """查询学生的候补记录（等待中的记录包含当前位次）"""
+    try:
+        async with db_pool.acquire(readonly=True, consistency_key=f"student:{student_id}") as cursor:
+            await cursor.execute("""
+                SELECT w.`开课实例ID`, c.`课程ID`, c.`课程名称`, w.`名额类型`, w.`状态`,
+                       w.`加入时间`, w.`处理时间`, w.`备注`,
+                       CASE WHEN w.`状态` = '等待' THEN (
+                           SELECT COUNT(*) FROM `候补队列表` q
+                           WHERE q.`开课实例ID` = w.`开课实例ID` AND q.`名额类型` = w.`名额类型`
+                             AND q.`状态` = '等待' AND q.`候补ID` <= w.`候补ID`
+                       ) END AS `位次`
+                FROM `候补队列表` w
+                JOIN `开课实例表` oi ON w.`开课实例ID` = oi.`开课实例ID`
+                JOIN `课程信息表` c ON oi.`课程ID` = c.`课程ID`
+                WHERE w.`学生ID` = %s
+                ORDER BY w.`候补ID` DESC
+            """, (student_id,))
+            rows = await cursor.fetchall()
+        
+        entries = [
+            WaitlistEntry(
+                instance_id=row['开课实例ID'],
+                course_id=row['课程ID'],
+                course_name=row['课程名称'],
+                quota_type=row['名额类型'],
+                status=row['状态'],
+                position=row['位次'],
+                joined_at=row['加入时间'],
+                processed_at=row['处理时间'],
+                note=row['备注']
+            )
+            for row in rows
+        ]
+        
+        return ResponseModel(
+            success=True,
+            code=200,
+            message=f"查询到 {len(entries)} 条候补记录",
+            data=entries
+        )
+    
+    except Exception as e:
+        logger.error(f"查询候补记录失败: {str(e)}")
+        raise
+
+
+@router.delete("/{student_id}/waitlist/{instance_id}", response_model=ResponseModel[None],
+               dependencies=[Depends(db_partition("enroll"))])
+async def leave_waitlist(
+    student_id: int = Path(..., description="学生ID", gt=0),
+    instance_id: int = Path(..., description="开课实例ID", gt=0)
+):
+    """退出候补队列（调用存储过程 sp_waitlist_leave）"""
+    try:
+        async def _leave(cursor):
+            return await cursor.run(sp.sp_waitlist_leave, student_id, instance_id)
+        
+        message = await db_pool.run_transaction(
+            _leave, operation="waitlist_leave", commit=True,
+            consistency_key=f"student:{student_id}"
+        )
+        
+        return ResponseModel(success=True, code=200, message=message, data=None)
+    
+    except BusinessError:
+        raise
+    except Exception as e:
+        logger.error(f"退出候补队列失败: {str(e)}")
+        raise
+
+
+@router.put("/{student_id}/intents", response_model=ResponseModel[None],
+            dependencies=[Depends(db_partition("enroll"))])
+async def submit_intents(
+    request: IntentRequest,
+    student_id: int = Path(..., description="学生ID", gt=0)
+):
+    """
+    提交选课意向（抽签选课学期）
+    
+    按志愿顺序提交本学期想选的开课实例，重复提交会覆盖该学期尚未分配的意向。
+    选课时间结束后由教务统一抽签分配，结果见 GET /{student_id}/intents。
+    """
+    instance_ids = request.instance_ids
+    if len(set(instance_ids)) != len(instance_ids):
+        raise ValidationError("开课实例ID不能重复")
+    
+    async def _submit(cursor):
+        placeholders = ", ".join(["%s"] * len(instance_ids))
+        await cursor.execute(f"""
+            SELECT oi.`开课实例ID`, oi.`学期ID`, s.`选课模式`,
+                   (s.`选课开始时间` IS NULL OR NOW() BETWEEN s.`选课开始时间` AND s.`选课结束时间`) AS `在选课时间内`
+            FROM `开课实例表` oi
+            JOIN `学期信息表` s ON oi.`学期ID` = s.`学期ID`
+            WHERE oi.`开课实例ID` IN ({placeholders})
+        """, instance_ids)
+        rows = await cursor.fetchall()
+        
+        missing = set(instance_ids) - {row['开课实例ID'] for row in rows}
+        if missing:
+            raise BusinessError(f"提交失败: 开课实例ID {sorted(missing)} 不存在")
+        semesters = {row['学期ID'] for row in rows}
+        if len(semesters) > 1:
+            raise BusinessError("提交失败: 选课意向只能包含同一学期的开课实例")
+        if rows[0]['选课模式'] != '抽签':
+            raise BusinessError("提交失败: 本学期为先到先得选课，请直接选课")
+        if not rows[0]['在选课时间内']:
+            raise BusinessError("提交失败: 不在选课时间窗口内")
+        semester_id = semesters.pop()
+        
+        await cursor.execute(
+            "SELECT 1 FROM `用户信息表` WHERE `用户ID` = %s AND `角色` = '学生'", (student_id,)
+        )
+        if not await cursor.fetchone():
+            raise BusinessError(f"提交失败: 学生ID {student_id} 不存在")
+        
+        # 覆盖本学期尚未分配的意向
+        await cursor.execute("""
+            DELETE w FROM `选课意向表` w
+            JOIN `开课实例表` oi ON w.`开课实例ID` = oi.`开课实例ID`
+            WHERE w.`学生ID` = %s AND oi.`学期ID` = %s AND w.`状态` = '待分配'
+        """, (student_id, semester_id))
+        await cursor.executemany(
+            "INSERT INTO `选课意向表` (`学生ID`, `开课实例ID`, `志愿序号`) VALUES (%s, %s, %s)",
+            [(student_id, instance_id, rank) for rank, instance_id in enumerate(instance_ids, 1)]
+        )
+    
+    try:
+        await db_pool.run_transaction(
+            _submit, operation="intents", commit=True,
+            consistency_key=f"student:{student_id}"
+        )
+        logger.info(f"学生 {student_id} 提交选课意向: {instance_ids}")
+        
+        return ResponseModel(
+            success=True,
+            code=200,
+            message=f"✅ 已提交 {len(instance_ids)} 个选课意向，选课结束后统一抽签",
+            data=None
+        )
+    
+    except BusinessError:
+        raise
+    except Exception as e:
+        logger.error(f"提交选课意向失败: {str(e)}")
+        raise
+
+
+@router.get("/{student_id}/intents", response_model=ResponseModel[List[IntentEntry]])
+async def get_intents(
+    student_id: int = Path(..., description="学生ID", gt=0)
+):
+    """查询学生的选课意向及抽签结果"""
+    try:
+        async with db_pool.acquire(readonly=True, consistency_key=f"student:{student_id}") as cursor:
+            await cursor.execute("""
+                SELECT w.`开课实例ID`, c.`课程ID`, c.`课程名称`, oi.`学期ID`,
+                       w.`志愿序号`, w.`状态`, w.`提交时间`
+                FROM `选课意向表` w
+                JOIN `开课实例表` oi ON w.`开课实例ID` = oi.`开课实例ID`
+                JOIN `课程信息表` c ON oi.`课程ID` = c.`课程ID`
+                WHERE w.`学生ID` = %s
+                ORDER BY oi.`学期ID` DESC, w.`志愿序号`
+            """, (student_id,))
+            rows = await cursor.fetchall()
+        
+        entries = [
+            IntentEntry(
+                instance_id=row['开课实例ID'],
+                course_id=row['课程ID'],
+                course_name=row['课程名称'],
+                semester_id=row['学期ID'],
+                rank=row['志愿序号'],
+                status=row['状态'],
+                submitted_at=row['提交时间']
+            )
+            for row in rows
+        ]
+        
+        return ResponseModel(
+            success=True,
+            code=200,
+            message=f"查询到 {len(entries)} 个选课意向",
+            data=entries
+        )
+    
+    except Exception as e:
+        logger.error(f"查询选课意向失败: {str(e)}")
         raise
 
 
@@ -209,9 +618,9 @@ async def get_student_schedule(
     调用存储过程 sp_get_student_schedule
     """
     try:
-        with db_pool.get_cursor() as cursor:
+        async with db_pool.acquire(readonly=True, consistency_key=f"student:{student_id}") as cursor:
             # 调用存储过程
-            schedule = sp.sp_get_student_schedule(cursor, student_id, semester_id)
+            schedule = await cursor.run(sp.sp_get_student_schedule, student_id, semester_id)
             
             # 转换为响应模型
             schedule_list = [
@@ -29,14 +29,101 @@ class Settings(BaseSettings):
     
     # 连接池配置
     DB_POOL_MIN_SIZE: int = 5
-    DB_POOL_MAX_SIZE: int = 20
-    DB_POOL_MAX_IDLE: int = 300  # 秒
+    DB_POOL_MAX_SIZE: int = 20  # 每个工作进程连接主库的总连接数（含下面各分区），工作进程数 × 该值需小于 max_connections
+    DB_POOL_MAX_IDLE: int = 300  # 秒，空闲连接超过该时长且多于最小连接数时由保活任务关闭
+    DB_POOL_VALIDATE_IDLE: int = 30  # 秒，借出时只 ping 空闲超过该时长的连接
+    DB_POOL_KEEPALIVE_INTERVAL: int = 60  # 秒，后台保活周期，0 表示关闭
+    DB_EXECUTOR_EXTRA_THREADS: int = 4  # 数据库线程池在连接数之外额外保留的线程数
+    DB_POOL_WAIT_WARN_MS: int = 500  # 等待连接超过该时长（毫秒）时记录告警日志
+    DB_POOL_WARMUP: bool = True  # 启动时创建连接池并预先建立最小连接数
+    DB_POOL_WARMUP_TIMEOUT: float = 30.0  # 秒，启动预热的最长等待时间
+    DB_POOL_WARMUP_RETRY_MAX_DELAY: float = 30.0  # 秒，启动预热未完成时后台重试预热的最大间隔（从 1 秒开始翻倍）
+    
+    # 准入控制与熔断
+    DB_POOL_MAX_WAIT: float = 5.0  # 秒，等待连接的最长时间，超时返回 503
+    DB_POOL_MAX_QUEUE: int = 200  # 等待连接的最大请求数，超出直接返回 503
+    DB_POOL_LOW_PRIORITY_RATIO: float = 0.7  # 负载（使用中+等待）达到连接数的该比例时拒绝低优先级请求
+    DB_POOL_RETRY_AFTER: int = 2  # 秒，过载时 Retry-After 响应头的建议值
+    DB_CIRCUIT_FAILURE_THRESHOLD: int = 5  # 连续获取连接失败次数达到该值时熔断，0 表示关闭
+    DB_CIRCUIT_RESET_TIMEOUT: int = 10  # 秒，熔断后的冷却时间
+    
+    # 重试策略（死锁、锁等待超时、连接中断），选课/退课等操作的专用策略见 app/utils/retry.py
+    DB_RETRY_MAX_ATTEMPTS: int = 3  # 最多执行次数（含首次）
+    DB_RETRY_BASE_DELAY: float = 0.05  # 秒，指数退避基数，实际等待带随机抖动
+    DB_RETRY_MAX_DELAY: float = 1.0  # 秒，单次退避上限
+    DB_RETRY_BUDGET_RATIO: float = 0.2  # 重试预算：每次调用最多平均产生多少次重试
+    
+    # 连接池分区（舱壁隔离），连接数从 DB_POOL_MAX_SIZE 中划出，默认连接池使用剩余的连接；
+    # 连接数为 0 表示不单独建池、使用默认连接池
+    DB_POOL_ENROLL_SIZE: int = 8  # 选课/退课写入
+    DB_POOL_ENROLL_MAX_WAIT: float = 5.0
+    DB_POOL_READ_SIZE: int = 5  # 学生可选课程、课表查询
+    DB_POOL_READ_MAX_WAIT: float = 3.0
+    DB_POOL_REPORT_SIZE: int = 2  # 统计报表与管理后台
+    DB_POOL_REPORT_MAX_WAIT: float = 2.0
+    
+    # 只读副本（读写分离），为空表示不启用
+    DB_REPLICA_HOSTS: List[str] = []  # ["host" 或 "host:port"]，账号密码与主库相同
+    DB_REPLICA_POOL_SIZE: int = 8  # 每个副本的最大连接数
+    DB_REPLICA_MAX_WAIT: float = 1.0  # 秒，副本连接等待超时，超时回退主库
+    DB_REPLICA_MAX_LAG: int = 5  # 秒，复制延迟超过该值时只读查询回退主库
+    DB_REPLICA_LAG_CHECK_INTERVAL: int = 5  # 秒，复制延迟检查周期
+    DB_READ_YOUR_WRITES_WINDOW: int = 10  # 秒，写入后同一用户的只读查询走主库的时长
     
     # 连接超时配置（秒）
     DB_CONNECT_TIMEOUT: int = 30  # 连接超时
     DB_READ_TIMEOUT: int = 30     # 读取超时
     DB_WRITE_TIMEOUT: int = 30    # 写入超时
     
+    # 存储过程调用方式：single 把 CALL 和读取 OUT 参数合并为一次往返（需开启多语句），classic 使用 callproc
+    DB_SP_CALL_MODE: str = "single"
+    DB_SP_SLOW_MS: int = 200  # 存储过程调用超过该耗时（毫秒）时记录慢调用日志，0 表示关闭
+    
+    # 选课分发器：按开课实例分片串行写入、批量提交，分片数为 0 表示关闭（直接调用 sp_student_enroll）
+    ENROLL_DISPATCH_SHARDS: int = 8
+    ENROLL_DISPATCH_BATCH_SIZE: int = 32  # 每个事务最多包含的选课请求数
+    ENROLL_DISPATCH_BATCH_WAIT_MS: float = 2.0  # 凑批最多额外等待的时间（毫秒）
+    ENROLL_DISPATCH_QUEUE_SIZE: int = 1000  # 每个分片的排队上限，超出返回 503
+    
+    # 剩余名额缓存：名额肯定已满的选课请求直接拒绝，不访问数据库
+    SEAT_CACHE_ENABLED: bool = True
+    SEAT_CACHE_REFRESH_INTERVAL: float = 2.0  # 秒，与开课实例表对账的间隔
+    SEAT_CACHE_MAX_AGE: float = 10.0  # 秒，超过该时间未对账成功则不使用缓存
+    SEAT_CACHE_STUDENT_REFRESH_INTERVAL: float = 300.0  # 秒，学生院系信息的刷新间隔
+    
+    # 候补队列：有人退课后自动为等待中的学生补选
+    WAITLIST_ENABLED: bool = True
+    WAITLIST_POLL_INTERVAL: float = 5.0  # 秒，扫描其他途径释放名额的间隔
+
+    # 幂等键：选课/退课请求带 Idempotency-Key 时，重试直接返回第一次的结果
+    IDEMPOTENCY_TTL: float = 86400.0  # 秒，结果保存时间
+    IDEMPOTENCY_MAX_ENTRIES: int = 200000  # 内存中最多保存的结果数
+    IDEMPOTENCY_PERSIST: bool = False  # 是否同时写入幂等记录表（多进程部署、重启后仍可重放）
+
+    # 抽签选课分配
+    LOTTERY_WORKERS: int = 4  # 抽签进程数，0 表示在应用进程中执行
+    LOTTERY_INSERT_BATCH: int = 2000  # 批量写入选课记录时每条 INSERT 的行数
+
+    # 选课排队：当前学期选课开始后的一段时间内，按排队号限速放行选课/可选课程请求
+    WAITING_ROOM_ENABLED: bool = True
+    WAITING_ROOM_RATE: float = 200.0  # 每秒放行的排队号数
+    WAITING_ROOM_BURST: int = 500  # 选课开始时立即放行的排队号数
+    WAITING_ROOM_DURATION: float = 900.0  # 秒，选课开始后排队持续的时间（不超过选课结束时间）
+    WAITING_ROOM_SHARED: bool = False  # 多进程部署时通过共享内存发放排队号（仅 Linux/macOS）
+    WAITING_ROOM_REFRESH_INTERVAL: float = 30.0  # 秒，重新读取学期选课时间的间隔
+    
+    # 课表时间位图缓存（冲突检查）
+    TIMETABLE_CACHE_TTL: float = 60.0  # 秒，缓存的有效期
+    
+    # 慢查询捕获
+    DB_SLOW_QUERY_MS: int = 500  # 单条 SQL 超过该耗时（毫秒）时记录，0 表示关闭
+    DB_SLOW_QUERY_EXPLAIN: bool = True  # 是否在独立连接上执行 EXPLAIN FORMAT=JSON
+    DB_SLOW_QUERY_EXPLAIN_INTERVAL: int = 300  # 秒，同一条归一化 SQL 的 EXPLAIN 间隔
+    DB_SLOW_QUERY_QUEUE_SIZE: int = 1000  # 待处理慢查询的最大数量，超出丢弃
+    DB_SLOW_QUERY_LOG: str = "logs/slow_query.log"
+    DB_SLOW_QUERY_LOG_ROTATION: str = "20 MB"
+    DB_SLOW_QUERY_LOG_RETENTION: int = 10  # 保留的历史文件个数
+    
     # TLS/SSL 配置
     DB_USE_SSL: bool = False
     DB_SSL_CA_PATH: str = ""
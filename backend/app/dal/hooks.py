@@ -0,0 +1,129 @@
+"""
+DAL 调用钩子
+在每次存储过程调用前后计时，把调用记录分发给已注册的钩子
+
+默认注册两个钩子：
+- metrics_hook  : 按存储过程名记录耗时、返回行数、错误数直方图/计数器
+- slow_call_hook: 耗时超过 DB_SP_SLOW_MS 时记录慢调用日志（只记录参数类型，不记录参数值）
+"""
+import functools
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from app.config import settings
+from app.utils.logger import logger
+from app.utils.metrics import metrics
+from app.utils.retry import current_attempt, mysql_error_code
+
+# 返回行数分桶
+ROW_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+@dataclass
+class CallRecord:
+    """一次 DAL 调用的记录"""
+    procedure: str
+    elapsed: float                      # 秒
+    rows: Optional[int]                 # 返回的结果行数（写操作为 None）
+    error: Optional[str]                # 异常类名，成功为 None
+    error_code: Optional[int]           # 异常链上的 MySQL 错误码
+    attempt: int                        # 第几次重试（首次为 0）
+    arg_shape: str                      # 参数类型，如 "(int, str, NoneType)"
+
+
+Hook = Callable[[CallRecord], None]
+
+_hooks: List[Hook] = []
+
+
+def register_hook(hook: Hook) -> Hook:
+    """注册钩子（可用作装饰器）"""
+    if hook not in _hooks:
+        _hooks.append(hook)
+    return hook
+
+
+def unregister_hook(hook: Hook):
+    if hook in _hooks:
+        _hooks.remove(hook)
+
+
+def _emit(record: CallRecord):
+    for hook in list(_hooks):
+        try:
+            hook(record)
+        except Exception as e:
+            # 钩子异常不能影响业务调用
+            logger.warning(f"DAL 钩子 {getattr(hook, '__name__', hook)} 执行失败: {str(e)}")
+
+
+def _arg_shape(args) -> str:
+    return "(" + ", ".join(type(arg).__name__ for arg in args) + ")"
+
+
+def _row_count(result) -> Optional[int]:
+    return len(result) if isinstance(result, list) else None
+
+
+def profiled(func: Callable) -> Callable:
+    """包装 DAL 方法 func(cursor, *args)，调用结束后分发 CallRecord"""
+    procedure = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(cursor, *args, **kwargs):
+        started = time.perf_counter()
+        result, error = None, None
+        try:
+            result = func(cursor, *args, **kwargs)
+            return result
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if _hooks:
+                _emit(CallRecord(
+                    procedure=procedure,
+                    elapsed=time.perf_counter() - started,
+                    rows=_row_count(result),
+                    error=type(error).__name__ if error is not None else None,
+                    error_code=mysql_error_code(error) if error is not None else None,
+                    attempt=current_attempt(),
+                    arg_shape=_arg_shape(list(args) + list(kwargs.values())),
+                ))
+    return wrapper
+
+
+def instrument(cls):
+    """类装饰器：为所有 sp_* 静态方法加上 profiled"""
+    for name, attr in list(vars(cls).items()):
+        if name.startswith("sp_") and isinstance(attr, staticmethod):
+            setattr(cls, name, staticmethod(profiled(attr.__func__)))
+    return cls
+
+
+# ---------- 默认钩子 ----------
+
+@register_hook
+def metrics_hook(record: CallRecord):
+    labels = {"procedure": record.procedure}
+    metrics.histogram("dal_call_seconds", "存储过程调用耗时", labels).observe(record.elapsed)
+    if record.rows is not None:
+        metrics.histogram("dal_call_rows", "存储过程返回行数", labels, ROW_BUCKETS).observe(record.rows)
+    if record.error is not None:
+        metrics.counter(
+            "dal_call_errors_total", "存储过程调用失败次数", {**labels, "error": record.error}).inc()
+    if record.attempt:
+        metrics.counter("dal_call_retried_total", "重试中发生的存储过程调用次数", labels).inc()
+
+
+@register_hook
+def slow_call_hook(record: CallRecord):
+    elapsed_ms = record.elapsed * 1000
+    if settings.DB_SP_SLOW_MS <= 0 or elapsed_ms < settings.DB_SP_SLOW_MS:
+        return
+    logger.warning(
+        f"慢存储过程调用: {record.procedure}{record.arg_shape} 耗时 {elapsed_ms:.0f}ms, "
+        f"返回行数 {record.rows}, 重试 {record.attempt}"
+        + (f", 错误 {record.error}({record.error_code})" if record.error else "")
+    )
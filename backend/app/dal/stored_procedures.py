@@ -1,15 +1,113 @@
 """
 存储过程调用封装
-直接调用数据库中已有的 14 个存储过程
+直接调用数据库中已有的存储过程
+
+PyMySQL 异常统一包装为 DatabaseError/BusinessError 并保留异常链（raise ... from e），
+上层的重试逻辑（app.utils.retry）据此识别死锁、连接中断等可重试错误。
+
+调用方式由 DB_SP_CALL_MODE 决定：
+- single : CALL 与读取 OUT 参数的 SELECT 合并为一个多语句请求，一次网络往返
+- classic: cursor.callproc()（SET 参数、CALL、SELECT OUT 参数，共三次往返）
+两种方式返回的 OUT 参数列名相同（@_过程名_序号），各方法的签名和返回值不变。
 """
 from typing import Tuple, Optional
 import pymysql
+from app.config import settings
 from app.utils.logger import logger
 from app.utils.exceptions import DatabaseError, BusinessError
+from app.dal.hooks import instrument
+
+# SIGNAL / RESIGNAL 抛出的用户自定义错误
+ER_SIGNAL_EXCEPTION = 1644
+
+
+def _single_round_trip() -> bool:
+    return settings.DB_SP_CALL_MODE == "single"
+
+
+def _call_with_out(cursor, name: str, args: tuple, out_count: int) -> Optional[dict]:
+    """
+    调用带 OUT 参数的存储过程（OUT 参数位于参数列表末尾），返回 OUT 参数组成的一行
+
+    Returns:
+        {'@_name_N': value, ...}；无法取得结果时返回 None
+    """
+    in_count = len(args) - out_count
+    out_vars = [f"@_{name}_{index}" for index in range(in_count, len(args))]
+    select_out = "SELECT " + ", ".join(out_vars)
+    
+    if not _single_round_trip():
+        cursor.callproc(name, args)
+        cursor.execute(select_out)
+        return cursor.fetchone()
+    
+    placeholders = ", ".join(["%s"] * in_count + out_vars)
+    cursor.execute(f"CALL `{name}`({placeholders}); {select_out}", args[:in_count])
+    # 跳过存储过程自身产生的结果集，找到 SELECT OUT 参数的结果
+    result = None
+    while True:
+        if cursor.description and cursor.description[0][0] == out_vars[0]:
+            result = cursor.fetchone()
+        if not cursor.nextset():
+            break
+    return result
+
 
+def _call_query(cursor, name: str, args: tuple) -> list:
+    """调用只返回结果集的存储过程"""
+    if not _single_round_trip():
+        cursor.callproc(name, args)
+        return cursor.fetchall()
+    placeholders = ", ".join(["%s"] * len(args))
+    cursor.execute(f"CALL `{name}`({placeholders})", args)
+    return cursor.fetchall()
 
+
+def _enroll(cursor, name: str, *ids: int, action: str = "选课") -> str:
+    """sp_student_enroll / sp_enroll_core / sp_student_swap 的公共调用与错误解析"""
+    try:
+        # 调用存储过程并获取输出参数
+        result = _call_with_out(cursor, name, (*ids, ''), 1)
+        
+        # 增加空值检查
+        if not result:
+            raise DatabaseError(f"{action}失败: 无法获取数据库返回结果")
+            
+        message = result.get(f'@_{name}_{len(ids)}')
+        
+        if message is None:
+            raise DatabaseError(f"{action}失败: 数据库响应异常，请重试")
+        
+        # 检查是否成功
+        if '失败' in message or 'ERROR' in message.upper():
+            raise BusinessError(message)
+        
+        return message
+        
+    except pymysql.Error as e:
+        error_msg = str(e)
+        logger.error(f"调用 {name} 失败: {error_msg}")
+        
+        # 解析触发器抛出的错误（SIGNAL SQLSTATE '45000' 的错误码为 1644）
+        if 'SIGNAL' in error_msg or '45000' in error_msg or e.args[:1] == (ER_SIGNAL_EXCEPTION,):
+            # 提取错误消息
+            if '名额已满' in error_msg:
+                raise BusinessError(f"{action}失败: 名额已满") from e
+            elif '时间冲突' in error_msg:
+                raise BusinessError(f"{action}失败: 上课时间冲突") from e
+            elif '已选过' in error_msg or '重复选课' in error_msg:
+                raise BusinessError(f"{action}失败: 已选过该课程") from e
+            elif '不在选课时间' in error_msg:
+                raise BusinessError(f"{action}失败: 不在选课时间窗口内") from e
+            else:
+                raise BusinessError(f"{action}失败: {error_msg}") from e
+        
+        raise DatabaseError(f"{action}操作失败: {error_msg}") from e
+
+
+@instrument
 class StoredProcedures:
-    """存储过程调用类"""
+    """存储过程调用类（每次调用的耗时、行数、错误由 app.dal.hooks 记录）"""
     
     @staticmethod
     def sp_add_department(cursor, name: str) -> Tuple[int, str]:
@@ -20,13 +118,11 @@ class StoredProcedures:
             (department_id, message)
         """
         try:
-            cursor.callproc('sp_add_department', (name, 0, ''))
-            cursor.execute('SELECT @_sp_add_department_1, @_sp_add_department_2')
-            result = cursor.fetchone()
+            result = _call_with_out(cursor, 'sp_add_department', (name, 0, ''), 2)
             return result['@_sp_add_department_1'], result['@_sp_add_department_2']
         except pymysql.Error as e:
             logger.error(f"调用 sp_add_department 失败: {e}")
-            raise DatabaseError(f"添加院系失败: {str(e)}")
+            raise DatabaseError(f"添加院系失败: {str(e)}") from e
     
     @staticmethod
     def sp_add_classroom(cursor, building: str, room: str, capacity: int) -> Tuple[int, str]:
@@ -37,13 +133,11 @@ class StoredProcedures:
             (classroom_id, message)
         """
         try:
-            cursor.callproc('sp_add_classroom', (building, room, capacity, 0, ''))
-            cursor.execute('SELECT @_sp_add_classroom_3, @_sp_add_classroom_4')
-            result = cursor.fetchone()
+            result = _call_with_out(cursor, 'sp_add_classroom', (building, room, capacity, 0, ''), 2)
             return result['@_sp_add_classroom_3'], result['@_sp_add_classroom_4']
         except pymysql.Error as e:
             logger.error(f"调用 sp_add_classroom 失败: {e}")
-            raise DatabaseError(f"添加教室失败: {str(e)}")
+            raise DatabaseError(f"添加教室失败: {str(e)}") from e
     
     @staticmethod
     def sp_add_course(cursor, course_id: str, name: str, credit: float, dept_id: int) -> str:
@@ -54,13 +148,11 @@ class StoredProcedures:
             message
         """
         try:
-            cursor.callproc('sp_add_course', (course_id, name, credit, dept_id, ''))
-            cursor.execute('SELECT @_sp_add_course_4')
-            result = cursor.fetchone()
+            result = _call_with_out(cursor, 'sp_add_course', (course_id, name, credit, dept_id, ''), 1)
             return result['@_sp_add_course_4']
         except pymysql.Error as e:
             logger.error(f"调用 sp_add_course 失败: {e}")
-            raise DatabaseError(f"添加课程失败: {str(e)}")
+            raise DatabaseError(f"添加课程失败: {str(e)}") from e
     
     @staticmethod
     def sp_add_user(cursor, username: str, name: str, password: str, 
@@ -72,13 +164,11 @@ class StoredProcedures:
             (user_id, message)
         """
         try:
-            cursor.callproc('sp_add_user', (username, name, password, role, dept_id, 0, ''))
-            cursor.execute('SELECT @_sp_add_user_5, @_sp_add_user_6')
-            result = cursor.fetchone()
+            result = _call_with_out(cursor, 'sp_add_user', (username, name, password, role, dept_id, 0, ''), 2)
             return result['@_sp_add_user_5'], result['@_sp_add_user_6']
         except pymysql.Error as e:
             logger.error(f"调用 sp_add_user 失败: {e}")
-            raise DatabaseError(f"添加用户失败: {str(e)}")
+            raise DatabaseError(f"添加用户失败: {str(e)}") from e
     
     @staticmethod
     def sp_create_course_instance(cursor, course_id: str, classroom_id: int, 
@@ -91,10 +181,8 @@ class StoredProcedures:
             (instance_id, message)
         """
         try:
-            cursor.callproc('sp_create_course_instance', 
-                          (course_id, classroom_id, semester_id, quota_inner, quota_outer, 0, ''))
-            cursor.execute('SELECT @_sp_create_course_instance_5, @_sp_create_course_instance_6')
-            result = cursor.fetchone()
+            result = _call_with_out(cursor, 'sp_create_course_instance', 
+                                    (course_id, classroom_id, semester_id, quota_inner, quota_outer, 0, ''), 2)
             instance_id = result['@_sp_create_course_instance_5']
             message = result['@_sp_create_course_instance_6']
             
@@ -105,7 +193,7 @@ class StoredProcedures:
             return instance_id, message
         except pymysql.Error as e:
             logger.error(f"调用 sp_create_course_instance 失败: {e}")
-            raise DatabaseError(f"创建开课实例失败: {str(e)}")
+            raise DatabaseError(f"创建开课实例失败: {str(e)}") from e
     
     @staticmethod
     def sp_assign_teacher(cursor, teacher_id: int, instance_id: int) -> str:
@@ -116,9 +204,7 @@ class StoredProcedures:
             message
         """
         try:
-            cursor.callproc('sp_assign_teacher', (teacher_id, instance_id, ''))
-            cursor.execute('SELECT @_sp_assign_teacher_2')
-            result = cursor.fetchone()
+            result = _call_with_out(cursor, 'sp_assign_teacher', (teacher_id, instance_id, ''), 1)
             message = result['@_sp_assign_teacher_2']
             
             if '失败' in message:
@@ -127,7 +213,7 @@ class StoredProcedures:
             return message
         except pymysql.Error as e:
             logger.error(f"调用 sp_assign_teacher 失败: {e}")
-            raise DatabaseError(f"分配教师失败: {str(e)}")
+            raise DatabaseError(f"分配教师失败: {str(e)}") from e
     
     @staticmethod
     def sp_add_schedule_time(cursor, instance_id: int, timeslot_id: int, 
@@ -140,10 +226,8 @@ class StoredProcedures:
             (schedule_id, message)
         """
         try:
-            cursor.callproc('sp_add_schedule_time', 
-                          (instance_id, timeslot_id, teacher_id, start_week, end_week, week_type, 0, ''))
-            cursor.execute('SELECT @_sp_add_schedule_time_6, @_sp_add_schedule_time_7')
-            result = cursor.fetchone()
+            result = _call_with_out(cursor, 'sp_add_schedule_time', 
+                                    (instance_id, timeslot_id, teacher_id, start_week, end_week, week_type, 0, ''), 2)
             schedule_id = result['@_sp_add_schedule_time_6']
             message = result['@_sp_add_schedule_time_7']
             
@@ -153,87 +237,130 @@ class StoredProcedures:
             return schedule_id, message
         except pymysql.Error as e:
             logger.error(f"调用 sp_add_schedule_time 失败: {e}")
-            raise DatabaseError(f"添加上课时间失败: {str(e)}")
+            raise DatabaseError(f"添加上课时间失败: {str(e)}") from e
     
     @staticmethod
     def sp_student_enroll(cursor, student_id: int, instance_id: int) -> str:
         """
         调用 sp_student_enroll 存储过程 - 学生选课
         
+        Returns:
+            message
+        """
+        return _enroll(cursor, 'sp_student_enroll', student_id, instance_id)
+    
+    @staticmethod
+    def sp_enroll_core(cursor, student_id: int, instance_id: int) -> str:
+        """
+        调用 sp_enroll_core 存储过程 - 选课核心逻辑（不提交事务，由调用方控制）
+        
+        Returns:
+            message
+        """
+        return _enroll(cursor, 'sp_enroll_core', student_id, instance_id)
+    
+    @staticmethod
+    def sp_student_drop(cursor, student_id: int, instance_id: int) -> str:
+        """
+        调用 sp_student_drop 存储过程 - 学生退课
+        
         Returns:
             message
         """
         try:
-            # 调用存储过程
-            cursor.callproc('sp_student_enroll', (student_id, instance_id, ''))
+            result = _call_with_out(cursor, 'sp_student_drop', (student_id, instance_id, ''), 1)
             
-            # 获取输出参数
-            cursor.execute('SELECT @_sp_student_enroll_2')
-            result = cursor.fetchone()
-            
-            # 增加空值检查
             if not result:
-                raise DatabaseError("选课失败: 无法获取数据库返回结果")
+                raise DatabaseError("退课失败: 无法获取数据库返回结果")
                 
-            message = result.get('@_sp_student_enroll_2')
+            message = result.get('@_sp_student_drop_2')
             
             if message is None:
-                raise DatabaseError("选课失败: 数据库响应异常，请重试")
+                raise DatabaseError("退课失败: 数据库响应异常，请重试")
             
-            # 检查是否成功
-            if '失败' in message or 'ERROR' in message.upper():
+            if '失败' in message:
                 raise BusinessError(message)
             
             return message
-            
         except pymysql.Error as e:
-            error_msg = str(e)
-            logger.error(f"调用 sp_student_enroll 失败: {error_msg}")
-            
-            # 解析触发器抛出的错误
-            if 'SIGNAL' in error_msg or '45000' in error_msg:
-                # 提取错误消息
-                if '名额已满' in error_msg:
-                    raise BusinessError("选课失败: 名额已满")
-                elif '时间冲突' in error_msg:
-                    raise BusinessError("选课失败: 上课时间冲突")
-                elif '已选过' in error_msg:
-                    raise BusinessError("选课失败: 已选过该课程")
-                elif '不在选课时间' in error_msg:
-                    raise BusinessError("选课失败: 不在选课时间窗口内")
-                else:
-                    raise BusinessError(f"选课失败: {error_msg}")
-            
-            raise DatabaseError(f"选课操作失败: {error_msg}")
+            logger.error(f"调用 sp_student_drop 失败: {e}")
+            raise DatabaseError(f"退课失败: {str(e)}") from e
     
     @staticmethod
-    def sp_student_drop(cursor, student_id: int, instance_id: int) -> str:
+    def sp_student_swap(cursor, student_id: int, from_instance_id: int, to_instance_id: int) -> str:
         """
-        调用 sp_student_drop 存储过程 - 学生退课
+        调用 sp_student_swap 存储过程 - 换课（同一事务内退选原课程并选修新课程）
+        
+        新课程选课失败时整个事务回滚，原课程保留
         
         Returns:
             message
         """
+        return _enroll(cursor, 'sp_student_swap', student_id, from_instance_id, to_instance_id,
+                       action="换课")
+    
+    @staticmethod
+    def sp_waitlist_join(cursor, student_id: int, instance_id: int) -> Tuple[int, str]:
+        """
+        调用 sp_waitlist_join 存储过程 - 加入候补队列
+        
+        Returns:
+            (position, message)
+        """
         try:
-            cursor.callproc('sp_student_drop', (student_id, instance_id, ''))
-            cursor.execute('SELECT @_sp_student_drop_2')
-            result = cursor.fetchone()
+            result = _call_with_out(cursor, 'sp_waitlist_join', (student_id, instance_id, 0, ''), 2)
             
             if not result:
-                raise DatabaseError("退课失败: 无法获取数据库返回结果")
-                
-            message = result.get('@_sp_student_drop_2')
+                raise DatabaseError("候补失败: 无法获取数据库返回结果")
+            
+            position = result.get('@_sp_waitlist_join_2')
+            message = result.get('@_sp_waitlist_join_3')
+            
+            if position is None or position == -1:
+                raise BusinessError(message or "候补失败")
+            
+            return position, message
+        except pymysql.Error as e:
+            logger.error(f"调用 sp_waitlist_join 失败: {e}")
+            raise DatabaseError(f"候补失败: {str(e)}") from e
+    
+    @staticmethod
+    def sp_waitlist_leave(cursor, student_id: int, instance_id: int) -> str:
+        """
+        调用 sp_waitlist_leave 存储过程 - 退出候补队列
+        
+        Returns:
+            message
+        """
+        try:
+            result = _call_with_out(cursor, 'sp_waitlist_leave', (student_id, instance_id, ''), 1)
+            message = result.get('@_sp_waitlist_leave_2') if result else None
             
             if message is None:
-                raise DatabaseError("退课失败: 数据库响应异常，请重试")
+                raise DatabaseError("取消候补失败: 数据库响应异常，请重试")
             
             if '失败' in message:
                 raise BusinessError(message)
             
             return message
         except pymysql.Error as e:
-            logger.error(f"调用 sp_student_drop 失败: {e}")
-            raise DatabaseError(f"退课失败: {str(e)}")
+            logger.error(f"调用 sp_waitlist_leave 失败: {e}")
+            raise DatabaseError(f"取消候补失败: {str(e)}") from e
+    
+    @staticmethod
+    def sp_waitlist_promote(cursor, instance_id: int) -> int:
+        """
+        调用 sp_waitlist_promote 存储过程 - 候补补选
+        
+        Returns:
+            本次录取人数
+        """
+        try:
+            result = _call_with_out(cursor, 'sp_waitlist_promote', (instance_id, 0), 1)
+            return int(result.get('@_sp_waitlist_promote_1') or 0) if result else 0
+        except pymysql.Error as e:
+            logger.error(f"调用 sp_waitlist_promote 失败: {e}")
+            raise DatabaseError(f"候补补选失败: {str(e)}") from e
     
     @staticmethod
     def sp_get_student_schedule(cursor, student_id: int, semester_id: int) -> list:
@@ -244,12 +371,11 @@ class StoredProcedures:
             课表列表
         """
         try:
-            cursor.callproc('sp_get_student_schedule', (student_id, semester_id))
-            results = cursor.fetchall()
+            results = _call_query(cursor, 'sp_get_student_schedule', (student_id, semester_id))
             return results
         except pymysql.Error as e:
             logger.error(f"调用 sp_get_student_schedule 失败: {e}")
-            raise DatabaseError(f"查询学生课表失败: {str(e)}")
+            raise DatabaseError(f"查询学生课表失败: {str(e)}") from e
     
     @staticmethod
     def sp_get_teacher_schedule(cursor, teacher_id: int, semester_id: int) -> list:
@@ -260,12 +386,11 @@ class StoredProcedures:
             课表列表
         """
         try:
-            cursor.callproc('sp_get_teacher_schedule', (teacher_id, semester_id))
-            results = cursor.fetchall()
+            results = _call_query(cursor, 'sp_get_teacher_schedule', (teacher_id, semester_id))
             return results
         except pymysql.Error as e:
             logger.error(f"调用 sp_get_teacher_schedule 失败: {e}")
-            raise DatabaseError(f"查询教师课表失败: {str(e)}")
+            raise DatabaseError(f"查询教师课表失败: {str(e)}") from e
     
     @staticmethod
     def sp_get_available_courses(cursor, student_id: int) -> list:
@@ -276,12 +401,11 @@ class StoredProcedures:
             可选课程列表
         """
         try:
-            cursor.callproc('sp_get_available_courses', (student_id,))
-            results = cursor.fetchall()
+            results = _call_query(cursor, 'sp_get_available_courses', (student_id,))
             return results if results is not None else []
         except pymysql.Error as e:
             logger.error(f"调用 sp_get_available_courses 失败: {e}")
-            raise DatabaseError(f"查询可选课程失败: {str(e)}")
+            raise DatabaseError(f"查询可选课程失败: {str(e)}") from e
     
     @staticmethod
     def sp_get_enrollment_statistics(cursor, semester_id: int) -> list:
@@ -292,12 +416,11 @@ class StoredProcedures:
             统计结果列表
         """
         try:
-            cursor.callproc('sp_get_enrollment_statistics', (semester_id,))
-            results = cursor.fetchall()
+            results = _call_query(cursor, 'sp_get_enrollment_statistics', (semester_id,))
             return results
         except pymysql.Error as e:
             logger.error(f"调用 sp_get_enrollment_statistics 失败: {e}")
-            raise DatabaseError(f"查询选课统计失败: {str(e)}")
+            raise DatabaseError(f"查询选课统计失败: {str(e)}") from e
     
     @staticmethod
     def sp_change_password(cursor, user_id: int, old_password: str, new_password: str) -> str:
@@ -313,9 +436,7 @@ class StoredProcedures:
             操作结果消息
         """
         try:
-            cursor.callproc('sp_change_password', (user_id, old_password, new_password, ''))
-            cursor.execute('SELECT @_sp_change_password_3')
-            result = cursor.fetchone()
+            result = _call_with_out(cursor, 'sp_change_password', (user_id, old_password, new_password, ''), 1)
             message = result['@_sp_change_password_3']
             
             if '失败' in message:
@@ -324,7 +445,7 @@ class StoredProcedures:
             return message
         except pymysql.Error as e:
             logger.error(f"调用 sp_change_password 失败: {e}")
-            raise DatabaseError(f"修改密码失败: {str(e)}")
+            raise DatabaseError(f"修改密码失败: {str(e)}") from e
 
 
 # 全局实例
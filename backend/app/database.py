@@ -1,108 +1,587 @@
 """
 数据库连接池管理
 使用 PyMySQL + DBUtils 连接华为云 TaurusDB
+
+同步接口 get_cursor() 供脚本和测试使用；异步接口 acquire() 把阻塞的
+PyMySQL 调用放到专用数据库线程池中执行，避免慢查询阻塞 uvicorn 事件循环。
+
+连接池按用途划分为多个分区（舱壁隔离）：选课写入、学生查询、统计/管理报表各自
+拥有独立的连接数、等待超时和线程池，报表查询再慢也占不到选课所需的连接。
+路由通过 db_partition() 依赖选择分区，全局 db_pool 按当前请求的分区转发。
+
+配置了只读副本（DB_REPLICA_HOSTS）时，acquire(readonly=True) 的查询发往副本；
+副本延迟超过 DB_REPLICA_MAX_LAG、不可用或调用方刚写入过同一数据（读己之写）时回退主库。
 """
+import asyncio
+import contextvars
+import functools
+import time
+import weakref
+import threading
 import pymysql
+from pymysql.constants import CLIENT
+from concurrent.futures import ThreadPoolExecutor
 from dbutils.pooled_db import PooledDB
-from contextlib import contextmanager
-from typing import Generator
+from contextlib import AsyncExitStack, contextmanager, asynccontextmanager, suppress
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Generator, List, Optional, TypeVar
 from app.config import settings
 from app.utils.logger import logger
+from app.utils.metrics import metrics, HOLD_BUCKETS
+from app.utils.circuit_breaker import CircuitBreaker
+from app.utils.exceptions import ServiceUnavailableError
+from app.utils.retry import retry_async, retry_sync
+from app.utils.slow_query import TimedCursor
+
+T = TypeVar("T")
+
+
+def ssl_config() -> Optional[dict]:
+    """SSL/TLS 配置"""
+    if settings.DB_USE_SSL and settings.DB_SSL_CA_PATH:
+        return {
+            'ca': settings.DB_SSL_CA_PATH,
+            'check_hostname': False,
+            'verify_mode': 2  # CERT_REQUIRED
+        }
+    return None
+
+
+class Priority:
+    """请求优先级：连接池紧张时先拒绝低优先级请求，保证选课流量"""
+    HIGH = 0    # 选课、退课
+    NORMAL = 1  # 默认
+    LOW = 2     # 统计报表、管理后台
+
+
+_request_priority: contextvars.ContextVar = contextvars.ContextVar(
+    "db_request_priority", default=Priority.NORMAL
+)
+
+
+def db_priority(priority: int):
+    """
+    FastAPI 依赖：设置当前请求的数据库访问优先级
+
+    Usage:
+        app.include_router(statistics.router, dependencies=[Depends(db_priority(Priority.LOW))])
+    """
+    async def _set_priority():
+        _request_priority.set(priority)
+    return _set_priority
+
+
+class AsyncCursor:
+    """
+    异步游标
+
+    包装 PyMySQL 游标，所有会产生网络 I/O 的方法都在数据库线程池中执行。
+    同一连接上的调用严格串行：每次只有一个调用在线程中运行。
+    """
+
+    def __init__(self, cursor, executor: ThreadPoolExecutor, connection=None):
+        self._cursor = cursor
+        self._executor = executor
+        self._connection = connection
+        self._pending = None
+
+    async def _call(self, func: Callable, *args, **kwargs) -> Any:
+        """在数据库线程池中执行阻塞调用（保留当前 contextvars 上下文）"""
+        ctx = contextvars.copy_context()
+        self._pending = self._executor.submit(
+            ctx.run, functools.partial(func, *args, **kwargs)
+        )
+        return await asyncio.wrap_future(self._pending)
+
+    async def wait_idle(self):
+        """等待仍在线程中运行的调用结束（请求被取消时使用）"""
+        if self._pending is not None and not self._pending.done():
+            with suppress(Exception):
+                await asyncio.wrap_future(self._pending)
+
+    @property
+    def raw(self):
+        """底层同步游标（仅限在 run() 的回调中使用）"""
+        return self._cursor
+
+    @property
+    def rowcount(self) -> int:
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self) -> Optional[int]:
+        return self._cursor.lastrowid
+
+    async def execute(self, sql: str, params=None) -> int:
+        return await self._call(self._cursor.execute, sql, params)
+
+    async def executemany(self, sql: str, seq_params) -> int:
+        return await self._call(self._cursor.executemany, sql, seq_params)
+
+    async def callproc(self, name: str, args=()):
+        return await self._call(self._cursor.callproc, name, args)
+
+    async def fetchone(self):
+        return await self._call(self._cursor.fetchone)
+
+    async def fetchmany(self, size: Optional[int] = None):
+        return await self._call(self._cursor.fetchmany, size)
+
+    async def fetchall(self):
+        return await self._call(self._cursor.fetchall)
+
+    async def nextset(self):
+        return await self._call(self._cursor.nextset)
+
+    async def commit(self):
+        """提交当前事务"""
+        await self._call(self._connection.commit)
+
+    async def rollback(self):
+        """回滚当前事务"""
+        await self._call(self._connection.rollback)
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        在数据库线程中以同步游标调用 func(cursor, *args, **kwargs)
+
+        用于复用同步 DAL，例如:
+            message = await cursor.run(sp.sp_student_enroll, student_id, instance_id)
+        """
+        return await self._call(func, self._cursor, *args, **kwargs)
+
+
+class PooledConnection:
+    """
+    连接代理
+
+    记录连接借出时间，close() 归还连接池时更新持有时长和使用中连接数指标。
+    其余属性全部转发给底层连接。
+    """
+
+    def __init__(self, owner: "DatabasePool", con):
+        self._owner = owner
+        self._con = con
+        self._checked_out_at = time.perf_counter()
+
+    def close(self):
+        if self._con is not None:
+            con, self._con = self._con, None
+            try:
+                self._owner._mark_returned(con)
+                con.close()
+            finally:
+                self._owner._on_checkin(time.perf_counter() - self._checked_out_at)
+
+    def __getattr__(self, name):
+        if self._con is None:
+            raise pymysql.err.InterfaceError("连接已归还连接池")
+        return getattr(self._con, name)
 
 
 class DatabasePool:
     """数据库连接池"""
     
-    def __init__(self):
+    def __init__(self, name: str = "default", max_size: Optional[int] = None,
+                 min_size: Optional[int] = None, max_wait: Optional[float] = None,
+                 host: Optional[str] = None, port: Optional[int] = None):
+        self.name = name
+        self.host = host or settings.DB_HOST
+        self.port = port or settings.DB_PORT
+        self.max_size = max_size or settings.DB_POOL_MAX_SIZE
+        self.min_size = min(settings.DB_POOL_MIN_SIZE if min_size is None else min_size,
+                            self.max_size)
+        self.max_wait = settings.DB_POOL_MAX_WAIT if max_wait is None else max_wait
         self._pool = None
-        self._init_attempted = False
-        # 不在初始化时立即连接，而是延迟到第一次使用
-        # self._init_pool()
+        self._init_lock = threading.Lock()
+        self.ready = False  # 连接池已创建并完成预热
+        self._in_use = 0
+        self._waiting = 0
+        self._stats_lock = threading.Lock()
+        # 同步调用方的连接配额（PooledDB 本身的阻塞等待无法设置超时）
+        self._slots = threading.BoundedSemaphore(self.max_size)
+        self._breaker = CircuitBreaker(
+            settings.DB_CIRCUIT_FAILURE_THRESHOLD, settings.DB_CIRCUIT_RESET_TIMEOUT
+        )
+        labels = {"pool": name}
+        self._m_checkout = metrics.histogram(
+            "db_pool_checkout_seconds", "获取连接耗时（含等待）", labels)
+        self._m_wait = metrics.histogram(
+            "db_pool_wait_seconds", "连接池耗尽时请求等待连接的耗时", labels)
+        self._m_held = metrics.histogram(
+            "db_pool_connection_held_seconds", "连接从借出到归还的持有时长", labels, HOLD_BUCKETS)
+        self._m_in_use = metrics.gauge("db_pool_connections_in_use", "已借出的连接数", labels)
+        self._m_idle = metrics.gauge("db_pool_connections_idle", "连接池中的空闲连接数", labels)
+        self._m_waiting = metrics.gauge("db_pool_waiters", "正在等待连接的请求数", labels)
+        self._m_exhausted = metrics.counter(
+            "db_pool_exhausted_total", "请求到达时连接池已耗尽、需要阻塞等待的次数", labels)
+        self._m_errors = metrics.counter("db_pool_checkout_errors_total", "获取连接失败次数", labels)
+        self._m_validations = metrics.counter(
+            "db_pool_validation_pings_total", "借出时因空闲过久而执行的 ping 次数", labels)
+        self._m_keepalive = metrics.counter(
+            "db_pool_keepalive_pings_total", "后台保活 ping 次数", labels)
+        self._m_pruned = metrics.counter(
+            "db_pool_pruned_total", "因空闲超过 DB_POOL_MAX_IDLE 被关闭的连接数", labels)
+        self._m_rejected = {
+            reason: metrics.counter(
+                "db_pool_rejected_total", "准入控制拒绝的请求数", {**labels, "reason": reason})
+            for reason in ("circuit_open", "queue_full", "shed_low_priority", "wait_timeout")
+        }
+        self._m_breaker_trips = metrics.counter("db_pool_circuit_trips_total", "熔断器打开次数", labels)
+        self._keepalive_task = None
+        # 阻塞的数据库调用统一在该线程池中执行，线程数与连接数匹配
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_size + settings.DB_EXECUTOR_EXTRA_THREADS,
+            thread_name_prefix=f"db-{name}"
+        )
+        # 每个事件循环一个信号量，限制同时持有/等待连接的协程数，
+        # 保证线程池中的线程不会因等待连接而全部阻塞
+        self._limiters = weakref.WeakKeyDictionary()
+        # 不在初始化时立即连接：应用启动时由 lifespan 调用 warmup() 预热，
+        # 脚本等场景在第一次使用时再创建
     
     def _init_pool(self):
         """初始化连接池"""
         try:
-            # SSL/TLS 配置
-            ssl_config = None
-            if settings.DB_USE_SSL and settings.DB_SSL_CA_PATH:
-                ssl_config = {
-                    'ca': settings.DB_SSL_CA_PATH,
-                    'check_hostname': False,
-                    'verify_mode': 2  # CERT_REQUIRED
-                }
+            # 存储过程单次往返调用需要在一个请求中发送 CALL 和 SELECT 两条语句
+            client_flag = CLIENT.MULTI_STATEMENTS if settings.DB_SP_CALL_MODE == "single" else 0
             
             # 创建连接池
             self._pool = PooledDB(
                 creator=pymysql,
-                maxconnections=settings.DB_POOL_MAX_SIZE,
-                mincached=settings.DB_POOL_MIN_SIZE,
-                maxcached=settings.DB_POOL_MAX_SIZE,
+                maxconnections=self.max_size,
+                mincached=0,  # 最小连接由 warmup() 并行建立，避免启动时逐个串行握手
+                maxcached=self.max_size,
                 maxshared=0,  # 不共享连接
                 blocking=True,  # 连接不够时阻塞等待
                 maxusage=None,  # 连接最大使用次数，None 表示无限制
                 setsession=[],
-                ping=7,  # 检查连接有效性：7=always (最强保活机制)
-                host=settings.DB_HOST,
-                port=settings.DB_PORT,
+                ping=0,  # 不在每次借出时 ping，由 _validate() 按空闲时长决定是否校验
+                host=self.host,
+                port=self.port,
                 user=settings.DB_USER,
                 password=settings.DB_PASSWORD,
                 database=settings.DB_NAME,
                 charset=settings.DB_CHARSET,
-                ssl=ssl_config,
-                cursorclass=pymysql.cursors.DictCursor,  # 返回字典格式
+                ssl=ssl_config(),
+                cursorclass=TimedCursor,  # 返回字典格式，并记录慢查询
                 autocommit=False,  # 手动控制事务
+                client_flag=client_flag,
                 # 新增超时和重连配置
                 connect_timeout=settings.DB_CONNECT_TIMEOUT,  # 连接超时
                 read_timeout=settings.DB_READ_TIMEOUT,        # 读取超时
                 write_timeout=settings.DB_WRITE_TIMEOUT,      # 写入超时
             )
             
-            logger.info(f"数据库连接池初始化成功: {settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}")
+            logger.info(
+                f"数据库连接池 {self.name} 初始化成功: "
+                f"{self.host}:{self.port}/{settings.DB_NAME} (最大连接数 {self.max_size})"
+            )
             
         except Exception as e:
             logger.error(f"数据库连接池初始化失败: {str(e)}")
             raise
     
     def _ensure_pool(self):
-        """确保连接池已初始化"""
-        if self._pool is None and not self._init_attempted:
-            self._init_attempted = True
-            self._init_pool()
+        """确保连接池已初始化（并发的首批请求只会创建一个连接池）"""
+        if self._pool is None:
+            with self._init_lock:
+                if self._pool is None:
+                    self._init_pool()
+                    self.ready = True
+    
+    def warmup(self):
+        """
+        创建连接池并并行建立 min_size 个连接放入空闲队列
+
+        连接建立（含 TLS 握手）在启动阶段完成，发布后的第一批请求不再承担建连延迟。
+        """
+        started = time.perf_counter()
+        with self._init_lock:
+            if self._pool is None:
+                self._init_pool()
+        
+        missing = self.min_size - self._idle_count() - self._in_use
+        if missing > 0:
+            with ThreadPoolExecutor(max_workers=missing, thread_name_prefix=f"db-warmup-{self.name}") as pool:
+                connections = list(pool.map(lambda _: self._pool.connection(), range(missing)))
+            for conn in connections:
+                self._mark_returned(conn)
+                conn.close()
+        
+        self.ready = True
+        self._m_idle.set(self._idle_count())
+        logger.info(
+            f"数据库连接池 {self.name} 预热完成: {self._idle_count()} 个空闲连接，"
+            f"耗时 {(time.perf_counter() - started) * 1000:.0f}ms"
+        )
     
     def get_connection(self):
-        """获取数据库连接（带重试机制）"""
+        """获取数据库连接（带准入控制和重试机制）"""
+        self._admit()
+        return self._checkout()
+    
+    def _checkout(self):
+        """在已通过准入检查的前提下借出连接，最多等待 max_wait 秒"""
         self._ensure_pool()
-        if not self._pool:
-            self._init_pool()
         
-        # 添加重试机制
-        max_retries = 3
-        retry_count = 0
-        last_error = None
+        started = time.perf_counter()
+        if not self._slots.acquire(blocking=False):
+            self._on_wait_start()
+            try:
+                acquired = self._slots.acquire(timeout=self.max_wait)
+            finally:
+                self._on_wait_end(time.perf_counter() - started)
+            if not acquired:
+                raise self._wait_timeout()
+        
+        try:
+            conn = self._connect_with_retry()
+        except Exception:
+            self._slots.release()
+            self._m_errors.inc()
+            if self._breaker.record_failure():
+                self._on_breaker_trip()
+            raise
+        
+        self._breaker.record_success()
+        self._on_checkout(time.perf_counter() - started)
+        return PooledConnection(self, conn)
+    
+    # ---------- 准入控制 ----------
+    
+    def _reject(self, reason: str, message: str, retry_after: int):
+        self._m_rejected[reason].inc()
+        return ServiceUnavailableError(
+            message, retry_after=retry_after,
+            details={"pool": self.name, "reason": reason}
+        )
+    
+    def _admit(self):
+        """
+        准入检查，不通过时抛出 ServiceUnavailableError（503 + Retry-After）
+
+        1. 熔断器打开时直接拒绝
+        2. 等待队列已满时直接拒绝
+        3. 连接池负载超过 DB_POOL_LOW_PRIORITY_RATIO 时拒绝低优先级请求
+        """
+        retry_after = self._breaker.allow()
+        if retry_after is not None:
+            raise self._reject("circuit_open", "数据库暂不可用，请稍后重试", retry_after)
+        if self._waiting >= settings.DB_POOL_MAX_QUEUE:
+            raise self._reject("queue_full", "系统繁忙，请稍后重试", settings.DB_POOL_RETRY_AFTER)
+        if _request_priority.get() >= Priority.LOW:
+            load = self._in_use + self._waiting
+            if load >= self.max_size * settings.DB_POOL_LOW_PRIORITY_RATIO:
+                raise self._reject(
+                    "shed_low_priority", "系统繁忙，统计与管理功能暂时不可用，请稍后重试",
+                    settings.DB_POOL_RETRY_AFTER
+                )
+    
+    def _wait_timeout(self) -> ServiceUnavailableError:
+        # 等待超时说明连接都在使用中（负载高），不代表数据库故障，不计入熔断；
+        # 熔断只统计建连/驱动错误，负载高峰由排队上限和低优先级拒绝处理
+        return self._reject(
+            "wait_timeout", f"等待数据库连接超时（{self.max_wait}秒）",
+            settings.DB_POOL_RETRY_AFTER
+        )
+    
+    def _on_breaker_trip(self):
+        self._m_breaker_trips.inc()
+        logger.error(
+            f"连接池 {self.name} 熔断：连续 {settings.DB_CIRCUIT_FAILURE_THRESHOLD} 次获取连接失败，"
+            f"{settings.DB_CIRCUIT_RESET_TIMEOUT} 秒内快速拒绝请求"
+        )
+    
+    def _connect_with_retry(self):
+        """从 PooledDB 取连接并校验；建连失败等可重试错误按 connect 策略退避重试"""
+        return retry_sync(self._connect, operation="connect")
+    
+    def _connect(self):
+        conn = self._pool.connection()
+        try:
+            # 仅对空闲过久的连接做有效性校验
+            self._validate(conn)
+        except Exception:
+            with suppress(Exception):
+                conn.close()
+            raise
+        return conn
+    
+    # ---------- 连接校验与保活 ----------
+    #
+    # 每个 SteadyDB 连接上记录两个时间戳（time.monotonic()）：
+    #   _last_used      最近一次归还连接池的时间，用于判断空闲时长
+    #   _last_validated 最近一次确认连接可用的时间（归还或 ping 成功）
+    # 借出时只有距离 _last_validated 超过 DB_POOL_VALIDATE_IDLE 的连接才需要 ping，
+    # 热路径上的连接不再产生额外往返。
+    
+    @staticmethod
+    def _steady(conn):
+        """取出 PooledDB 连接包装下的 SteadyDB 连接"""
+        return getattr(conn, "_con", None)
+    
+    def _validate(self, conn):
+        """借出前校验：空闲时长超过阈值才 ping（必要时自动重连）"""
+        steady = self._steady(conn)
+        last_validated = getattr(steady, "_last_validated", None)
+        if last_validated is None:
+            # 新建立的连接无需校验
+            return
+        if time.monotonic() - last_validated >= settings.DB_POOL_VALIDATE_IDLE:
+            conn.ping(reconnect=True)
+            steady._last_validated = time.monotonic()
+            self._m_validations.inc()
+    
+    @staticmethod
+    def _mark_returned(conn):
+        steady = getattr(conn, "_con", None)
+        if steady is not None:
+            now = time.monotonic()
+            steady._last_used = now
+            steady._last_validated = now
+    
+    def keepalive(self):
+        """
+        对空闲连接执行一轮保活
+
+        - 空闲超过 DB_POOL_MAX_IDLE 且空闲连接多于最小连接数时直接关闭
+        - 距上次校验超过 DB_POOL_KEEPALIVE_INTERVAL 的连接执行 ping
+        使用 DBUtils PooledDB 内部的 _idle_cache/_lock，每次只取出需要处理的连接，
+        处理期间其余空闲连接仍可被正常借出。
+        """
+        pool = self._pool
+        if pool is None:
+            return
+        now = time.monotonic()
+        to_ping, to_close = [], []
+        with pool._lock:
+            keep = []
+            idle = list(pool._idle_cache)
+            for steady in idle:
+                last_used = getattr(steady, "_last_used", now)
+                last_validated = getattr(steady, "_last_validated", now)
+                if (now - last_used >= settings.DB_POOL_MAX_IDLE
+                        and len(idle) - len(to_close) > self.min_size):
+                    to_close.append(steady)
+                elif now - last_validated >= settings.DB_POOL_KEEPALIVE_INTERVAL:
+                    to_ping.append(steady)
+                else:
+                    keep.append(steady)
+            pool._idle_cache[:] = keep
+        
+        for steady in to_close:
+            with suppress(Exception):
+                steady.close()
+            self._m_pruned.inc()
         
-        while retry_count < max_retries:
+        alive = []
+        for steady in to_ping:
             try:
-                conn = self._pool.connection()
-                # 测试连接是否有效
-                conn.ping(reconnect=True)
-                return conn
+                steady.ping(True)
+                steady._last_validated = time.monotonic()
+                self._m_keepalive.inc()
+                alive.append(steady)
             except Exception as e:
-                retry_count += 1
-                last_error = e
-                logger.warning(f"获取数据库连接失败 (尝试 {retry_count}/{max_retries}): {str(e)}")
-                
-                # 如果不是最后一次重试，重置连接池
-                if retry_count < max_retries:
-                    try:
-                        self._pool = None
-                        self._init_attempted = False
-                        self._ensure_pool()
-                    except Exception as init_error:
-                        logger.error(f"重新初始化连接池失败: {str(init_error)}")
+                logger.warning(f"连接池 {self.name} 保活 ping 失败，关闭连接: {str(e)}")
+                with suppress(Exception):
+                    steady.close()
         
-        # 所有重试都失败
-        logger.error(f"获取数据库连接失败，已重试 {max_retries} 次")
-        raise last_error
+        if alive:
+            with pool._lock:
+                pool._idle_cache.extend(alive)
+                pool._lock.notify()
+        self._m_idle.set(self._idle_count())
+    
+    async def _keepalive_loop(self):
+        while True:
+            await asyncio.sleep(settings.DB_POOL_KEEPALIVE_INTERVAL)
+            try:
+                await self.run_sync(self.keepalive)
+            except Exception as e:
+                logger.warning(f"连接池 {self.name} 保活失败: {str(e)}")
+    
+    def start_keepalive(self):
+        """启动后台保活任务（需在事件循环中调用）"""
+        if self._keepalive_task is None and settings.DB_POOL_KEEPALIVE_INTERVAL > 0:
+            self._keepalive_task = asyncio.get_running_loop().create_task(self._keepalive_loop())
+    
+    async def stop_keepalive(self):
+        """停止后台保活任务"""
+        task, self._keepalive_task = self._keepalive_task, None
+        if task is not None:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+    
+    # ---------- 指标 ----------
+    
+    def _idle_count(self) -> int:
+        return len(getattr(self._pool, "_idle_cache", None) or [])
+    
+    def _on_wait_start(self):
+        with self._stats_lock:
+            self._waiting += 1
+        self._m_exhausted.inc()
+        self._m_waiting.inc()
+    
+    def _on_wait_end(self, waited: float):
+        with self._stats_lock:
+            self._waiting -= 1
+        self._m_waiting.dec()
+        self._m_wait.observe(waited)
+        if waited * 1000 >= settings.DB_POOL_WAIT_WARN_MS:
+            logger.warning(
+                f"连接池 {self.name} 已耗尽，请求等待连接 {waited * 1000:.0f}ms "
+                f"(使用中 {self._in_use}/{self.max_size})"
+            )
+    
+    def _on_checkout(self, elapsed: float):
+        with self._stats_lock:
+            self._in_use += 1
+        self._m_checkout.observe(elapsed)
+        self._m_in_use.inc()
+        self._m_idle.set(self._idle_count())
+    
+    def _on_checkin(self, held: float):
+        with self._stats_lock:
+            self._in_use -= 1
+        self._slots.release()
+        self._m_held.observe(held)
+        self._m_in_use.dec()
+        self._m_idle.set(self._idle_count())
+    
+    def stats(self) -> dict:
+        """连接池当前状态及延迟分位数"""
+        return {
+            "pool": self.name,
+            "initialized": self._pool is not None,
+            "ready": self.ready,
+            "max_size": self.max_size,
+            "max_wait": self.max_wait,
+            "in_use": self._in_use,
+            "idle": self._idle_count(),
+            "waiting": self._waiting,
+            "exhausted_total": int(self._m_exhausted.value),
+            "checkout_errors_total": int(self._m_errors.value),
+            "circuit_state": self._breaker.state,
+            "rejected": {reason: int(c.value) for reason, c in self._m_rejected.items()},
+            "validation_pings_total": int(self._m_validations.value),
+            "keepalive_pings_total": int(self._m_keepalive.value),
+            "checkout_ms": {
+                "p50": self._m_checkout.quantile(0.5) * 1000,
+                "p95": self._m_checkout.quantile(0.95) * 1000,
+                "p99": self._m_checkout.quantile(0.99) * 1000,
+            },
+            "wait_ms": {
+                "p50": self._m_wait.quantile(0.5) * 1000,
+                "p99": self._m_wait.quantile(0.99) * 1000,
+                "max": self._m_wait.snapshot()["max"] * 1000,
+            },
+            "held_ms": {
+                "p50": self._m_held.quantile(0.5) * 1000,
+                "p99": self._m_held.quantile(0.99) * 1000,
+            },
+        }
     
     @contextmanager
     def get_cursor(self, commit: bool = False) -> Generator:
@@ -132,26 +611,521 @@ class DatabasePool:
             cursor.close()
             connection.close()
     
+    async def run_sync(self, func: Callable, *args, **kwargs) -> Any:
+        """在数据库线程池中执行任意阻塞函数"""
+        loop = asyncio.get_running_loop()
+        ctx = contextvars.copy_context()
+        return await loop.run_in_executor(
+            self._executor, ctx.run, functools.partial(func, *args, **kwargs)
+        )
+
+    def _limiter(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        limiter = self._limiters.get(loop)
+        if limiter is None:
+            limiter = asyncio.Semaphore(self.max_size)
+            self._limiters[loop] = limiter
+        return limiter
+
+    @asynccontextmanager
+    async def acquire(self, commit: bool = False) -> AsyncIterator[AsyncCursor]:
+        """
+        获取异步游标的上下文管理器
+
+        Args:
+            commit: 是否自动提交事务
+
+        Usage:
+            async with db_pool.acquire(commit=True) as cursor:
+                await cursor.execute("SELECT * FROM users")
+                results = await cursor.fetchall()
+        """
+        self._admit()
+        limiter = self._limiter()
+        started = time.perf_counter()
+        if limiter.locked():
+            self._on_wait_start()
+            try:
+                await asyncio.wait_for(limiter.acquire(), timeout=self.max_wait)
+            except asyncio.TimeoutError:
+                raise self._wait_timeout()
+            finally:
+                self._on_wait_end(time.perf_counter() - started)
+        else:
+            await limiter.acquire()
+        try:
+            connection = await self.run_sync(self._checkout)
+            cursor = AsyncCursor(connection.cursor(), self._executor, connection)
+
+            try:
+                yield cursor
+                if commit:
+                    await self.run_sync(connection.commit)
+            except BaseException as e:
+                await cursor.wait_idle()
+                with suppress(Exception):
+                    await self.run_sync(connection.rollback)
+                if isinstance(e, Exception):
+                    logger.error(f"数据库操作失败: {str(e)}")
+                raise
+            finally:
+                await cursor.wait_idle()
+                await self.run_sync(self._release, cursor.raw, connection)
+        finally:
+            limiter.release()
+
+    @staticmethod
+    def _release(cursor, connection):
+        """关闭游标并把连接归还连接池"""
+        try:
+            cursor.close()
+        finally:
+            connection.close()
+
     def close(self):
         """关闭连接池"""
         if self._pool:
             self._pool.close()
-            logger.info("数据库连接池已关闭")
+            logger.info(f"数据库连接池 {self.name} 已关闭")
+        self._executor.shutdown(wait=False)
+
+
+class ReplicaPool(DatabasePool):
+    """
+    只读副本连接池
+
+    后台定期查询复制延迟；延迟超过 DB_REPLICA_MAX_LAG、复制中断或查询失败时标记为不可用，
+    路由层随即把只读查询转回主库。
+    """
+
+    def __init__(self, name: str, host: str, port: int):
+        super().__init__(name, max_size=settings.DB_REPLICA_POOL_SIZE,
+                         max_wait=settings.DB_REPLICA_MAX_WAIT, host=host, port=port)
+        self.lag: Optional[float] = None
+        self._unavailable_until = 0.0
+        self._lag_task = None
+        self._m_lag = metrics.gauge(
+            "db_replica_lag_seconds", "只读副本复制延迟（-1 表示未知）", {"pool": name})
+        self._m_lag.set(-1)
+
+    @property
+    def available(self) -> bool:
+        return self.lag is not None and time.monotonic() >= self._unavailable_until
+
+    def mark_unavailable(self, reason: str):
+        """借连接失败等情况下暂时停用副本，等待下一次延迟检查恢复"""
+        self._unavailable_until = time.monotonic() + settings.DB_REPLICA_LAG_CHECK_INTERVAL
+        logger.warning(f"只读副本 {self.name} 暂停使用: {reason}")
+
+    def check_lag(self):
+        """查询复制延迟并更新可用状态（同步，在数据库线程中执行）"""
+        try:
+            with self.get_cursor() as cursor:
+                try:
+                    cursor.execute("SHOW REPLICA STATUS")
+                    row = cursor.fetchone()
+                    lag = row.get("Seconds_Behind_Source") if row else 0
+                except pymysql.MySQLError:
+                    # MySQL 8.0.22 之前的语法
+                    cursor.execute("SHOW SLAVE STATUS")
+                    row = cursor.fetchone()
+                    lag = row.get("Seconds_Behind_Master") if row else 0
+        except Exception as e:
+            self.lag = None
+            self._m_lag.set(-1)
+            self.mark_unavailable(f"延迟检查失败: {str(e)}")
+            return
+        # 没有复制状态（共享存储的只读节点）视为无延迟；复制线程停止时延迟为 NULL
+        self.lag = None if lag is None else float(lag)
+        self._m_lag.set(-1 if self.lag is None else self.lag)
+        if self.lag is None or self.lag > settings.DB_REPLICA_MAX_LAG:
+            self.mark_unavailable(f"复制延迟 {self.lag} 秒")
+        else:
+            self._unavailable_until = 0.0
+
+    async def _lag_loop(self):
+        while True:
+            try:
+                await self.run_sync(self.check_lag)
+            except Exception as e:
+                logger.warning(f"只读副本 {self.name} 延迟检查失败: {str(e)}")
+            await asyncio.sleep(settings.DB_REPLICA_LAG_CHECK_INTERVAL)
+
+    def start_keepalive(self):
+        super().start_keepalive()
+        if self._lag_task is None:
+            self._lag_task = asyncio.get_running_loop().create_task(self._lag_loop())
+
+    async def stop_keepalive(self):
+        await super().stop_keepalive()
+        task, self._lag_task = self._lag_task, None
+        if task is not None:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+
+    def stats(self) -> dict:
+        return {**super().stats(), "replica_lag": self.lag, "available": self.available}
+
+
+class PartitionedPool:
+    """
+    按分区路由的连接池
+
+    对外提供与 DatabasePool 相同的接口（acquire / get_cursor / get_connection / run_sync），
+    根据当前请求所属分区（见 db_partition）转发到对应的 DatabasePool。
+    未设置分区的调用（脚本、测试、未标注的路由）使用 default 分区。
+    """
+
+    DEFAULT = "default"
+
+    def __init__(self, pools: Dict[str, DatabasePool], replicas: Optional[List[ReplicaPool]] = None):
+        if self.DEFAULT not in pools:
+            raise ValueError("连接池分区必须包含 default")
+        self.pools = pools
+        self.replicas = replicas or []
+        self._next_replica = 0
+        # 读己之写：key -> 截止时间（monotonic），期间该 key 的只读查询走主库
+        self._pinned: Dict[str, float] = {}
+        self._pinned_lock = threading.Lock()
+        self._warmup_task: Optional[asyncio.Task] = None
+        self._m_reads = {
+            target: metrics.counter("db_readonly_queries_total", "只读查询路由次数", {"target": target})
+            for target in ("replica", "primary_pinned", "primary_fallback", "primary_no_replica")
+        }
+
+    def partition(self, name: Optional[str] = None) -> DatabasePool:
+        """按名称取分区；未配置（连接数为 0）的分区退回 default"""
+        return self.pools.get(name or _request_partition.get(), self.pools[self.DEFAULT])
+
+    @property
+    def current(self) -> DatabasePool:
+        return self.partition()
+
+    # ---------- 读写分离 ----------
+
+    def mark_written(self, key: str):
+        """记录一次写入：DB_READ_YOUR_WRITES_WINDOW 秒内该 key 的只读查询走主库"""
+        deadline = time.monotonic() + settings.DB_READ_YOUR_WRITES_WINDOW
+        with self._pinned_lock:
+            self._pinned[key] = deadline
+            if len(self._pinned) > 10000:
+                now = time.monotonic()
+                self._pinned = {k: v for k, v in self._pinned.items() if v > now}
+
+    def is_pinned(self, key: Optional[str]) -> bool:
+        if key is None:
+            return False
+        deadline = self._pinned.get(key)
+        return deadline is not None and deadline > time.monotonic()
+
+    def _pick_replica(self) -> Optional[ReplicaPool]:
+        """轮询选择一个可用副本"""
+        count = len(self.replicas)
+        for offset in range(count):
+            replica = self.replicas[(self._next_replica + offset) % count]
+            if replica.available:
+                self._next_replica = (self._next_replica + offset + 1) % count
+                return replica
+        return None
+
+    @asynccontextmanager
+    async def acquire(self, commit: bool = False, partition: Optional[str] = None,
+                      readonly: bool = False, consistency_key: Optional[str] = None
+                      ) -> AsyncIterator[AsyncCursor]:
+        """
+        获取异步游标
+
+        Args:
+            commit: 是否自动提交事务
+            partition: 连接池分区，默认使用当前请求的分区
+            readonly: 只读查询，可路由到只读副本
+            consistency_key: 读己之写的一致性范围（如 "student:1001"）。
+                写入（readonly=False）成功后记录该 key，随后一段时间内
+                同一 key 的只读查询回退主库，保证能读到刚写入的数据
+
+        Usage:
+            async with db_pool.acquire(readonly=True, consistency_key=f"student:{student_id}") as cursor:
+                ...
+        """
+        async with AsyncExitStack() as stack:
+            cursor = None
+            if readonly:
+                cursor = await self._enter_replica(stack, consistency_key)
+            if cursor is None:
+                cursor = await stack.enter_async_context(
+                    self.partition(partition).acquire(commit=commit))
+            yield cursor
+        if not readonly and consistency_key is not None:
+            self.mark_written(consistency_key)
+
+    async def _enter_replica(self, stack: AsyncExitStack, consistency_key: Optional[str]):
+        """尝试从副本借出游标，不满足条件或失败时返回 None（由调用方回退主库）"""
+        if not self.replicas:
+            self._m_reads["primary_no_replica"].inc()
+            return None
+        if self.is_pinned(consistency_key):
+            self._m_reads["primary_pinned"].inc()
+            return None
+        replica = self._pick_replica()
+        if replica is None:
+            self._m_reads["primary_fallback"].inc()
+            return None
+        try:
+            cursor = await stack.enter_async_context(replica.acquire())
+        except (pymysql.MySQLError, ServiceUnavailableError, OSError) as e:
+            replica.mark_unavailable(f"获取连接失败: {str(e)}")
+            self._m_reads["primary_fallback"].inc()
+            return None
+        self._m_reads["replica"].inc()
+        return cursor
+
+    def get_cursor(self, commit: bool = False, partition: Optional[str] = None):
+        return self.partition(partition).get_cursor(commit=commit)
+
+    async def run_transaction(self, func: Callable[[AsyncCursor], Awaitable[T]], *,
+                              operation: str, commit: bool = False, **acquire_kwargs) -> T:
+        """
+        在一个事务中执行 func(cursor)，遇到死锁、锁等待超时、连接中断时整体重试
+
+        每次尝试都会重新借连接（失败的连接已回滚并归还），退避与重试预算见 app.utils.retry。
+        func 必须可以安全地重复执行。
+
+        Usage:
+            async def _enroll(cursor):
+                return await cursor.run(sp.sp_student_enroll, student_id, instance_id)
+
+            message = await db_pool.run_transaction(_enroll, operation="enroll", commit=True)
+        """
+        async def _attempt():
+            async with self.acquire(commit=commit, **acquire_kwargs) as cursor:
+                return await func(cursor)
+        return await retry_async(_attempt, operation)
+
+    def get_connection(self, partition: Optional[str] = None):
+        return self.partition(partition).get_connection()
+
+    async def run_sync(self, func: Callable, *args, **kwargs) -> Any:
+        return await self.current.run_sync(func, *args, **kwargs)
+
+    def _all_pools(self) -> List[DatabasePool]:
+        return list(self.pools.values()) + list(self.replicas)
+
+    @property
+    def ready(self) -> bool:
+        """主库各分区均已预热（只读副本不可用时会回退主库，不影响就绪状态）"""
+        return all(pool.ready for pool in self.pools.values())
+
+    async def warmup(self, timeout: Optional[float] = None):
+        """并行预热全部分区和只读副本，失败的连接池在第一次使用时再创建"""
+        async def _warm(pool: DatabasePool):
+            try:
+                await pool.run_sync(pool.warmup)
+                if isinstance(pool, ReplicaPool):
+                    await pool.run_sync(pool.check_lag)
+            except Exception as e:
+                logger.error(f"数据库连接池 {pool.name} 预热失败: {str(e)}")
+
+        tasks = [_warm(pool) for pool in self._all_pools()]
+        try:
+            await asyncio.wait_for(asyncio.gather(*tasks), timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"数据库连接池预热超时（{timeout}秒），未完成的连接池将在第一次使用时创建")
+
+    async def _warmup_loop(self):
+        delay = 1.0
+        while not self.ready:
+            await asyncio.sleep(delay)
+            await self.warmup(timeout=settings.DB_CONNECT_TIMEOUT)
+            delay = min(delay * 2, settings.DB_POOL_WARMUP_RETRY_MAX_DELAY)
+        logger.info("数据库连接池预热完成")
+
+    def start_warmup_retry(self):
+        """
+        启动预热未完成时，在后台按指数退避重试预热直到全部分区就绪（需在事件循环中调用）
+
+        /health 只读取 ready，不自己预热：探活请求不会因数据库不可达而阻塞，也不会叠加并发的预热
+        """
+        if self._warmup_task is None and not self.ready:
+            self._warmup_task = asyncio.get_running_loop().create_task(self._warmup_loop())
+
+    async def stop_warmup_retry(self):
+        task, self._warmup_task = self._warmup_task, None
+        if task is not None:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+
+    def stats(self) -> dict:
+        """各分区及只读副本的连接池状态"""
+        return {pool.name: pool.stats() for pool in self._all_pools()}
+
+    def start_keepalive(self):
+        for pool in self._all_pools():
+            pool.start_keepalive()
+
+    async def stop_keepalive(self):
+        for pool in self._all_pools():
+            await pool.stop_keepalive()
+
+    def close(self):
+        for pool in self._all_pools():
+            pool.close()
+
+
+_request_partition: contextvars.ContextVar = contextvars.ContextVar(
+    "db_request_partition", default=PartitionedPool.DEFAULT
+)
+
+
+def db_partition(name: str):
+    """
+    FastAPI 依赖：指定当前请求使用的连接池分区
+
+    可以挂在整个路由上，也可以挂在单个接口上（接口级依赖在路由级之后执行，会覆盖路由级设置）
+
+    Usage:
+        app.include_router(statistics.router, dependencies=[Depends(db_partition("report"))])
+
+        @router.post("/{student_id}/enroll", dependencies=[Depends(db_partition("enroll"))])
+    """
+    async def _set_partition():
+        _request_partition.set(name)
+    return _set_partition
+
+
+def _build_partitions() -> Dict[str, DatabasePool]:
+    """
+    根据配置创建连接池分区，连接数为 0 的分区不单独建池
+
+    各分区的连接数从 DB_POOL_MAX_SIZE 中划出，默认分区使用剩余的连接，
+    每个工作进程连接主库的连接数合计不超过 DB_POOL_MAX_SIZE
+    """
+    partitions = {
+        "enroll": (settings.DB_POOL_ENROLL_SIZE, settings.DB_POOL_ENROLL_MAX_WAIT),
+        "read": (settings.DB_POOL_READ_SIZE, settings.DB_POOL_READ_MAX_WAIT),
+        "report": (settings.DB_POOL_REPORT_SIZE, settings.DB_POOL_REPORT_MAX_WAIT),
+    }
+    carved = sum(size for size, _ in partitions.values() if size > 0)
+    default_size = settings.DB_POOL_MAX_SIZE - carved
+    if default_size < 1:
+        raise ValueError(
+            f"连接池分区合计 {carved} 个连接，DB_POOL_MAX_SIZE={settings.DB_POOL_MAX_SIZE} "
+            f"没有给默认分区留下连接，请调大 DB_POOL_MAX_SIZE 或调小各分区连接数"
+        )
+    pools = {PartitionedPool.DEFAULT: DatabasePool(PartitionedPool.DEFAULT, max_size=default_size)}
+    for name, (size, max_wait) in partitions.items():
+        if size > 0:
+            pools[name] = DatabasePool(name, max_size=size, max_wait=max_wait)
+    return pools
+
+
+def _build_replicas() -> List[ReplicaPool]:
+    """根据 DB_REPLICA_HOSTS（"host" 或 "host:port"）创建只读副本连接池"""
+    replicas = []
+    for index, address in enumerate(settings.DB_REPLICA_HOSTS):
+        host, _, port = address.partition(":")
+        replicas.append(ReplicaPool(f"replica-{index}", host, int(port or settings.DB_PORT)))
+    return replicas
 
 
 # 全局连接池实例
-db_pool = DatabasePool()
+db_pool = PartitionedPool(_build_partitions(), _build_replicas())
+
+
+class RequestConnection:
+    """
+    请求级数据库连接
+
+    第一次调用 cursor() 时才借出连接，同一请求内的所有语句复用这一个连接，请求结束时归还。
+    - 只读（get_read_db）：可路由到只读副本
+    - 读写（get_write_db）：必须在返回响应前显式 commit()；
+      未提交的修改在请求结束时回滚（包括接口抛出异常的情况）
+    """
+
+    def __init__(self, pool: PartitionedPool, readonly: bool):
+        self._pool = pool
+        self.readonly = readonly
+        self.consistency_key: Optional[str] = None
+        self._stack: Optional[AsyncExitStack] = None
+        self._cursor: Optional[AsyncCursor] = None
+
+    async def cursor(self, consistency_key: Optional[str] = None) -> AsyncCursor:
+        """
+        获取本请求的游标（首次调用时借出连接）
+
+        Args:
+            consistency_key: 读己之写的一致性范围，含义同 db_pool.acquire()
+        """
+        if self._cursor is None:
+            self.consistency_key = consistency_key
+            stack = AsyncExitStack()
+            self._cursor = await stack.enter_async_context(
+                self._pool.acquire(readonly=self.readonly, consistency_key=consistency_key)
+            )
+            self._stack = stack
+        return self._cursor
+
+    async def commit(self):
+        """提交事务，并记录读己之写的 key"""
+        if self.readonly:
+            raise RuntimeError("只读连接不能提交事务")
+        if self._cursor is not None:
+            await self._cursor.commit()
+            if self.consistency_key is not None:
+                self._pool.mark_written(self.consistency_key)
+
+    async def close(self, exc: Optional[BaseException] = None):
+        """归还连接；exc 不为空时先回滚"""
+        stack, self._stack, self._cursor = self._stack, None, None
+        if stack is None:
+            return
+        if exc is None:
+            # 未提交的修改由 PooledDB（reset=True）在连接归还时回滚
+            await stack.aclose()
+        else:
+            await stack.__aexit__(type(exc), exc, exc.__traceback__)
 
 
 # 依赖注入函数
-def get_db_cursor(commit: bool = False):
+async def get_read_db() -> AsyncIterator[RequestConnection]:
     """
-    FastAPI 依赖注入：获取数据库游标
-    
+    FastAPI 依赖注入：请求级只读连接（延迟借出，可路由到只读副本）
+
+    Usage:
+        @router.get("/users")
+        async def get_users(db: RequestConnection = Depends(get_read_db)):
+            cursor = await db.cursor()
+            await cursor.execute("SELECT * FROM users")
+            return await cursor.fetchall()
+    """
+    db = RequestConnection(db_pool, readonly=True)
+    try:
+        yield db
+    except BaseException as e:
+        await db.close(e)
+        raise
+    else:
+        await db.close()
+
+
+async def get_write_db() -> AsyncIterator[RequestConnection]:
+    """
+    FastAPI 依赖注入：请求级读写连接（一个请求一个事务，需显式 commit）
+
     Usage:
-        @app.get("/users")
-        def get_users(cursor = Depends(get_db_cursor)):
-            cursor.execute("SELECT * FROM users")
-            return cursor.fetchall()
+        @router.post("/instances")
+        async def create_instance(db: RequestConnection = Depends(get_write_db)):
+            cursor = await db.cursor()
+            ...
+            await db.commit()
+            return ResponseModel(...)
     """
-    return db_pool.get_cursor(commit=commit)
+    db = RequestConnection(db_pool, readonly=False)
+    try:
+        yield db
+    except BaseException as e:
+        await db.close(e)
+        raise
+    else:
+        await db.close()
@@ -1,20 +1,25 @@
 """
 FastAPI 主应用
 """
-from fastapi import FastAPI, Request, status
+from fastapi import Depends, FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.security import HTTPBearer
 from contextlib import asynccontextmanager
 
 from app.config import settings
-from app.database import db_pool
+from app.database import db_pool, db_priority, db_partition, Priority
 from app.utils.logger import logger
 from app.utils.exceptions import BaseAPIException
 from app.models.common import ResponseModel
+from app.services.enroll_dispatcher import enroll_dispatcher
+from app.services.idempotency import idempotency_store
+from app.services.seat_cache import seat_cache
+from app.services.waiting_room import TICKET_HEADER, WaitingRoomMiddleware, waiting_room
+from app.services.waitlist import waitlist_promoter
 
 # 导入路由
-from app.api import auth, students, teachers, statistics, admin, common
+from app.api import auth, students, teachers, statistics, admin, common, monitor
 
 # 定义安全方案（这样 Swagger UI 才会显示 Authorize 按钮）
 security = HTTPBearer()
@@ -27,11 +32,27 @@ async def lifespan(app: FastAPI):
     logger.info(f"🚀 {settings.APP_NAME} v{settings.APP_VERSION} 启动中...")
     logger.info(f"环境: {settings.ENVIRONMENT}")
     logger.info(f"数据库: {settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}")
+    if settings.DB_POOL_WARMUP:
+        await db_pool.warmup(timeout=settings.DB_POOL_WARMUP_TIMEOUT)
+    db_pool.start_warmup_retry()
+    db_pool.start_keepalive()
+    enroll_dispatcher.start()
+    seat_cache.start()
+    waitlist_promoter.start()
+    idempotency_store.start()
+    waiting_room.start()
     
     yield
     
     # 关闭时
     logger.info("⏹️  应用关闭中...")
+    await waiting_room.stop()
+    await idempotency_store.stop()
+    await waitlist_promoter.stop()
+    await seat_cache.stop()
+    await enroll_dispatcher.stop()
+    await db_pool.stop_keepalive()
+    await db_pool.stop_warmup_retry()
     db_pool.close()
     logger.info("✅ 应用已关闭")
 
@@ -55,6 +76,7 @@ app = FastAPI(
         {"name": "教师", "description": "教师查看授课安排、学生名单等功能"},
         {"name": "统计", "description": "数据统计和报表功能"},
         {"name": "管理", "description": "管理员功能：用户、课程、院系管理"},
+        {"name": "监控", "description": "连接池状态与运行指标"},
     ]
 )
 
@@ -102,6 +124,9 @@ def custom_openapi():
 app.openapi = custom_openapi
 
 
+# 选课排队中间件（在 CORS 之内，排队响应同样带 CORS 头）
+app.add_middleware(WaitingRoomMiddleware)
+
 # CORS 中间件
 app.add_middleware(
     CORSMiddleware,
@@ -109,6 +134,7 @@ app.add_middleware(
     allow_credentials=settings.CORS_ALLOW_CREDENTIALS,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[TICKET_HEADER, "Retry-After"],
 )
 
 
@@ -117,6 +143,7 @@ app.add_middleware(
 async def api_exception_handler(request: Request, exc: BaseAPIException):
     """处理自定义 API 异常"""
     logger.warning(f"API 异常: {exc.code} - {exc.message}")
+    retry_after = getattr(exc, "retry_after", None)
     return JSONResponse(
         status_code=exc.status_code,
         content={
@@ -124,7 +151,8 @@ async def api_exception_handler(request: Request, exc: BaseAPIException):
             "code": exc.status_code,
             "message": exc.message,
             "data": exc.details
-        }
+        },
+        headers={"Retry-After": str(retry_after)} if retry_after else None
     )
 
 
@@ -162,12 +190,31 @@ async def root():
 # 健康检查
 @app.get("/health", response_model=ResponseModel[dict])
 async def health_check():
-    """健康检查"""
+    """
+    健康检查（连接池未完成预热时返回 503，便于负载均衡在就绪后再转发流量）
+
+    启动时预热失败（如数据库暂不可达）的连接池由后台任务重试，这里只读取就绪状态
+    """
+    if not db_pool.ready:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={
+                "success": False,
+                "code": 503,
+                "message": "服务启动中",
+                "data": {
+                    "status": "starting",
+                    "ready": False,
+                    "pools": {name: pool.ready for name, pool in db_pool.pools.items()}
+                }
+            }
+        )
+    
     try:
         # 测试数据库连接
-        with db_pool.get_cursor() as cursor:
-            cursor.execute("SELECT 1")
-            cursor.fetchone()
+        async with db_pool.acquire() as cursor:
+            await cursor.execute("SELECT 1")
+            await cursor.fetchone()
         
         return ResponseModel(
             success=True,
@@ -175,6 +222,7 @@ async def health_check():
             message="服务正常",
             data={
                 "status": "healthy",
+                "ready": True,
                 "database": "connected",
                 "environment": settings.ENVIRONMENT
             }
@@ -198,11 +246,17 @@ async def health_check():
 
 # 注册路由
 app.include_router(auth.router, prefix="/api/auth", tags=["认证"])
-app.include_router(students.router, prefix="/api/students", tags=["学生"])
+# 学生查询走 read 分区（选课/退课接口单独指定 enroll 分区），统计与管理走 report 分区；
+# 连接池紧张时先拒绝统计与管理请求，保证选课流量
+app.include_router(students.router, prefix="/api/students", tags=["学生"],
+                   dependencies=[Depends(db_priority(Priority.HIGH)), Depends(db_partition("read"))])
 app.include_router(teachers.router, prefix="/api/teachers", tags=["教师"])
-app.include_router(statistics.router, prefix="/api/statistics", tags=["统计"])
-app.include_router(admin.router, prefix="/api/admin", tags=["管理"])
+app.include_router(statistics.router, prefix="/api/statistics", tags=["统计"],
+                   dependencies=[Depends(db_priority(Priority.LOW)), Depends(db_partition("report"))])
+app.include_router(admin.router, prefix="/api/admin", tags=["管理"],
+                   dependencies=[Depends(db_priority(Priority.LOW)), Depends(db_partition("report"))])
 app.include_router(common.router, prefix="/api/common", tags=["通用"])
+app.include_router(monitor.router, prefix="/api/monitor", tags=["监控"])
 
 # TODO: 添加更多路由
 # app.include_router(departments.router, prefix="/api/departments", tags=["院系管理"])
@@ -208,3 +208,25 @@ class CourseInstanceResponse(BaseModel):
                 "time_slots": []
             }
         }
+
+
+class EnrollModeRequest(BaseModel):
+    """设置学期选课模式请求"""
+    
+    mode: str = Field(..., description="选课模式", pattern="^(先到先得|抽签)$")
+
+
+class LotteryRunRequest(BaseModel):
+    """抽签分配请求"""
+    
+    seed: Optional[int] = Field(None, description="随机种子（相同意向和种子得到相同结果），默认使用当前时间")
+    workers: Optional[int] = Field(None, description="抽签进程数，默认 LOTTERY_WORKERS", ge=0, le=64)
+    dry_run: bool = Field(False, description="只计算分配结果，不写入数据库")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "seed": 20250901,
+                "dry_run": True
+            }
+        }
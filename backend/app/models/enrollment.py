@@ -2,7 +2,7 @@
 选课相关模型
 """
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Literal, Optional
 from datetime import datetime
 
 
@@ -25,6 +25,108 @@ class DropRequest(BaseModel):
     instance_id: int = Field(..., description="开课实例ID", gt=0)
 
 
+class BatchEnrollRequest(BaseModel):
+    """批量选课请求"""
+    
+    instance_ids: List[int] = Field(..., description="开课实例ID列表（不能重复）",
+                                    min_length=1, max_length=20)
+    mode: Literal["best_effort", "all_or_nothing"] = Field(
+        "best_effort", description="best_effort: 能选上的都选上；all_or_nothing: 任意一门失败则全部不选")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "instance_ids": [1, 2, 3],
+                "mode": "best_effort"
+            }
+        }
+
+
+class BatchEnrollItem(BaseModel):
+    """批量选课中一门课程的结果"""
+    
+    instance_id: int
+    success: bool
+    message: str
+
+
+class BatchEnrollResult(BaseModel):
+    """批量选课结果"""
+    
+    mode: str
+    enrolled: int  # 选课成功门数
+    failed: int  # 选课失败门数
+    items: List[BatchEnrollItem]  # 与请求中的开课实例顺序一致
+
+
+class SwapRequest(BaseModel):
+    """换课请求（退选原课程并选修新课程）"""
+    
+    from_instance_id: int = Field(..., description="原开课实例ID（将退选）", gt=0)
+    to_instance_id: int = Field(..., description="新开课实例ID（将选修）", gt=0)
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "from_instance_id": 1,
+                "to_instance_id": 2
+            }
+        }
+
+
+class IntentRequest(BaseModel):
+    """提交选课意向请求（抽签选课学期）"""
+    
+    instance_ids: List[int] = Field(..., description="按志愿顺序排列的开课实例ID，第一个为第一志愿",
+                                    min_length=1, max_length=20)
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "instance_ids": [3, 1, 2]
+            }
+        }
+
+
+class IntentEntry(BaseModel):
+    """选课意向"""
+    
+    instance_id: int
+    course_id: str
+    course_name: str
+    semester_id: int
+    rank: int  # 志愿序号，1 为第一志愿
+    status: str  # 待分配/已中签/未中签
+    submitted_at: Optional[datetime] = None
+
+
+class WaitlistRequest(BaseModel):
+    """加入候补队列请求"""
+    
+    instance_id: int = Field(..., description="开课实例ID", gt=0)
+
+
+class WaitlistJoinResult(BaseModel):
+    """加入候补队列结果"""
+    
+    instance_id: int
+    position: int  # 在同类名额候补队列中的位次，从 1 开始
+
+
+class WaitlistEntry(BaseModel):
+    """候补记录"""
+    
+    instance_id: int
+    course_id: str
+    course_name: str
+    quota_type: str  # 对内/对外
+    status: str  # 等待/已录取/已失效/已取消
+    position: Optional[int] = None  # 仅等待中的记录有位次
+    joined_at: datetime
+    processed_at: Optional[datetime] = None
+    note: Optional[str] = None
+
+
 class AvailableCourse(BaseModel):
     """可选课程"""
     
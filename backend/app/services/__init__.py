@@ -0,0 +1 @@
+"""业务服务包初始化"""
@@ -0,0 +1,91 @@
+"""
+批量选课
+学生在选课开始时一次提交整张计划课表（5-10 门课），在一个事务中依次调用 sp_enroll_core，
+只借一次连接、提交一次，代替逐门调用选课接口。
+
+- 先用课表时间位图在内存中检查所选课程之间的时间冲突，名额缓存中已满的课程直接判失败，
+  这些课程不再进入数据库
+- 按开课实例ID升序选课（sp_enroll_core 先锁学生行，再按升序锁开课实例行），
+  与选课分发器等其他写入者遵守同一加锁顺序（见 enroll_dispatcher 模块说明），不会交叉等待而死锁
+- best_effort（默认）：每门课一个 SAVEPOINT，失败只回滚该门课，其余照常提交
+- all_or_nothing：任意一门失败则整批回滚，一门都不选
+"""
+from typing import Dict, List, Optional, Sequence, Union
+
+from app.dal.stored_procedures import sp
+from app.services.enroll_dispatcher import enroll_batch
+from app.services.timetable import BitmapMatrix
+from app.utils.exceptions import BusinessError, DatabaseError
+from app.utils.retry import retry_reason
+
+BEST_EFFORT = "best_effort"
+ALL_OR_NOTHING = "all_or_nothing"
+
+ROLLED_BACK = "未选课: 同批次其他课程选课失败，已整体回滚"
+
+
+def find_conflicts(instance_ids: Sequence[int], bitmaps: Dict[int, int]) -> Dict[int, str]:
+    """
+    检查同一批次内课程之间的时间冲突（按提交顺序，先提交的课程优先）
+
+    冲突关系由 BitmapMatrix.conflict_matrix 一次算出（安装 NumPy 时向量化）。
+
+    不在 bitmaps 中的开课实例（非当前学期或缓存尚未加载）交给数据库判断。
+
+    Returns:
+        {开课实例ID: 失败消息}
+    """
+    known = BitmapMatrix({i: bitmaps[i] for i in instance_ids if bitmaps.get(i)})
+    matrix = known.conflict_matrix()
+    row_of = {instance_id: row for row, instance_id in enumerate(known.ids)}
+
+    rejected: Dict[int, str] = {}
+    accepted: List[int] = []
+    for instance_id in instance_ids:
+        row = row_of.get(instance_id)
+        clash: Optional[int] = None
+        if row is not None:
+            clash = next((other for other in accepted
+                          if other in row_of and matrix[row][row_of[other]]), None)
+        if clash is not None:
+            rejected[instance_id] = f"选课失败: 与同批次的开课实例 {clash} 上课时间冲突"
+        else:
+            accepted.append(instance_id)
+    return rejected
+
+
+def enroll_all_or_nothing(cursor, student_id: int,
+                          instance_ids: Sequence[int]) -> List[Union[str, Exception]]:
+    """
+    在当前事务中依次选课，任意一门失败则回滚本批次全部选课（在数据库线程中执行，由调用方提交）
+
+    死锁、连接中断等可重试错误直接抛出，由调用方回滚并重试。
+
+    Returns:
+        与 instance_ids 一一对应的成功消息或异常
+    """
+    cursor.execute("SAVEPOINT enroll_batch")
+    results: List[Union[str, Exception]] = []
+    for instance_id in instance_ids:
+        try:
+            results.append(sp.sp_enroll_core(cursor, student_id, instance_id))
+        except (BusinessError, DatabaseError) as e:
+            if retry_reason(e) is not None:
+                raise
+            cursor.execute("ROLLBACK TO SAVEPOINT enroll_batch")
+            rolled_back = [BusinessError(ROLLED_BACK)] * len(results)
+            skipped = [BusinessError(ROLLED_BACK)] * (len(instance_ids) - len(results) - 1)
+            return rolled_back + [e] + skipped
+    return results
+
+
+def enroll_planned(cursor, student_id: int, instance_ids: Sequence[int],
+                   mode: str = BEST_EFFORT) -> List[Union[str, Exception]]:
+    """按开课实例ID升序选课，结果按 instance_ids 的顺序返回"""
+    ordered = sorted(instance_ids)
+    if mode == ALL_OR_NOTHING:
+        results = enroll_all_or_nothing(cursor, student_id, ordered)
+    else:
+        results = enroll_batch(cursor, [(student_id, instance_id) for instance_id in ordered])
+    by_instance = dict(zip(ordered, results))
+    return [by_instance[instance_id] for instance_id in instance_ids]
@@ -0,0 +1,214 @@
+"""
+选课请求分发器
+按开课实例ID把选课请求分到若干个分片，每个分片只有一个写入协程：
+同一开课实例的选课不再并发争抢行锁，热门课程选课高峰期不再出现死锁。
+
+写入协程每次取出最多 ENROLL_DISPATCH_BATCH_SIZE 个排队请求（最多额外等待
+ENROLL_DISPATCH_BATCH_WAIT_MS 毫秒凑批），在同一个事务中逐个调用 sp_enroll_core，
+每个学生的选课用 SAVEPOINT 隔离，失败只回滚该学生，提交后把各自的结果返回给等待的请求。
+
+ENROLL_DISPATCH_SHARDS 为 0 或分发器未启动时，submit() 直接调用 sp_student_enroll。
+
+加锁顺序约定：一个事务先锁学生行（多个学生按学生ID升序），再锁开课实例行（按开课实例ID升序）。
+分发器批次、批量选课、换课（sp_student_swap）、候补补选（sp_waitlist_promote）都在分片之外
+写入开课实例，必须遵守同一顺序，否则与分发器批次之间可能形成死锁环（重试只能掩盖，不能消除）。
+"""
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Tuple, Union
+
+from app.config import settings
+from app.dal.stored_procedures import sp
+from app.database import db_pool
+from app.utils.exceptions import BusinessError, DatabaseError, ServiceUnavailableError
+from app.utils.logger import logger
+from app.utils.metrics import metrics
+from app.utils.retry import retry_reason
+
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+@dataclass
+class _Pending:
+    """一个排队中的选课请求"""
+    student_id: int
+    instance_id: int
+    future: asyncio.Future
+    enqueued: float
+
+
+def enroll_batch(cursor, items: List[Tuple[int, int]]) -> List[Union[str, Exception]]:
+    """
+    在当前事务中依次选课（在数据库线程中执行，由调用方提交）
+
+    每个学生的选课之前设置 SAVEPOINT，业务失败（名额已满、时间冲突等）只回滚到该保存点；
+    死锁、连接中断等可重试错误直接抛出，由调用方回滚并重试整个批次。
+
+    加锁顺序：先按学生ID升序锁定本批学生，再按开课实例ID升序选课（占用名额时锁定开课实例行），
+    遵守模块说明中的加锁顺序约定，与批量选课、换课、候补补选之间不会交叉等待。
+
+    Returns:
+        与 items 一一对应的成功消息或异常
+    """
+    # 锁定学生之后才开始读取：本事务的一致性读快照在拿到锁之后建立，
+    # 同一学生在其他分片已提交的选课对时间冲突检查可见
+    students = sorted({student_id for student_id, _ in items})
+    placeholders = ", ".join(["%s"] * len(students))
+    cursor.execute(f"SELECT `用户ID` FROM `用户信息表` WHERE `用户ID` IN ({placeholders}) FOR UPDATE",
+                   students)
+    # 同一开课实例内保持排队顺序（先到先得）
+    order = sorted(range(len(items)), key=lambda index: items[index][1])
+    results: List[Union[str, Exception]] = [None] * len(items)
+    for index in order:
+        student_id, instance_id = items[index]
+        cursor.execute("SAVEPOINT enroll_item")
+        try:
+            results[index] = sp.sp_enroll_core(cursor, student_id, instance_id)
+        except (BusinessError, DatabaseError) as e:
+            if retry_reason(e) is not None:
+                raise
+            cursor.execute("ROLLBACK TO SAVEPOINT enroll_item")
+            results[index] = e
+    return results
+
+
+class EnrollDispatcher:
+    """按开课实例分片的单写入者选课队列"""
+
+    def __init__(self, shards: Optional[int] = None, batch_size: Optional[int] = None,
+                 batch_wait_ms: Optional[float] = None, queue_size: Optional[int] = None):
+        self.shards = settings.ENROLL_DISPATCH_SHARDS if shards is None else shards
+        self.batch_size = batch_size or settings.ENROLL_DISPATCH_BATCH_SIZE
+        self.batch_wait = (settings.ENROLL_DISPATCH_BATCH_WAIT_MS if batch_wait_ms is None
+                           else batch_wait_ms) / 1000
+        self.queue_size = queue_size or settings.ENROLL_DISPATCH_QUEUE_SIZE
+        self._queues: List[asyncio.Queue] = []
+        self._workers: List[asyncio.Task] = []
+
+        self._m_batch = metrics.histogram(
+            "enroll_batch_size", "每个选课事务包含的请求数", buckets=BATCH_BUCKETS)
+        self._m_wait = metrics.histogram("enroll_queue_wait_seconds", "选课请求排队等待时间")
+        self._m_rejected = metrics.counter("enroll_queue_rejected_total", "选课队列已满而拒绝的请求数")
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def start(self):
+        """在当前事件循环中启动各分片的写入协程"""
+        if self.running or self.shards <= 0:
+            return
+        self._queues = [asyncio.Queue(maxsize=self.queue_size) for _ in range(self.shards)]
+        self._workers = [
+            asyncio.create_task(self._worker(index, queue), name=f"enroll-shard-{index}")
+            for index, queue in enumerate(self._queues)
+        ]
+        logger.info(f"选课分发器已启动: {self.shards} 个分片，每批最多 {self.batch_size} 个请求")
+
+    async def stop(self):
+        """停止写入协程，未处理的请求返回 503"""
+        workers, self._workers = self._workers, []
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        for queue in self._queues:
+            while not queue.empty():
+                pending = queue.get_nowait()
+                if not pending.future.done():
+                    pending.future.set_exception(ServiceUnavailableError("服务正在关闭，请稍后重试"))
+        self._queues = []
+
+    def queue_depths(self) -> List[int]:
+        return [queue.qsize() for queue in self._queues]
+
+    async def submit(self, student_id: int, instance_id: int) -> str:
+        """
+        提交一个选课请求并等待结果
+
+        Returns:
+            选课成功消息
+        Raises:
+            BusinessError: 选课失败（名额已满、时间冲突等）
+            ServiceUnavailableError: 分片队列已满
+        """
+        if not self.running:
+            return await self._enroll_direct(student_id, instance_id)
+
+        queue = self._queues[instance_id % self.shards]
+        future = asyncio.get_running_loop().create_future()
+        try:
+            queue.put_nowait(_Pending(student_id, instance_id, future, time.monotonic()))
+        except asyncio.QueueFull:
+            self._m_rejected.inc()
+            raise ServiceUnavailableError("选课请求排队人数过多，请稍后重试")
+        return await future
+
+    @staticmethod
+    async def _enroll_direct(student_id: int, instance_id: int) -> str:
+        async def _enroll(cursor):
+            return await cursor.run(sp.sp_student_enroll, student_id, instance_id)
+
+        return await db_pool.run_transaction(
+            _enroll, operation="enroll", commit=True, partition="enroll",
+            consistency_key=f"student:{student_id}"
+        )
+
+    async def _next_batch(self, queue: asyncio.Queue) -> List[_Pending]:
+        """取出一批请求：阻塞等待第一个，之后最多再等待 batch_wait 秒凑满一批"""
+        batch = [await queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.batch_wait
+        while len(batch) < self.batch_size:
+            if not queue.empty():
+                batch.append(queue.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        # 客户端已断开的请求不再处理
+        return [pending for pending in batch if not pending.future.done()]
+
+    async def _worker(self, index: int, queue: asyncio.Queue):
+        while True:
+            batch = await self._next_batch(queue)
+            if not batch:
+                continue
+            try:
+                await self._run_batch(batch)
+            except Exception as e:
+                # 兜底：保证每个等待的请求都能得到结果，写入协程不退出
+                logger.error(f"选课分片 {index} 处理批次失败: {str(e)}")
+                for pending in batch:
+                    if not pending.future.done():
+                        pending.future.set_exception(e)
+
+    async def _run_batch(self, batch: List[_Pending]):
+        now = time.monotonic()
+        for pending in batch:
+            self._m_wait.observe(now - pending.enqueued)
+        self._m_batch.observe(len(batch))
+        items = [(pending.student_id, pending.instance_id) for pending in batch]
+
+        async def _enroll(cursor):
+            return await cursor.run(enroll_batch, items)
+
+        # 死锁、连接中断时整批重试（整个事务已回滚，重新执行不会重复选课）
+        results = await db_pool.run_transaction(
+            _enroll, operation="enroll", commit=True, partition="enroll")
+
+        for pending, result in zip(batch, results):
+            if pending.future.done():
+                continue
+            if isinstance(result, Exception):
+                pending.future.set_exception(result)
+            else:
+                db_pool.mark_written(f"student:{pending.student_id}")
+                pending.future.set_result(result)
+
+
+enroll_dispatcher = EnrollDispatcher()
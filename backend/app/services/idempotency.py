@@ -0,0 +1,206 @@
+"""
+选课/退课幂等键
+客户端超时重试 `POST /enroll`、`POST /drop` 时带上同一个 `Idempotency-Key` 请求头，
+服务端直接返回第一次的处理结果，不再调用存储过程（也不会把"已选修该课程"当作错误返回）。
+
+- 结果保存 IDEMPOTENCY_TTL 秒：成功结果与业务失败（名额已满、时间冲突等）都会保存，
+  503、数据库异常等可重试的错误不保存
+- 同一个键的请求正在处理时，后到的请求等待第一个请求的结果；第一个请求出现可重试错误时，
+  等待的请求中只有一个重新执行，其余继续等待
+- 键按操作和学生区分；同一个键用于不同的开课实例时返回 409
+- 内存中最多保存 IDEMPOTENCY_MAX_ENTRIES 条；开启 IDEMPOTENCY_PERSIST 后同时写入幂等记录表，
+  进程重启或多进程部署时内存未命中再查表
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import suppress
+from typing import Awaitable, Callable, Dict, NamedTuple, Optional, Tuple
+
+from app.config import settings
+from app.database import db_pool
+from app.utils.exceptions import BusinessError, ConflictError
+from app.utils.logger import logger
+from app.utils.metrics import metrics
+
+_PURGE_INTERVAL = 60.0  # 秒，清理过期记录的间隔
+
+
+class IdempotentResult(NamedTuple):
+    """一次请求的处理结果"""
+    fingerprint: str    # 请求摘要（开课实例等请求参数）
+    ok: bool            # 成功返回 message，失败按 BusinessError(message) 返回
+    message: str
+    expires_at: float   # time.monotonic() 时间
+
+
+class IdempotencyStore:
+    """幂等键结果存储（只在事件循环线程中读写）"""
+
+    def __init__(self, ttl: Optional[float] = None, max_entries: Optional[int] = None,
+                 persist: Optional[bool] = None):
+        self.ttl = ttl if ttl is not None else settings.IDEMPOTENCY_TTL
+        self.max_entries = max_entries or settings.IDEMPOTENCY_MAX_ENTRIES
+        self.persist = settings.IDEMPOTENCY_PERSIST if persist is None else persist
+        # TTL 固定，插入顺序即过期顺序，清理时从头部开始
+        self._results: "OrderedDict[str, IdempotentResult]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._m_replays = metrics.counter("idempotency_replays_total", "按幂等键直接返回已有结果的请求数")
+        self._m_entries = metrics.gauge("idempotency_entries", "内存中保存的幂等键结果数")
+
+    async def run(self, scope: str, key: Optional[str], fingerprint: str,
+                  func: Callable[[], Awaitable[str]]) -> Tuple[str, bool]:
+        """
+        按幂等键执行 func，返回 (message, 是否为重放结果)
+
+        Args:
+            scope: 键的作用范围（操作 + 学生），不同学生使用相同的键互不影响
+            key: 客户端提供的 Idempotency-Key，为空时直接执行
+            fingerprint: 请求摘要，同一个键用于不同请求时拒绝
+            func: 成功时返回提示消息，业务失败时抛出 BusinessError
+        """
+        if not key:
+            return await func(), False
+        key = f"{scope}:{key}"
+
+        while True:
+            result = self._get(key)
+            pending = self._inflight.get(key) if result is None else None
+            if pending is None:
+                break
+            # 与正在处理的同键请求合并；对方出现可重试错误时结果为 None，重新检查：
+            # 最先醒来的请求登记为新的执行者，其余请求等待它的结果
+            result = await asyncio.shield(pending)
+            if result is not None:
+                break
+        if result is not None:
+            self._m_replays.inc()
+            return self._replay(result, fingerprint), True
+
+        # 查表、执行之前同步登记，同一个键在本进程内同时只有一个执行者
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        loaded = False
+        try:
+            if self.persist:
+                result = await self._load(key)
+                loaded = result is not None
+            if loaded:
+                self._m_replays.inc()
+                return self._replay(result, fingerprint), True
+            try:
+                message = await func()
+            except BusinessError as e:
+                result = self._put(key, fingerprint, False, e.message)
+                raise
+            result = self._put(key, fingerprint, True, message)
+            return message, False
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            # 出现可重试错误时 result 为 None，等待中的请求重新检查后由其中一个重新执行
+            future.set_result(result)
+            if result is not None and self.persist and not loaded:
+                await self._save(key, result)
+
+    @staticmethod
+    def _replay(result: IdempotentResult, fingerprint: str) -> str:
+        if result.fingerprint != fingerprint:
+            raise ConflictError("幂等键已用于其他请求，请为新的请求生成新的 Idempotency-Key")
+        if not result.ok:
+            raise BusinessError(result.message)
+        return result.message
+
+    def _get(self, key: str) -> Optional[IdempotentResult]:
+        result = self._results.get(key)
+        if result is not None and result.expires_at <= time.monotonic():
+            return None
+        return result
+
+    def _put(self, key: str, fingerprint: str, ok: bool, message: str) -> IdempotentResult:
+        result = IdempotentResult(fingerprint, ok, message, time.monotonic() + self.ttl)
+        self._results[key] = result
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+        return result
+
+    def purge(self):
+        """清理内存中的过期结果"""
+        now = time.monotonic()
+        while self._results:
+            key, result = next(iter(self._results.items()))
+            if result.expires_at > now:
+                break
+            del self._results[key]
+        self._m_entries.set(len(self._results))
+
+    # ---------- 幂等记录表 ----------
+
+    async def _load(self, key: str) -> Optional[IdempotentResult]:
+        def _select():
+            with db_pool.get_cursor(partition="enroll") as cursor:
+                cursor.execute(
+                    "SELECT `请求摘要`, `是否成功`, `消息`, "
+                    "       TIMESTAMPDIFF(SECOND, NOW(), `过期时间`) AS `剩余秒数` "
+                    "FROM `幂等记录表` WHERE `幂等键` = %s AND `过期时间` > NOW()",
+                    (key,)
+                )
+                return cursor.fetchone()
+
+        try:
+            row = await db_pool.partition("enroll").run_sync(_select)
+        except Exception as e:
+            logger.warning(f"查询幂等记录失败: {str(e)}")
+            return None
+        if row is None:
+            return None
+        result = IdempotentResult(row["请求摘要"], bool(row["是否成功"]), row["消息"],
+                                  time.monotonic() + row["剩余秒数"])
+        self._results[key] = result
+        return result
+
+    async def _save(self, key: str, result: IdempotentResult):
+        def _insert():
+            with db_pool.get_cursor(commit=True, partition="enroll") as cursor:
+                cursor.execute(
+                    "INSERT IGNORE INTO `幂等记录表` "
+                    "(`幂等键`, `请求摘要`, `是否成功`, `消息`, `过期时间`) "
+                    "VALUES (%s, %s, %s, %s, DATE_ADD(NOW(), INTERVAL %s SECOND))",
+                    (key, result.fingerprint, result.ok, result.message[:255], int(self.ttl))
+                )
+
+        try:
+            await db_pool.partition("enroll").run_sync(_insert)
+        except Exception as e:
+            # 保存失败只影响进程重启后的重放，不影响本次请求
+            logger.warning(f"保存幂等记录失败: {str(e)}")
+
+    def _purge_table(self):
+        with db_pool.get_cursor(commit=True, partition="enroll") as cursor:
+            cursor.execute("DELETE FROM `幂等记录表` WHERE `过期时间` <= NOW() LIMIT 10000")
+
+    async def _purge_loop(self):
+        while True:
+            await asyncio.sleep(_PURGE_INTERVAL)
+            self.purge()
+            if self.persist:
+                try:
+                    await db_pool.partition("enroll").run_sync(self._purge_table)
+                except Exception as e:
+                    logger.warning(f"清理幂等记录失败: {str(e)}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._purge_loop())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+
+
+idempotency_store = IdempotencyStore()
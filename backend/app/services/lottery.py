@@ -0,0 +1,324 @@
+"""
+抽签选课分配
+选课模式为"抽签"的学期，学生在选课时间内提交按志愿排序的选课意向（选课意向表），
+选课时间结束后由教务触发一次分配，结果批量写入选课记录表。
+
+分配按志愿轮次进行（随机序列独裁）：
+- 每名学生抽一个随机签号（seed 固定时可复现），同一开课实例的申请者按 (优先级降序, 签号) 排序
+- 第 k 轮处理每名学生的第 k 个意向：与已分得课程时间冲突或同一课程已分得其他开课实例的意向直接落选，
+  其余按本院系/跨院系分别占用对内/对外名额
+- 每名学生每轮至多一个申请，同一轮内各开课实例的抽签互不影响，可分片交给进程池并行执行
+
+写入时先锁定学期行，同一学期的分配串行写入：重复触发的分配在锁上等待，之后发现意向已不再是
+待分配而拒绝。写入时设置 @_bulk_load 让选课触发器跳过逐行检查与计数，写入后调用
+sp_refresh_enroll_counts 一次性重算已选人数；与已有选课记录重复、重算后有开课实例超出名额、
+学生课表出现时间冲突或同一课程选了两次（分配期间数据被修改）时，整个事务回滚。
+
+抽签进程池使用 forkserver 启动方式：分配在多线程的应用进程中触发，fork 会让子进程继承
+其他线程此刻持有的锁（数据库连接池、日志等）。
+"""
+import asyncio
+import multiprocessing
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import pymysql
+
+from app.config import settings
+from app.database import db_pool
+from app.services.timetable import from_db
+from app.utils.exceptions import BusinessError, NotFoundError
+from app.utils.logger import logger
+from app.utils.metrics import metrics
+from loadtest.checks import over_quota, time_conflicts
+
+_m_assigned = metrics.counter("lottery_assignments_total", "抽签分配写入的选课记录数")
+
+# 一个抽签分片：[(开课实例ID, 对内剩余, 对外剩余, [(排序键, 学生ID, 是否本院系), ...]), ...]
+DrawTask = Tuple[int, int, int, List[Tuple[Tuple[int, int], int, bool]]]
+
+
+@dataclass
+class LotteryInstance:
+    """参与分配的开课实例"""
+    instance_id: int
+    course_id: str
+    dept_id: int
+    inner_left: int
+    outer_left: int
+    bitmap: int = 0
+
+
+@dataclass
+class LotteryStudent:
+    """参与分配的学生（已有选课记录计入占用时间与已选课程）"""
+    student_id: int
+    dept_id: Optional[int]
+    occupied: int = 0
+    courses: Set[str] = field(default_factory=set)
+
+
+@dataclass
+class Intent:
+    student_id: int
+    instance_id: int
+    rank: int           # 志愿序号，1 为第一志愿
+    priority: int = 0   # 越大越优先
+
+
+@dataclass
+class AllocationResult:
+    """分配结果"""
+    assignments: List[Tuple[int, int]]          # (学生ID, 开课实例ID)
+    rejected: Dict[str, int]                    # 落选原因 -> 意向数
+    rounds: int
+    elapsed: float
+
+    @property
+    def summary(self) -> dict:
+        return {
+            "assigned": len(self.assignments),
+            "rejected": dict(self.rejected),
+            "rounds": self.rounds,
+            "elapsed_seconds": round(self.elapsed, 3),
+        }
+
+
+def draw(tasks: Sequence[DrawTask]) -> List[Tuple[int, List[int]]]:
+    """
+    对一组开课实例抽签（进程池中执行，只依赖参数）
+
+    Returns:
+        [(开课实例ID, 中签学生ID列表), ...]
+    """
+    results = []
+    for instance_id, inner_left, outer_left, applicants in tasks:
+        winners = []
+        for _, student_id, inner in sorted(applicants):
+            if inner and inner_left > 0:
+                inner_left -= 1
+                winners.append(student_id)
+            elif not inner and outer_left > 0:
+                outer_left -= 1
+                winners.append(student_id)
+            if inner_left <= 0 and outer_left <= 0:
+                break
+        results.append((instance_id, winners))
+    return results
+
+
+def _chunks(tasks: List[DrawTask], count: int) -> List[List[DrawTask]]:
+    """按申请人数均衡地把抽签任务分成 count 份"""
+    buckets: List[List[DrawTask]] = [[] for _ in range(count)]
+    loads = [0] * count
+    for task in sorted(tasks, key=lambda t: len(t[3]), reverse=True):
+        index = loads.index(min(loads))
+        buckets[index].append(task)
+        loads[index] += len(task[3])
+    return [bucket for bucket in buckets if bucket]
+
+
+def allocate(students: Dict[int, LotteryStudent], instances: Dict[int, LotteryInstance],
+             intents: Iterable[Intent], seed: int = 0, workers: int = 0) -> AllocationResult:
+    """
+    按志愿轮次分配（会修改 students 的占用时间和 instances 的剩余名额）
+
+    Args:
+        seed: 随机种子，相同输入和种子得到相同结果
+        workers: 抽签进程数，0 表示在当前进程中执行
+    """
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    order = sorted(students)
+    rng.shuffle(order)
+    ticket = {student_id: position for position, student_id in enumerate(order)}
+
+    by_student: Dict[int, List[Intent]] = defaultdict(list)
+    for intent in intents:
+        if intent.student_id in students and intent.instance_id in instances:
+            by_student[intent.student_id].append(intent)
+    for wishes in by_student.values():
+        wishes.sort(key=lambda w: w.rank)
+    rounds = max((len(wishes) for wishes in by_student.values()), default=0)
+
+    assignments: List[Tuple[int, int]] = []
+    rejected: Dict[str, int] = defaultdict(int)
+    executor = None
+    if workers > 0:
+        executor = ProcessPoolExecutor(max_workers=workers,
+                                       mp_context=multiprocessing.get_context("forkserver"))
+    try:
+        for k in range(rounds):
+            # 1. 过滤：时间冲突、同一课程已分得其他开课实例
+            applicants: Dict[int, list] = defaultdict(list)
+            for student_id, wishes in by_student.items():
+                if k >= len(wishes):
+                    continue
+                wish = wishes[k]
+                student = students[student_id]
+                instance = instances[wish.instance_id]
+                if instance.course_id in student.courses:
+                    rejected["已选同一课程"] += 1
+                elif student.occupied & instance.bitmap:
+                    rejected["时间冲突"] += 1
+                else:
+                    applicants[wish.instance_id].append(
+                        ((-wish.priority, ticket[student_id]), student_id,
+                         student.dept_id == instance.dept_id))
+
+            # 2. 抽签：各开课实例互不影响
+            tasks = [(i, instances[i].inner_left, instances[i].outer_left, a)
+                     for i, a in applicants.items()]
+            if executor is not None and len(tasks) > 1:
+                drawn = [r for part in executor.map(draw, _chunks(tasks, workers)) for r in part]
+            else:
+                drawn = draw(tasks)
+
+            # 3. 更新学生占用与剩余名额
+            for instance_id, winners in drawn:
+                instance = instances[instance_id]
+                rejected["名额已满"] += len(applicants[instance_id]) - len(winners)
+                for student_id in winners:
+                    student = students[student_id]
+                    student.occupied |= instance.bitmap
+                    student.courses.add(instance.course_id)
+                    if student.dept_id == instance.dept_id:
+                        instance.inner_left -= 1
+                    else:
+                        instance.outer_left -= 1
+                    assignments.append((student_id, instance_id))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return AllocationResult(assignments, rejected, rounds, time.perf_counter() - started)
+
+
+# ---------- 数据库读写（同步，在数据库线程中执行） ----------
+
+def load_semester(semester_id: int):
+    """读取抽签学期的开课实例、待分配意向和学生已有选课"""
+    with db_pool.get_cursor(partition="report") as cursor:
+        cursor.execute("SELECT `选课模式` FROM `学期信息表` WHERE `学期ID` = %s", (semester_id,))
+        row = cursor.fetchone()
+        if row is None:
+            raise NotFoundError(f"学期ID {semester_id} 不存在")
+        if row["选课模式"] != "抽签":
+            raise BusinessError("该学期不是抽签选课模式")
+
+        cursor.execute(
+            "SELECT oi.`开课实例ID`, oi.`课程ID`, c.`院系ID`, oi.`时间位图`, "
+            "       oi.`对内名额` - oi.`已选对内人数` AS `对内剩余`, "
+            "       oi.`对外名额` - oi.`已选对外人数` AS `对外剩余` "
+            "FROM `开课实例表` oi "
+            "JOIN `课程信息表` c ON oi.`课程ID` = c.`课程ID` "
+            "WHERE oi.`学期ID` = %s", (semester_id,))
+        instances = {
+            r["开课实例ID"]: LotteryInstance(r["开课实例ID"], r["课程ID"], r["院系ID"],
+                                            max(int(r["对内剩余"]), 0), max(int(r["对外剩余"]), 0),
+                                            from_db(r["时间位图"]))
+            for r in cursor.fetchall()
+        }
+
+        cursor.execute(
+            "SELECT w.`学生ID`, w.`开课实例ID`, w.`志愿序号`, w.`优先级`, u.`院系ID` "
+            "FROM `选课意向表` w "
+            "JOIN `开课实例表` oi ON w.`开课实例ID` = oi.`开课实例ID` "
+            "JOIN `用户信息表` u ON w.`学生ID` = u.`用户ID` "
+            "WHERE oi.`学期ID` = %s AND w.`状态` = '待分配'", (semester_id,))
+        intents, students = [], {}
+        for r in cursor.fetchall():
+            intents.append(Intent(r["学生ID"], r["开课实例ID"], r["志愿序号"], r["优先级"]))
+            students.setdefault(r["学生ID"], LotteryStudent(r["学生ID"], r["院系ID"]))
+
+        cursor.execute(
+            "SELECT sc.`学生ID`, oi.`课程ID`, oi.`时间位图` "
+            "FROM `选课记录表` sc "
+            "JOIN `开课实例表` oi ON sc.`开课实例ID` = oi.`开课实例ID` "
+            "WHERE oi.`学期ID` = %s", (semester_id,))
+        for r in cursor.fetchall():
+            student = students.get(r["学生ID"])
+            if student is not None:
+                student.occupied |= from_db(r["时间位图"])
+                student.courses.add(r["课程ID"])
+
+    return students, instances, intents
+
+
+def write_allocation(semester_id: int, assignments: Sequence[Tuple[int, int]], pending: int):
+    """
+    在一个事务中批量写入选课记录、重算已选人数并更新意向状态
+
+    Args:
+        pending: 分配时读取到的待分配意向数，加锁后不一致（其他分配已写入或意向有变化）时拒绝写入
+    """
+    batch = settings.LOTTERY_INSERT_BATCH
+    now = datetime.now()
+    with db_pool.get_cursor(commit=True, partition="enroll") as cursor:
+        # 锁定学期行后才读取，看到的是其他分配提交之后的数据
+        cursor.execute("SELECT `学期ID` FROM `学期信息表` WHERE `学期ID` = %s FOR UPDATE", (semester_id,))
+        cursor.execute(
+            "SELECT COUNT(*) AS n FROM `选课意向表` w "
+            "JOIN `开课实例表` oi ON w.`开课实例ID` = oi.`开课实例ID` "
+            "WHERE oi.`学期ID` = %s AND w.`状态` = '待分配' "
+            "FOR UPDATE OF w", (semester_id,))
+        if cursor.fetchone()["n"] != pending:
+            raise BusinessError("选课意向已被其他分配处理或已变化，本次分配未写入，请重新分配")
+
+        try:
+            cursor.execute("SET @_bulk_load = 1")
+            for start in range(0, len(assignments), batch):
+                cursor.executemany(
+                    "INSERT INTO `选课记录表` (`学生ID`, `开课实例ID`, `选课时间`) "
+                    "VALUES (%s, %s, %s)",
+                    [(s, i, now) for s, i in assignments[start:start + batch]])
+        except pymysql.IntegrityError as e:
+            raise BusinessError("分配期间选课数据已变化，部分学生已有相同选课记录，已回滚，请重新分配") from e
+        finally:
+            cursor.execute("SET @_bulk_load = NULL")
+
+        cursor.execute("CALL sp_refresh_enroll_counts(%s)", (semester_id,))
+        if over_quota(cursor, semester_id):
+            raise BusinessError("分配期间选课数据已变化，部分开课实例超出名额，已回滚，请重新分配")
+        cursor.execute(
+            "SELECT sc.`学生ID` FROM `选课记录表` sc "
+            "JOIN `开课实例表` oi ON sc.`开课实例ID` = oi.`开课实例ID` "
+            "WHERE oi.`学期ID` = %s "
+            "GROUP BY sc.`学生ID`, oi.`课程ID` HAVING COUNT(*) > 1 LIMIT 1", (semester_id,))
+        if cursor.fetchone() is not None or time_conflicts(cursor, semester_id):
+            raise BusinessError("分配期间选课数据已变化，部分学生课表出现时间冲突或重复课程，已回滚，请重新分配")
+
+        cursor.execute(
+            "UPDATE `选课意向表` w "
+            "JOIN `开课实例表` oi ON w.`开课实例ID` = oi.`开课实例ID` "
+            "LEFT JOIN `选课记录表` sc ON sc.`学生ID` = w.`学生ID` AND sc.`开课实例ID` = w.`开课实例ID` "
+            "SET w.`状态` = IF(sc.`学生ID` IS NULL, '未中签', '已中签') "
+            "WHERE oi.`学期ID` = %s AND w.`状态` = '待分配'", (semester_id,))
+
+
+async def run_lottery(semester_id: int, seed: Optional[int] = None,
+                      workers: Optional[int] = None, dry_run: bool = False) -> dict:
+    """读取意向、分配并写入结果（dry_run 时只分配不写入），返回统计信息"""
+    seed = int(time.time()) if seed is None else seed
+    workers = settings.LOTTERY_WORKERS if workers is None else workers
+
+    students, instances, intents = await db_pool.partition("report").run_sync(load_semester, semester_id)
+    if not intents:
+        raise BusinessError("该学期没有待分配的选课意向")
+
+    # 分配是 CPU 密集的纯计算，放在数据库线程池之外的线程中执行，不阻塞事件循环
+    result = await asyncio.to_thread(allocate, students, instances, intents, seed, workers)
+    logger.info(f"学期 {semester_id} 抽签分配完成: seed={seed}, {result.summary}")
+
+    if not dry_run:
+        await db_pool.partition("enroll").run_sync(
+            write_allocation, semester_id, result.assignments, len(intents))
+        _m_assigned.inc(len(result.assignments))
+
+    return {"semester_id": semester_id, "seed": seed, "students": len(students),
+            "intents": len(intents), "dry_run": dry_run, **result.summary}
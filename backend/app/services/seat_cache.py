@@ -0,0 +1,183 @@
+"""
+选课剩余名额缓存
+在进程内缓存当前学期各开课实例的对内/对外剩余名额，选课时先查缓存：
+学生所属类别的剩余名额为 0 时直接返回"名额已满"，不再借连接、开事务、走触发器。
+
+缓存只用来拒绝"肯定已满"的请求，有剩余名额或信息不全（学生院系未知等）时一律交给数据库判断：
+- 本进程内选课成功、退课成功、数据库返回名额已满时立即更新
+- 后台每 SEAT_CACHE_REFRESH_INTERVAL 秒从开课实例表全量对账，纠正其他进程/管理操作造成的偏差
+- 超过 SEAT_CACHE_MAX_AGE 秒未对账成功的缓存不再使用
+- 对账读取期间本进程的退课记录下来，替换缓存后重新放宽一次，避免旧快照把刚释放的名额覆盖成已满；
+  期间的选课、名额已满不重放（旧快照只会多估剩余名额，交给数据库判断，下次对账纠正）
+
+多进程部署时每个进程各自维护缓存并独立对账，其他进程退课释放的名额最多延迟一个对账周期可见。
+"""
+import asyncio
+import time
+from contextlib import suppress
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.database import db_pool
+from app.utils.logger import logger
+from app.utils.metrics import metrics
+
+FULL_INNER = "选课失败: 本院系名额已满"
+FULL_OUTER = "选课失败: 跨院系名额已满"
+
+
+@dataclass
+class SeatEntry:
+    """一个开课实例的剩余名额"""
+    dept_id: int        # 开课院系
+    inner_left: int     # 对内剩余名额
+    outer_left: int     # 对外剩余名额
+
+
+class SeatCache:
+    """开课实例剩余名额缓存（只在事件循环线程中读写）"""
+
+    def __init__(self):
+        self._seats: Dict[int, SeatEntry] = {}
+        self._student_dept: Dict[int, int] = {}
+        self._refreshed_at = 0.0
+        self._students_refreshed_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._dropped_while_loading: Optional[List[Tuple[int, int]]] = None
+        self._m_rejected = metrics.counter("seat_cache_rejections_total", "被名额缓存直接拒绝的选课请求数")
+        self._m_entries = metrics.gauge("seat_cache_instances", "名额缓存中的开课实例数")
+
+    @property
+    def fresh(self) -> bool:
+        return (settings.SEAT_CACHE_ENABLED
+                and time.monotonic() - self._refreshed_at <= settings.SEAT_CACHE_MAX_AGE)
+
+    def _is_inner(self, student_id: int, entry: SeatEntry) -> Optional[bool]:
+        dept_id = self._student_dept.get(student_id)
+        return None if dept_id is None else dept_id == entry.dept_id
+
+    def check(self, student_id: int, instance_id: int) -> Optional[str]:
+        """名额肯定已满时返回失败消息，否则返回 None（交给数据库判断）"""
+        if not self.fresh:
+            return None
+        entry = self._seats.get(instance_id)
+        if entry is None:
+            return None
+        inner = self._is_inner(student_id, entry)
+        if inner is None:
+            # 不知道学生院系时，只有两类名额都已满才能确定
+            message = FULL_INNER if entry.inner_left <= 0 and entry.outer_left <= 0 else None
+        elif inner:
+            message = FULL_INNER if entry.inner_left <= 0 else None
+        else:
+            message = FULL_OUTER if entry.outer_left <= 0 else None
+        if message is not None:
+            self._m_rejected.inc()
+        return message
+
+    def on_enrolled(self, student_id: int, instance_id: int):
+        self._adjust(student_id, instance_id, -1)
+
+    def on_dropped(self, student_id: int, instance_id: int):
+        self._adjust(student_id, instance_id, 1)
+        if self._dropped_while_loading is not None:
+            self._dropped_while_loading.append((student_id, instance_id))
+
+    def on_rejected(self, student_id: int, instance_id: int, message: str):
+        """数据库返回名额已满时同步缓存"""
+        entry = self._seats.get(instance_id)
+        if entry is None or "名额已满" not in message:
+            return
+        if "本院系" in message:
+            entry.inner_left = 0
+            self._student_dept.setdefault(student_id, entry.dept_id)
+        elif "跨院系" in message:
+            entry.outer_left = 0
+        else:
+            inner = self._is_inner(student_id, entry)
+            if inner is True:
+                entry.inner_left = 0
+            elif inner is False:
+                entry.outer_left = 0
+
+    def _adjust(self, student_id: int, instance_id: int, delta: int):
+        entry = self._seats.get(instance_id)
+        if entry is None:
+            return
+        inner = self._is_inner(student_id, entry)
+        if inner is True:
+            entry.inner_left += delta
+        elif inner is False:
+            entry.outer_left += delta
+        elif delta > 0:
+            # 退课的学生类别未知：放宽两类名额，避免误拒，下次对账时纠正
+            entry.inner_left = max(entry.inner_left, 1)
+            entry.outer_left = max(entry.outer_left, 1)
+
+    # ---------- 对账 ----------
+
+    def _load_seats(self) -> Dict[int, SeatEntry]:
+        """读取当前学期各开课实例的剩余名额（同步，在数据库线程中执行）"""
+        with db_pool.get_cursor(partition="read") as cursor:
+            cursor.execute(
+                "SELECT oi.`开课实例ID`, c.`院系ID`, "
+                "       oi.`对内名额` - oi.`已选对内人数` AS `对内剩余`, "
+                "       oi.`对外名额` - oi.`已选对外人数` AS `对外剩余` "
+                "FROM `开课实例表` oi "
+                "JOIN `课程信息表` c ON oi.`课程ID` = c.`课程ID` "
+                "JOIN `学期信息表` s ON oi.`学期ID` = s.`学期ID` "
+                "WHERE s.`是否当前学期` = TRUE"
+            )
+            return {
+                row["开课实例ID"]: SeatEntry(row["院系ID"], int(row["对内剩余"]), int(row["对外剩余"]))
+                for row in cursor.fetchall()
+            }
+
+    def _load_students(self) -> Dict[int, int]:
+        with db_pool.get_cursor(partition="read") as cursor:
+            cursor.execute("SELECT `用户ID`, `院系ID` FROM `用户信息表` WHERE `角色` = '学生'")
+            return {row["用户ID"]: row["院系ID"] for row in cursor.fetchall()}
+
+    async def refresh(self):
+        """与开课实例表对账（学生院系按 SEAT_CACHE_STUDENT_REFRESH_INTERVAL 单独刷新）"""
+        pool = db_pool.partition("read")
+        now = time.monotonic()
+        if now - self._students_refreshed_at >= settings.SEAT_CACHE_STUDENT_REFRESH_INTERVAL:
+            self._student_dept = await pool.run_sync(self._load_students)
+            self._students_refreshed_at = now
+        # 以数据库为准整体替换；读取期间的退课可能不在快照中，替换后重新放宽，
+        # 重复放宽（退课已在快照中）只会多估剩余名额，由数据库判断并在下次对账纠正
+        self._dropped_while_loading = []
+        try:
+            seats = await pool.run_sync(self._load_seats)
+            dropped = self._dropped_while_loading
+        finally:
+            self._dropped_while_loading = None
+        self._seats = seats
+        for student_id, instance_id in dropped:
+            self._adjust(student_id, instance_id, 1)
+        self._refreshed_at = time.monotonic()
+        self._m_entries.set(len(self._seats))
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"名额缓存对账失败: {str(e)}")
+            await asyncio.sleep(settings.SEAT_CACHE_REFRESH_INTERVAL)
+
+    def start(self):
+        if settings.SEAT_CACHE_ENABLED and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._refresh_loop())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+
+
+seat_cache = SeatCache()
@@ -0,0 +1,150 @@
+"""
+课表时间位图
+与数据库中的表示一致（见 03_procedures.sql 的 fn_week_mask / sp_refresh_time_bitmap）：
+
+- 周次掩码：第 (周次-1) 位表示该周上课，已按单双周过滤
+- 时间位图：2048 位（BINARY(256)，大端），第 (时间段ID-1)*20 + (周次-1) 位表示该时间段该周上课
+
+两个开课实例（或学生已选课程的按位或）位图按位与不为 0 即时间冲突。
+批量检查（一个学生 vs 大量候选开课实例、候选实例两两之间）在安装了 NumPy 时向量化执行，
+否则退化为逐个整数按位与，结果相同。
+"""
+import time
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from app.config import settings
+from app.database import db_pool
+from app.utils.logger import logger
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy 为可选依赖
+    np = None
+
+WEEKS = 20
+BITMAP_BYTES = 256
+MAX_TIMESLOT_ID = BITMAP_BYTES * 8 // WEEKS     # 102
+_WORDS = BITMAP_BYTES // 8
+
+_PARITY_MASKS = {
+    "全部": 0xFFFFF,
+    "单周": 0x55555,
+    "双周": 0xAAAAA,
+}
+
+
+def week_mask(start: int, end: int, parity: str = "全部") -> int:
+    """第 start-end 周（含）的周次掩码"""
+    if not 1 <= start <= end <= WEEKS:
+        raise ValueError(f"周次范围无效: {start}-{end}")
+    return ((1 << end) - (1 << (start - 1))) & _PARITY_MASKS[parity]
+
+
+def slot_bitmap(timeslot_id: int, start: int, end: int, parity: str = "全部") -> int:
+    """一条上课时间对应的时间位图"""
+    if not 1 <= timeslot_id <= MAX_TIMESLOT_ID:
+        raise ValueError(f"时间段ID超出时间位图范围: {timeslot_id}")
+    return week_mask(start, end, parity) << ((timeslot_id - 1) * WEEKS)
+
+
+def instance_bitmap(rows: Iterable[dict]) -> int:
+    """由上课时间表的行（时间段ID、起始周、结束周、单双周）计算开课实例的时间位图"""
+    bitmap = 0
+    for row in rows:
+        bitmap |= slot_bitmap(row["时间段ID"], row["起始周"], row["结束周"], row.get("单双周", "全部"))
+    return bitmap
+
+
+def from_db(value: Optional[bytes]) -> int:
+    """数据库中的 BINARY(256) 转为整数，NULL 视为没有上课时间"""
+    return int.from_bytes(value, "big") if value else 0
+
+
+def to_db(bitmap: int) -> bytes:
+    return bitmap.to_bytes(BITMAP_BYTES, "big")
+
+
+def conflicts(a: int, b: int) -> bool:
+    return (a & b) != 0
+
+
+class BitmapMatrix:
+    """一组开课实例的时间位图，用于批量冲突检查"""
+
+    def __init__(self, bitmaps: Dict[int, int]):
+        self.ids: List[int] = list(bitmaps)
+        self._ints = [bitmaps[i] for i in self.ids]
+        self._array = None
+        if np is not None and self.ids:
+            raw = b"".join(to_db(bitmap) for bitmap in self._ints)
+            self._array = np.frombuffer(raw, dtype=">u8").reshape(len(self.ids), _WORDS)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def free_with(self, occupied: int) -> List[int]:
+        """与已占用位图不冲突的开课实例ID"""
+        if self._array is None:
+            return [i for i, bitmap in zip(self.ids, self._ints) if not bitmap & occupied]
+        row = np.frombuffer(to_db(occupied), dtype=">u8")
+        mask = ~(self._array & row).any(axis=1)
+        return [self.ids[index] for index in np.flatnonzero(mask)]
+
+    def conflict_matrix(self) -> Sequence[Sequence[bool]]:
+        """两两冲突矩阵（对角线为 False）"""
+        n = len(self.ids)
+        if self._array is None:
+            return [[i != j and conflicts(self._ints[i], self._ints[j]) for j in range(n)]
+                    for i in range(n)]
+        matrix = np.zeros((n, n), dtype=bool)
+        # 按行计算，避免 n*n*32 的中间数组占用过多内存
+        for i in range(n):
+            matrix[i] = (self._array & self._array[i]).any(axis=1)
+        np.fill_diagonal(matrix, False)
+        return matrix
+
+
+class TimetableCache:
+    """当前学期各开课实例时间位图的进程内缓存，超过 TIMETABLE_CACHE_TTL 秒后重新加载"""
+
+    def __init__(self):
+        self._bitmaps: Dict[int, int] = {}
+        self._matrix: Optional[BitmapMatrix] = None
+        self._loaded_at = 0.0
+
+    def _load(self) -> Dict[int, int]:
+        """同步加载，在数据库线程中执行"""
+        with db_pool.get_cursor(partition="read") as cursor:
+            cursor.execute(
+                "SELECT oi.`开课实例ID`, oi.`时间位图` "
+                "FROM `开课实例表` oi "
+                "JOIN `学期信息表` s ON oi.`学期ID` = s.`学期ID` "
+                "WHERE s.`是否当前学期` = TRUE"
+            )
+            return {row["开课实例ID"]: from_db(row["时间位图"]) for row in cursor.fetchall()}
+
+    def _expired(self) -> bool:
+        return time.monotonic() - self._loaded_at > settings.TIMETABLE_CACHE_TTL
+
+    async def bitmaps(self) -> Dict[int, int]:
+        if self._expired():
+            await self.refresh()
+        return self._bitmaps
+
+    async def matrix(self) -> BitmapMatrix:
+        if self._expired() or self._matrix is None:
+            await self.refresh()
+        return self._matrix
+
+    async def refresh(self):
+        self._bitmaps = await db_pool.partition("read").run_sync(self._load)
+        self._matrix = BitmapMatrix(self._bitmaps)
+        self._loaded_at = time.monotonic()
+        logger.debug(f"课表时间位图缓存已加载: {len(self._bitmaps)} 个开课实例")
+
+    def invalidate(self):
+        """排课变更后调用，下次使用时重新加载"""
+        self._loaded_at = 0.0
+
+
+timetable_cache = TimetableCache()
@@ -0,0 +1,341 @@
+"""
+选课排队（虚拟等候室）
+当前学期选课开始时全校学生同时请求选课接口，排队期间选课与可选课程接口不再直接进入数据库：
+第一次请求领取一个签名的排队号，服务端从选课开始时刻起每秒放行 WAITING_ROOM_RATE 个排队号
+（开始时立即放行 WAITING_ROOM_BURST 个），未放行的请求直接返回 429 和当前位次、预计等待时间。
+
+- 排队时间取当前学期的 `选课开始时间` 起 WAITING_ROOM_DURATION 秒（不超过 `选课结束时间`），
+  每 WAITING_ROOM_REFRESH_INTERVAL 秒重新读取；抽签学期不排队
+- 排队号用 SECRET_KEY 签名并绑定学期与学生，客户端在 X-Queue-Ticket 请求头中带回；
+  放行后本次排队期间一直有效
+- 每个学生每轮排队只领一个号：不带排队号重复请求时返回已发放的号，不重新排到队尾
+  （按进程记录，开启共享计数时同一学生最多在每个工作进程各领一个号）
+- 放行进度只由时间决定，各进程只需共享排队号计数：默认每个进程独立计数（放行速率按进程计），
+  开启 WAITING_ROOM_SHARED 后通过共享内存全局递增
+"""
+import asyncio
+import hashlib
+import hmac
+import math
+import os
+import re
+import struct
+import sys
+import tempfile
+import time
+from contextlib import suppress
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+
+from app.config import settings
+from app.database import db_pool
+from app.utils.logger import logger
+from app.utils.metrics import metrics
+
+TICKET_HEADER = "X-Queue-Ticket"
+
+# 排队期间需要排队号的接口：选课、批量选课、查询可选课程
+GATED_PATH = re.compile(r"^/api/students/(\d+)/(?:enroll(?:/batch)?|available-courses)/?$")
+
+
+@dataclass
+class GateWindow:
+    """当前学期的排队时间（time.monotonic() 时间）"""
+    semester_id: int
+    key: int            # 学期与选课开始时间，用于区分不同的排队周期
+    opens_at: float
+    closes_at: float
+
+
+@dataclass
+class Admission:
+    """一次请求的排队结果"""
+    admitted: bool
+    ticket: str
+    position: int = 0       # 前面还有多少个排队号
+    eta: float = 0.0        # 预计等待秒数
+
+
+class _LocalCounter:
+    """进程内排队号计数"""
+
+    def __init__(self):
+        self._key: Optional[int] = None
+        self._value = 0
+
+    def next(self, key: int) -> int:
+        if key != self._key:
+            self._key, self._value = key, 0
+        self._value += 1
+        return self._value
+
+    def current(self, key: int) -> int:
+        return self._value if key == self._key else 0
+
+    def close(self):
+        pass
+
+
+class _SharedCounter:
+    """
+    共享内存排队号计数（同一台机器上的多个工作进程共用，文件锁保证递增原子性）
+
+    共享内存段不属于任何一个工作进程：close() 只断开本进程的映射，不删除共享内存段，
+    也不登记到 resource_tracker（否则任意一个进程退出时都会删除其他进程仍在使用的段）。
+    工作进程重启后重新连接同一个段，继续递增，不会重复发放已发出的排队号；
+    上一轮排队留下的计数按排队周期区分，自动作废。停止全部工作进程后可调用 unlink() 删除。
+    """
+
+    _LAYOUT = struct.Struct("qq")   # 排队周期, 已发放的排队号
+
+    def __init__(self, name: str):
+        import fcntl
+        from multiprocessing import shared_memory
+
+        self._fcntl = fcntl
+        self._lock_path = os.path.join(tempfile.gettempdir(), f"{name}.lock")
+        self._lock = open(self._lock_path, "a+")
+        # 创建与初始化在文件锁内完成，其他进程不会连接到尚未初始化的段
+        fcntl.flock(self._lock, fcntl.LOCK_EX)
+        try:
+            try:
+                self._shm = self._open(shared_memory, name, create=True, size=self._LAYOUT.size)
+                self._LAYOUT.pack_into(self._shm.buf, 0, 0, 0)
+            except FileExistsError:
+                self._shm = self._open(shared_memory, name)
+        finally:
+            fcntl.flock(self._lock, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _open(shared_memory, name: str, **kwargs):
+        if sys.version_info >= (3, 13):
+            return shared_memory.SharedMemory(name=name, track=False, **kwargs)
+        from multiprocessing import resource_tracker
+
+        shm = shared_memory.SharedMemory(name=name, **kwargs)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+    def _update(self, key: int, delta: int) -> int:
+        self._fcntl.flock(self._lock, self._fcntl.LOCK_EX)
+        try:
+            stored_key, value = self._LAYOUT.unpack_from(self._shm.buf, 0)
+            if stored_key != key:
+                value = 0
+            value += delta
+            if delta:
+                self._LAYOUT.pack_into(self._shm.buf, 0, key, value)
+            return value
+        finally:
+            self._fcntl.flock(self._lock, self._fcntl.LOCK_UN)
+
+    def next(self, key: int) -> int:
+        return self._update(key, 1)
+
+    def current(self, key: int) -> int:
+        return self._update(key, 0)
+
+    def close(self):
+        self._shm.close()
+        self._lock.close()
+
+    def unlink(self):
+        """删除共享内存段和锁文件（其他进程不再使用时调用）"""
+        import _posixshmem
+
+        # 不经过 SharedMemory.unlink()：段没有登记在 resource_tracker 中，再注销一次会报 KeyError
+        _posixshmem.shm_unlink(self._shm._name)
+        with suppress(FileNotFoundError):
+            os.remove(self._lock_path)
+
+
+class WaitingRoom:
+    """选课排队（只在事件循环线程中读写）"""
+
+    def __init__(self, shared: Optional[bool] = None):
+        self._shared = settings.WAITING_ROOM_SHARED if shared is None else shared
+        self._counter = None
+        self._issued: Dict[int, int] = {}       # 学生ID -> 本轮排队已发放的排队号
+        self._issued_key: Optional[int] = None
+        self.window: Optional[GateWindow] = None
+        self._task: Optional[asyncio.Task] = None
+        self._m_tickets = metrics.counter("waiting_room_tickets_total", "发放的选课排队号数")
+        self._m_queued = metrics.counter("waiting_room_queued_total", "因排队未放行而直接返回的请求数")
+        self._m_waiting = metrics.gauge("waiting_room_waiting", "已领取但尚未放行的排队号数")
+
+    @property
+    def counter(self):
+        if self._counter is None:
+            self._counter = _LocalCounter()
+            if self._shared:
+                try:
+                    self._counter = _SharedCounter(f"{settings.DB_NAME}_waiting_room")
+                except (ImportError, OSError) as e:
+                    logger.warning(f"共享内存排队计数不可用，改为进程内计数: {str(e)}")
+        return self._counter
+
+    def active(self, now: Optional[float] = None) -> bool:
+        window = self.window
+        if window is None or not settings.WAITING_ROOM_ENABLED:
+            return False
+        now = time.monotonic() if now is None else now
+        return window.opens_at <= now < window.closes_at
+
+    def admitted_upto(self, now: float) -> int:
+        """到 now 为止放行到的排队号"""
+        elapsed = max(0.0, now - self.window.opens_at)
+        return settings.WAITING_ROOM_BURST + int(elapsed * settings.WAITING_ROOM_RATE)
+
+    # ---------- 排队号 ----------
+
+    def _sign(self, payload: str) -> str:
+        digest = hmac.new(settings.SECRET_KEY.encode(), payload.encode(), hashlib.sha256)
+        return digest.hexdigest()[:16]
+
+    def issue(self, student_id: int) -> str:
+        """发放排队号；本轮排队已给该学生发过号时重新签发同一个号"""
+        key = self.window.key
+        if key != self._issued_key:
+            self._issued, self._issued_key = {}, key
+        number = self._issued.get(student_id)
+        if number is None:
+            number = self.counter.next(key)
+            self._issued[student_id] = number
+            self._m_tickets.inc()
+        payload = f"{key}.{student_id}.{number}"
+        return f"{payload}.{self._sign(payload)}"
+
+    def parse(self, ticket: Optional[str], student_id: int) -> Optional[int]:
+        """校验排队号，返回其序号；签名不符、不属于本次排队或其他学生时返回 None"""
+        if not ticket:
+            return None
+        parts = ticket.split(".")
+        if len(parts) != 4:
+            return None
+        payload = ".".join(parts[:3])
+        if not hmac.compare_digest(parts[3], self._sign(payload)):
+            return None
+        try:
+            key, owner, number = (int(p) for p in parts[:3])
+        except ValueError:
+            return None
+        if key != self.window.key or owner != student_id:
+            return None
+        return number
+
+    def admit(self, student_id: int, ticket: Optional[str] = None,
+              now: Optional[float] = None) -> Admission:
+        """判断请求是否放行（调用前先确认 active()）；没有有效排队号时发放排队号（本轮已领过号的学生重新签发原号）"""
+        now = time.monotonic() if now is None else now
+        number = self.parse(ticket, student_id)
+        if number is None:
+            ticket = self.issue(student_id)
+            number = self.parse(ticket, student_id)
+
+        upto = self.admitted_upto(now)
+        self._m_waiting.set(max(0, self.counter.current(self.window.key) - upto))
+        if number <= upto:
+            return Admission(True, ticket)
+
+        self._m_queued.inc()
+        position = number - upto
+        rate = max(settings.WAITING_ROOM_RATE, 1e-6)
+        eta = min(position / rate, max(0.0, self.window.closes_at - now))
+        return Admission(False, ticket, position=position, eta=eta)
+
+    # ---------- 学期选课时间 ----------
+
+    def _load_window(self) -> Optional[dict]:
+        """读取当前学期距选课开始/结束的秒数（以数据库时间为准，同步，在数据库线程中执行）"""
+        with db_pool.get_cursor(partition="read") as cursor:
+            cursor.execute(
+                "SELECT `学期ID`, UNIX_TIMESTAMP(`选课开始时间`) AS `开始时间戳`, "
+                "       TIMESTAMPDIFF(SECOND, NOW(), `选课开始时间`) AS `距开始`, "
+                "       TIMESTAMPDIFF(SECOND, NOW(), `选课结束时间`) AS `距结束` "
+                "FROM `学期信息表` "
+                "WHERE `是否当前学期` = TRUE AND `选课模式` = '先到先得' "
+                "  AND `选课开始时间` IS NOT NULL AND `选课结束时间` IS NOT NULL "
+                "LIMIT 1"
+            )
+            return cursor.fetchone()
+
+    async def refresh(self):
+        row = await db_pool.partition("read").run_sync(self._load_window)
+        if row is None:
+            self.window = None
+            return
+        now = time.monotonic()
+        opens_at = now + int(row["距开始"])
+        closes_at = min(opens_at + settings.WAITING_ROOM_DURATION, now + int(row["距结束"]))
+        key = (int(row["学期ID"]) << 40) | int(row["开始时间戳"])
+        self.window = GateWindow(int(row["学期ID"]), key, opens_at, closes_at)
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"读取选课排队时间失败: {str(e)}")
+            await asyncio.sleep(settings.WAITING_ROOM_REFRESH_INTERVAL)
+
+    def start(self):
+        if settings.WAITING_ROOM_ENABLED and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._refresh_loop())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+        if self._counter is not None:
+            self._counter.close()
+            self._counter = None
+
+
+class WaitingRoomMiddleware:
+    """排队中间件：排队期间未放行的选课/可选课程请求直接返回 429，不进入路由和数据库"""
+
+    def __init__(self, app, room: Optional[WaitingRoom] = None):
+        self.app = app
+        self.room = room
+
+    async def __call__(self, scope, receive, send):
+        room = self.room or waiting_room
+        match = GATED_PATH.match(scope["path"]) if scope["type"] == "http" else None
+        if match is None or not room.active():
+            await self.app(scope, receive, send)
+            return
+
+        admission = room.admit(int(match.group(1)), Headers(scope=scope).get(TICKET_HEADER))
+        if not admission.admitted:
+            retry_after = max(1, math.ceil(min(admission.eta, 60)))
+            response = JSONResponse(
+                status_code=429,
+                content={
+                    "success": False,
+                    "code": 429,
+                    "message": f"选课排队中，前面还有 {admission.position} 人，预计等待 {math.ceil(admission.eta)} 秒",
+                    "data": {
+                        "ticket": admission.ticket,
+                        "position": admission.position,
+                        "eta_seconds": math.ceil(admission.eta),
+                    }
+                },
+                headers={TICKET_HEADER: admission.ticket, "Retry-After": str(retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+
+        async def send_with_ticket(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[TICKET_HEADER] = admission.ticket
+            await send(message)
+
+        await self.app(scope, receive, send_with_ticket)
+
+
+waiting_room = WaitingRoom()
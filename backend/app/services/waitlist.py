@@ -0,0 +1,98 @@
+"""
+候补补选工作协程
+有学生退课后为候补队列中的学生自动补选（sp_waitlist_promote），学生不必反复请求选课接口。
+
+- 本进程的退课接口成功后调用 notify()，立即为该开课实例补选
+- 每 WAITLIST_POLL_INTERVAL 秒扫描一次"有人等待且对应类别有空余名额"的开课实例，
+  覆盖其他进程、管理员操作等途径释放的名额
+"""
+import asyncio
+from contextlib import suppress
+from typing import List, Optional, Set
+
+from app.config import settings
+from app.dal.stored_procedures import sp
+from app.database import db_pool
+from app.utils.logger import logger
+from app.utils.metrics import metrics
+
+
+class WaitlistPromoter:
+    """候补补选后台任务"""
+
+    def __init__(self):
+        self._pending: Set[int] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._m_promoted = metrics.counter("waitlist_promotions_total", "候补补选成功人数")
+        self._m_runs = metrics.counter("waitlist_promote_runs_total", "候补补选执行次数")
+
+    def notify(self, instance_id: int):
+        """有名额释放（退课成功）时调用"""
+        if self._wakeup is None:
+            return
+        self._pending.add(instance_id)
+        self._wakeup.set()
+
+    async def promote(self, instance_id: int) -> int:
+        """为一个开课实例补选，返回录取人数"""
+        async def _promote(cursor):
+            return await cursor.run(sp.sp_waitlist_promote, instance_id)
+
+        self._m_runs.inc()
+        promoted = await db_pool.run_transaction(
+            _promote, operation="waitlist_promote", commit=True, partition="enroll")
+        if promoted:
+            self._m_promoted.inc(promoted)
+            logger.info(f"开课实例 {instance_id} 候补补选 {promoted} 人")
+        return promoted
+
+    @staticmethod
+    def _find_promotable() -> List[int]:
+        """有人等待且对应类别有空余名额的开课实例（同步，在数据库线程中执行）"""
+        with db_pool.get_cursor(partition="enroll") as cursor:
+            cursor.execute(
+                "SELECT DISTINCT w.`开课实例ID` "
+                "FROM `候补队列表` w "
+                "JOIN `开课实例表` oi ON w.`开课实例ID` = oi.`开课实例ID` "
+                "WHERE w.`状态` = '等待' AND ("
+                "  (w.`名额类型` = '对内' AND oi.`已选对内人数` < oi.`对内名额`) OR "
+                "  (w.`名额类型` = '对外' AND oi.`已选对外人数` < oi.`对外名额`))"
+            )
+            return [row["开课实例ID"] for row in cursor.fetchall()]
+
+    async def _run(self):
+        while True:
+            polled = False
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), settings.WAITLIST_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                polled = True
+            self._wakeup.clear()
+            instance_ids, self._pending = self._pending, set()
+            if polled:
+                try:
+                    instance_ids |= set(await db_pool.partition("enroll").run_sync(self._find_promotable))
+                except Exception as e:
+                    logger.warning(f"扫描候补队列失败: {str(e)}")
+            for instance_id in sorted(instance_ids):
+                try:
+                    await self.promote(instance_id)
+                except Exception as e:
+                    logger.warning(f"开课实例 {instance_id} 候补补选失败: {str(e)}")
+
+    def start(self):
+        if settings.WAITLIST_ENABLED and self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+        self._wakeup = None
+
+
+waitlist_promoter = WaitlistPromoter()
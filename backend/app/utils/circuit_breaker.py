@@ -0,0 +1,83 @@
+"""
+熔断器
+连续失败达到阈值后进入打开状态，在冷却期内直接拒绝请求；冷却期结束后进入半开状态，
+放行一个试探请求，成功则关闭熔断，失败则重新打开。
+"""
+import math
+import threading
+import time
+from typing import Optional
+
+
+class CircuitBreaker:
+    """线程安全的连续失败计数熔断器"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._trial_started = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def _refresh(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = False
+
+    def allow(self) -> Optional[int]:
+        """
+        判断是否放行请求
+
+        Returns:
+            None 表示放行；否则返回建议的重试等待秒数
+        """
+        if self.failure_threshold <= 0:
+            return None
+        with self._lock:
+            self._refresh()
+            if self._state == self.CLOSED:
+                return None
+            if self._state == self.HALF_OPEN and (
+                    not self._trial_in_flight
+                    or time.monotonic() - self._trial_started >= self.reset_timeout):
+                # 放行试探请求；试探请求长时间没有结果时允许再放行一个
+                self._trial_in_flight = True
+                self._trial_started = time.monotonic()
+                return None
+            if self._state == self.HALF_OPEN:
+                return 1
+            remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+            return max(1, math.ceil(remaining))
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._state = self.CLOSED
+            self._trial_in_flight = False
+
+    def record_failure(self) -> bool:
+        """记录一次失败，返回本次是否触发熔断"""
+        if self.failure_threshold <= 0:
+            return False
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or (
+                    self._state == self.CLOSED and self._failures >= self.failure_threshold):
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+                return True
+            return False
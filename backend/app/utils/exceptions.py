@@ -100,3 +100,17 @@ class BusinessError(BaseAPIException):
             code="BUSINESS_ERROR",
             details=details
         )
+
+
+class ServiceUnavailableError(BaseAPIException):
+    """服务暂不可用（如数据库连接池过载、熔断），客户端应在 retry_after 秒后重试"""
+    
+    def __init__(self, message: str = "服务繁忙，请稍后重试", retry_after: int = 1,
+                 details: Optional[Any] = None):
+        super().__init__(
+            message=message,
+            status_code=503,
+            code="SERVICE_UNAVAILABLE",
+            details=details
+        )
+        self.retry_after = retry_after
@@ -0,0 +1,195 @@
+"""
+进程内指标收集
+提供 Counter / Gauge / Histogram 三种指标，支持 Prometheus 文本格式导出
+"""
+import bisect
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+# 默认延迟分桶（秒）
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 连接持有时间分桶（秒）
+HOLD_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Optional[Dict[str, str]]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in (labels or {}).items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(key) + ([extra] if extra else [])
+    if not items:
+        return ""
+    body = ",".join(f'{k}="{v}"' for k, v in items)
+    return "{" + body + "}"
+
+
+class Counter:
+    """单调递增计数器"""
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class Gauge:
+    """可增可减的瞬时值"""
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, value: float):
+        with self._lock:
+            self._value = value
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self._value -= amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class Histogram:
+    """固定分桶直方图"""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # 最后一个为 +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+            if value > self._max:
+                self._max = value
+
+    def quantile(self, q: float) -> float:
+        """按分桶上界估算分位数（落在 +Inf 桶时返回观测到的最大值）"""
+        with self._lock:
+            if self._count == 0:
+                return 0.0
+            target = q * self._count
+            running = 0
+            for index, count in enumerate(self._counts):
+                running += count
+                if running >= target:
+                    return self.buckets[index] if index < len(self.buckets) else self._max
+            return self._max
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            cumulative = []
+            running = 0
+            for count in self._counts:
+                running += count
+                cumulative.append(running)
+            count, total, maximum = self._count, self._sum, self._max
+        return {
+            "count": count,
+            "sum": total,
+            "max": maximum,
+            "mean": total / count if count else 0.0,
+            "buckets": {
+                **{str(b): cumulative[i] for i, b in enumerate(self.buckets)},
+                "+Inf": cumulative[-1],
+            },
+        }
+
+
+class MetricsRegistry:
+    """指标注册表：按 (名称, 标签) 管理指标实例"""
+
+    def __init__(self):
+        self._metrics: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, kind: str, name: str, description: str,
+             labels: Optional[Dict[str, str]], factory):
+        key = _label_key(labels)
+        with self._lock:
+            family = self._metrics.get(name)
+            if family is None:
+                family = {"type": kind, "help": description, "children": {}}
+                self._metrics[name] = family
+            elif family["type"] != kind:
+                raise ValueError(f"指标 {name} 已注册为 {family['type']}")
+            child = family["children"].get(key)
+            if child is None:
+                child = factory()
+                family["children"][key] = child
+            return child
+
+    def counter(self, name: str, description: str = "",
+                labels: Optional[Dict[str, str]] = None) -> Counter:
+        return self._get("counter", name, description, labels, Counter)
+
+    def gauge(self, name: str, description: str = "",
+              labels: Optional[Dict[str, str]] = None) -> Gauge:
+        return self._get("gauge", name, description, labels, Gauge)
+
+    def histogram(self, name: str, description: str = "",
+                  labels: Optional[Dict[str, str]] = None,
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._get("histogram", name, description, labels, lambda: Histogram(buckets))
+
+    def snapshot(self, prefix: str = "") -> dict:
+        """导出为 JSON 友好的字典"""
+        result = {}
+        with self._lock:
+            families = {n: dict(f, children=dict(f["children"]))
+                        for n, f in self._metrics.items() if n.startswith(prefix)}
+        for name, family in families.items():
+            entries = []
+            for key, metric in family["children"].items():
+                value = metric.snapshot() if isinstance(metric, Histogram) else metric.value
+                entries.append({"labels": dict(key), "value": value})
+            result[name] = entries
+        return result
+
+    def render_prometheus(self) -> str:
+        """导出为 Prometheus 文本格式"""
+        lines: List[str] = []
+        with self._lock:
+            families = {n: dict(f, children=dict(f["children"])) for n, f in self._metrics.items()}
+        for name, family in sorted(families.items()):
+            if family["help"]:
+                lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {family['type']}")
+            for key, metric in family["children"].items():
+                if isinstance(metric, Histogram):
+                    snap = metric.snapshot()
+                    for bound, count in snap["buckets"].items():
+                        lines.append(f"{name}_bucket{_format_labels(key, ('le', bound))} {count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {snap['sum']}")
+                    lines.append(f"{name}_count{_format_labels(key)} {snap['count']}")
+                else:
+                    lines.append(f"{name}{_format_labels(key)} {metric.value}")
+        return "\n".join(lines) + "\n"
+
+
+# 全局指标注册表
+metrics = MetricsRegistry()
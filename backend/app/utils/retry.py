@@ -0,0 +1,203 @@
+"""
+数据库操作重试策略
+按 PyMySQL 错误码判断是否可重试，使用带抖动的指数退避，并按操作维护重试预算
+"""
+import asyncio
+import contextvars
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+import pymysql
+
+from app.config import settings
+from app.utils.logger import logger
+from app.utils.metrics import metrics
+
+T = TypeVar("T")
+
+# 可重试的 MySQL 错误码 -> 原因
+RETRYABLE_ERRORS: Dict[int, str] = {
+    1213: "deadlock",            # ER_LOCK_DEADLOCK，事务已被回滚
+    1205: "lock_wait_timeout",   # ER_LOCK_WAIT_TIMEOUT
+    2003: "connect_failed",      # CR_CONN_HOST_ERROR
+    2006: "server_gone",         # CR_SERVER_GONE_ERROR
+    2013: "lost_connection",     # CR_SERVER_LOST
+    2055: "lost_connection",     # CR_SERVER_LOST_EXTENDED
+}
+
+# 当前是第几次尝试（从 0 开始），供日志和监控读取
+_retry_attempt: contextvars.ContextVar = contextvars.ContextVar("db_retry_attempt", default=0)
+
+
+def current_attempt() -> int:
+    """当前操作的重试次数（首次执行为 0）"""
+    return _retry_attempt.get()
+
+
+def mysql_error_code(exc: BaseException) -> Optional[int]:
+    """
+    取出异常链上第一个 PyMySQL 错误码
+
+    DAL 会把 PyMySQL 异常包装成 DatabaseError（raise ... from e），
+    因此沿 __cause__ / __context__ 向下查找。
+    """
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        if isinstance(exc, pymysql.MySQLError) and exc.args and isinstance(exc.args[0], int):
+            return exc.args[0]
+        exc = exc.__cause__ or exc.__context__
+    return None
+
+
+def retry_reason(exc: BaseException) -> Optional[str]:
+    """可重试时返回原因，否则返回 None"""
+    code = mysql_error_code(exc)
+    return RETRYABLE_ERRORS.get(code) if code is not None else None
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    重试策略
+
+    max_attempts: 最多执行次数（含首次）
+    base_delay / max_delay: 指数退避的基数与上限（秒），实际等待在 [0, 上限] 内均匀随机（full jitter），
+        避免死锁后所有请求同时重试再次冲突
+    budget_ratio: 重试预算，每次调用积累 budget_ratio 个重试令牌，令牌用尽后不再重试，
+        防止数据库故障时重试流量放大
+    """
+    max_attempts: int = 3
+    base_delay: float = 0.05
+    max_delay: float = 1.0
+    budget_ratio: float = 0.2
+
+    def backoff(self, attempt: int) -> float:
+        """第 attempt 次重试前的等待时间（attempt 从 1 开始）"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+
+class RetryBudget:
+    """令牌桶形式的重试预算（最少保留 min_tokens 个令牌，低流量时也能重试）"""
+
+    def __init__(self, ratio: float, min_tokens: float = 10.0, max_tokens: float = 100.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = min_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+def _default_policy() -> RetryPolicy:
+    return RetryPolicy(
+        max_attempts=settings.DB_RETRY_MAX_ATTEMPTS,
+        base_delay=settings.DB_RETRY_BASE_DELAY,
+        max_delay=settings.DB_RETRY_MAX_DELAY,
+        budget_ratio=settings.DB_RETRY_BUDGET_RATIO,
+    )
+
+
+# 按操作定制的重试策略，未列出的操作使用默认策略
+POLICIES: Dict[str, RetryPolicy] = {
+    # 选课高峰期热点课程死锁最多：多给一次机会，但退避上限较短，避免请求长时间挂起
+    "enroll": RetryPolicy(max_attempts=4, base_delay=0.02, max_delay=0.5, budget_ratio=0.3),
+    "drop": RetryPolicy(max_attempts=4, base_delay=0.02, max_delay=0.5, budget_ratio=0.3),
+    # 获取连接失败时不必等待太久，连接池的熔断器会接管持续性故障
+    "connect": RetryPolicy(max_attempts=3, base_delay=0.1, max_delay=1.0, budget_ratio=0.2),
+}
+
+_budgets: Dict[str, RetryBudget] = {}
+_budgets_lock = threading.Lock()
+
+
+def get_policy(operation: str) -> RetryPolicy:
+    return POLICIES.get(operation) or _default_policy()
+
+
+def _budget(operation: str, policy: RetryPolicy) -> RetryBudget:
+    budget = _budgets.get(operation)
+    if budget is None:
+        with _budgets_lock:
+            budget = _budgets.setdefault(operation, RetryBudget(policy.budget_ratio))
+    return budget
+
+
+def _should_retry(exc: BaseException, operation: str, policy: RetryPolicy,
+                  budget: RetryBudget, attempt: int) -> Optional[float]:
+    """判断是否重试；需要重试时记录指标并返回退避时间"""
+    reason = retry_reason(exc)
+    if reason is None:
+        return None
+    labels = {"operation": operation, "reason": reason}
+    if attempt >= policy.max_attempts:
+        metrics.counter("db_retry_exhausted_total", "重试次数用尽仍失败的操作数", labels).inc()
+        return None
+    if not budget.withdraw():
+        metrics.counter("db_retry_budget_exhausted_total", "重试预算耗尽而放弃重试的次数", labels).inc()
+        logger.warning(f"{operation} 重试预算已耗尽，放弃重试: {str(exc)}")
+        return None
+    metrics.counter("db_retries_total", "数据库操作重试次数", labels).inc()
+    delay = policy.backoff(attempt)
+    logger.warning(
+        f"{operation} 遇到可重试错误（{reason}），{delay * 1000:.0f}ms 后重试 "
+        f"{attempt}/{policy.max_attempts - 1}: {str(exc)}"
+    )
+    return delay
+
+
+async def retry_async(func: Callable[[], Awaitable[T]], operation: str,
+                      policy: Optional[RetryPolicy] = None) -> T:
+    """
+    执行异步操作，遇到可重试错误时按策略退避重试
+
+    func 每次调用都必须是一次完整、可重复执行的操作（例如重新借连接并执行整个事务）。
+    """
+    policy = policy or get_policy(operation)
+    budget = _budget(operation, policy)
+    budget.deposit()
+    attempt = 0
+    while True:
+        attempt += 1
+        token = _retry_attempt.set(attempt - 1)
+        try:
+            return await func()
+        except Exception as e:
+            delay = _should_retry(e, operation, policy, budget, attempt)
+            if delay is None:
+                raise
+        finally:
+            _retry_attempt.reset(token)
+        await asyncio.sleep(delay)
+
+
+def retry_sync(func: Callable[[], T], operation: str, policy: Optional[RetryPolicy] = None) -> T:
+    """retry_async 的同步版本（在数据库线程或脚本中使用）"""
+    policy = policy or get_policy(operation)
+    budget = _budget(operation, policy)
+    budget.deposit()
+    attempt = 0
+    while True:
+        attempt += 1
+        token = _retry_attempt.set(attempt - 1)
+        try:
+            return func()
+        except Exception as e:
+            delay = _should_retry(e, operation, policy, budget, attempt)
+            if delay is None:
+                raise
+        finally:
+            _retry_attempt.reset(token)
+        time.sleep(delay)
@@ -0,0 +1,200 @@
+"""
+慢查询捕获
+TimedCursor 为每次 execute 计时，超过 DB_SLOW_QUERY_MS 的语句交给后台线程：
+归一化 SQL、在独立连接上执行 EXPLAIN FORMAT=JSON，并写入滚动的慢查询日志文件（JSON Lines）。
+
+同一条归一化 SQL 在 DB_SLOW_QUERY_EXPLAIN_INTERVAL 秒内只 EXPLAIN 一次；
+执行计划中出现全表扫描（access_type = ALL）时额外记录告警。
+"""
+import hashlib
+import json
+import queue
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+import pymysql
+import pymysql.cursors
+
+from app.config import settings
+from app.utils.logger import logger
+from app.utils.metrics import metrics
+
+# EXPLAIN 支持的语句类型
+_EXPLAINABLE = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|REPLACE|WITH)\b", re.I)
+
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER = re.compile(r"(?<![\w`@])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_sql(sql: str) -> str:
+    """去掉字面量、注释和多余空白，IN 列表折叠为 (?+)，得到可聚合的 SQL 指纹"""
+    sql = _COMMENT.sub(" ", sql)
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("(?+)", sql)
+    return _SPACES.sub(" ", sql).strip()
+
+
+def fingerprint(normalized: str) -> str:
+    return hashlib.md5(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+def full_scan_tables(plan) -> List[str]:
+    """从 EXPLAIN FORMAT=JSON 的结果中找出全表扫描的表"""
+    tables = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            if node.get("access_type") == "ALL" and "table_name" in node:
+                tables.append(node["table_name"])
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+
+    walk(plan)
+    return tables
+
+
+# 慢查询日志只写入单独的文件
+logger.add(
+    settings.DB_SLOW_QUERY_LOG,
+    rotation=settings.DB_SLOW_QUERY_LOG_ROTATION,
+    retention=settings.DB_SLOW_QUERY_LOG_RETENTION,
+    format="{message}",
+    filter=lambda record: record["extra"].get("slow_query", False),
+    encoding="utf-8",
+)
+_slow_logger = logger.bind(slow_query=True)
+
+
+class SlowQueryLog:
+    """慢查询后台处理：EXPLAIN 在独立线程和独立连接上执行，不占用业务连接"""
+
+    def __init__(self):
+        self._queue: "queue.Queue" = queue.Queue(maxsize=settings.DB_SLOW_QUERY_QUEUE_SIZE)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._explained: Dict[str, float] = {}
+        self._connections: Dict[tuple, pymysql.connections.Connection] = {}
+        self._m_slow = metrics.counter("db_slow_queries_total", "超过慢查询阈值的 SQL 数")
+        self._m_dropped = metrics.counter("db_slow_queries_dropped_total", "慢查询队列已满而丢弃的记录数")
+
+    def record(self, sql: str, elapsed: float, host: str, port: int, database: Optional[str]):
+        """记录一条慢查询（在执行 SQL 的线程中调用，只做入队）"""
+        self._m_slow.inc()
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((sql, elapsed, host, port, database, time.time()))
+        except queue.Full:
+            self._m_dropped.inc()
+
+    def _ensure_worker(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="slow-query", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                self._process(*item)
+            except Exception as e:
+                logger.warning(f"处理慢查询记录失败: {str(e)}")
+
+    def _process(self, sql: str, elapsed: float, host: str, port: int,
+                 database: Optional[str], timestamp: float):
+        normalized = normalize_sql(sql)
+        digest = fingerprint(normalized)
+        entry = {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp)),
+            "fingerprint": digest,
+            "elapsed_ms": round(elapsed * 1000, 1),
+            "server": f"{host}:{port}",
+            "sql": normalized,
+        }
+
+        if settings.DB_SLOW_QUERY_EXPLAIN and _EXPLAINABLE.match(sql) and self._due(digest):
+            try:
+                plan = self._explain(sql, host, port, database)
+                entry["plan"] = plan
+                scans = full_scan_tables(plan)
+                if scans:
+                    entry["full_scan_tables"] = scans
+                    for table in scans:
+                        metrics.counter("db_full_scans_total", "慢查询执行计划中的全表扫描次数",
+                                        {"table": table}).inc()
+                    logger.warning(f"慢查询 {digest} 全表扫描 {scans}: {normalized[:200]}")
+            except Exception as e:
+                entry["explain_error"] = str(e)
+
+        _slow_logger.info(json.dumps(entry, ensure_ascii=False, default=str))
+
+    def _due(self, digest: str) -> bool:
+        """同一指纹在间隔内只 EXPLAIN 一次"""
+        now = time.monotonic()
+        last = self._explained.get(digest)
+        if last is not None and now - last < settings.DB_SLOW_QUERY_EXPLAIN_INTERVAL:
+            return False
+        self._explained[digest] = now
+        if len(self._explained) > 5000:
+            self._explained = {k: v for k, v in self._explained.items()
+                               if now - v < settings.DB_SLOW_QUERY_EXPLAIN_INTERVAL}
+        return True
+
+    def _explain(self, sql: str, host: str, port: int, database: Optional[str]):
+        key = (host, port, database)
+        conn = self._connections.get(key)
+        if conn is None or not conn.open:
+            conn = self._connect(host, port, database)
+            self._connections[key] = conn
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("EXPLAIN FORMAT=JSON " + sql)
+                row = cursor.fetchone()
+        except pymysql.OperationalError:
+            self._connections.pop(key, None)
+            raise
+        return json.loads(row[0]) if row else None
+
+    @staticmethod
+    def _connect(host: str, port: int, database: Optional[str]):
+        from app.database import ssl_config
+        return pymysql.connect(
+            host=host,
+            port=port,
+            user=settings.DB_USER,
+            password=settings.DB_PASSWORD,
+            database=database or settings.DB_NAME,
+            charset=settings.DB_CHARSET,
+            ssl=ssl_config(),
+            autocommit=True,
+            connect_timeout=settings.DB_CONNECT_TIMEOUT,
+            read_timeout=settings.DB_READ_TIMEOUT,
+        )
+
+
+slow_query_log = SlowQueryLog()
+
+
+class TimedCursor(pymysql.cursors.DictCursor):
+    """为每次 execute 计时的字典游标，超过 DB_SLOW_QUERY_MS 时记录慢查询"""
+
+    def execute(self, query, args=None):
+        started = time.perf_counter()
+        result = super().execute(query, args)
+        elapsed = time.perf_counter() - started
+        threshold = settings.DB_SLOW_QUERY_MS
+        if threshold > 0 and elapsed * 1000 >= threshold:
+            conn = self.connection
+            slow_query_log.record(self._executed, elapsed, conn.host, conn.port,
+                                  conn.db.decode() if isinstance(conn.db, bytes) else conn.db)
+        return result
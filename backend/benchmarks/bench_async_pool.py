@@ -0,0 +1,66 @@
+"""
+同步游标 vs 异步游标 吞吐量对比
+
+模拟 async 路由中执行慢查询的场景：
+- sync : 在协程中直接使用 db_pool.get_cursor()（旧实现，阻塞事件循环）
+- async: 使用 async with db_pool.acquire()（查询在数据库线程池中执行）
+
+用法（在 backend 目录下，需配置好 .env）:
+    python -m benchmarks.bench_async_pool --requests 400 --concurrency 200 --sleep 0.05
+"""
+import argparse
+import asyncio
+import time
+
+from app.database import db_pool
+from benchmarks.common import Timer, print_report, summarize
+
+
+async def sync_request(query_sleep: float) -> float:
+    start = time.perf_counter()
+    with db_pool.get_cursor() as cursor:
+        cursor.execute("SELECT SLEEP(%s) AS s", (query_sleep,))
+        cursor.fetchone()
+    return time.perf_counter() - start
+
+
+async def async_request(query_sleep: float) -> float:
+    start = time.perf_counter()
+    async with db_pool.acquire() as cursor:
+        await cursor.execute("SELECT SLEEP(%s) AS s", (query_sleep,))
+        await cursor.fetchone()
+    return time.perf_counter() - start
+
+
+async def run_scenario(name: str, request_func, total: int, concurrency: int, query_sleep: float):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            latencies.append(await request_func(query_sleep))
+
+    with Timer() as timer:
+        await asyncio.gather(*(one() for _ in range(total)))
+    return summarize(name, latencies, timer.elapsed)
+
+
+async def main(args):
+    # 预热连接池
+    async with db_pool.acquire() as cursor:
+        await cursor.execute("SELECT 1")
+
+    results = [
+        await run_scenario("sync get_cursor", sync_request, args.requests, args.concurrency, args.sleep),
+        await run_scenario("async acquire", async_request, args.requests, args.concurrency, args.sleep),
+    ]
+    print_report(results)
+    db_pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="同步/异步数据库访问吞吐量对比")
+    parser.add_argument("--requests", type=int, default=400, help="总请求数")
+    parser.add_argument("--concurrency", type=int, default=200, help="并发协程数")
+    parser.add_argument("--sleep", type=float, default=0.05, help="每个查询的服务端耗时（秒）")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,84 @@
+"""
+连接借出延迟对比：每次 ping vs 按空闲时长校验
+
+- legacy : PooledDB(ping=7) 且借出后再显式 conn.ping(reconnect=True)（旧实现）
+- idle   : 当前 DatabasePool（ping=0，仅空闲超过 DB_POOL_VALIDATE_IDLE 的连接才 ping）
+
+每次请求执行 "借出连接 + SELECT 1 + 归还"，统计端到端延迟。
+
+用法（在 backend 目录下，需配置好 .env）:
+    python -m benchmarks.bench_checkout --requests 2000
+"""
+import argparse
+import time
+
+import pymysql
+from dbutils.pooled_db import PooledDB
+
+from app.config import settings
+from app.database import db_pool
+from benchmarks.common import Timer, print_report, summarize
+
+
+def legacy_pool() -> PooledDB:
+    return PooledDB(
+        creator=pymysql,
+        maxconnections=settings.DB_POOL_MAX_SIZE,
+        mincached=settings.DB_POOL_MIN_SIZE,
+        maxcached=settings.DB_POOL_MAX_SIZE,
+        blocking=True,
+        ping=7,
+        host=settings.DB_HOST,
+        port=settings.DB_PORT,
+        user=settings.DB_USER,
+        password=settings.DB_PASSWORD,
+        database=settings.DB_NAME,
+        charset=settings.DB_CHARSET,
+        cursorclass=pymysql.cursors.DictCursor,
+        autocommit=False,
+    )
+
+
+def run_legacy(total: int):
+    pool = legacy_pool()
+    latencies = []
+    with Timer() as timer:
+        for _ in range(total):
+            start = time.perf_counter()
+            conn = pool.connection()
+            conn.ping(reconnect=True)
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            conn.close()
+            latencies.append(time.perf_counter() - start)
+    pool.close()
+    return summarize("legacy ping=7 + ping()", latencies, timer.elapsed)
+
+
+def run_idle_validation(total: int):
+    latencies = []
+    with Timer() as timer:
+        for _ in range(total):
+            start = time.perf_counter()
+            with db_pool.get_cursor() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+            latencies.append(time.perf_counter() - start)
+    return summarize("idle-age validation", latencies, timer.elapsed)
+
+
+def main(args):
+    # 预热，两边都先建立好 mincached 连接
+    run_idle_validation(10)
+    results = [run_legacy(args.requests), run_idle_validation(args.requests)]
+    print_report(results)
+    print(f"校验 ping 次数: {db_pool.partition().stats()['validation_pings_total']}")
+    db_pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="连接借出延迟对比")
+    parser.add_argument("--requests", type=int, default=2000, help="请求数")
+    main(parser.parse_args())
@@ -0,0 +1,112 @@
+"""
+选课高峰对比：直接调用 sp_student_enroll vs 按开课实例分片的选课分发器
+
+- direct  : 每个请求独立事务调用 sp_student_enroll（死锁时按 enroll 策略重试）
+- dispatch: 请求经 EnrollDispatcher 排队，同一开课实例串行写入、批量提交
+
+每个场景让 --students 指定范围内的学生同时选 --instances 中的课程，结束后退课恢复数据。
+除延迟与吞吐外，统计死锁/锁等待重试次数（db_retries_total）和重试用尽次数。
+学生需与课程无时间冲突，开课实例需处于选课时间窗口内。
+
+用法（在 backend 目录下，需配置好 .env）:
+    python -m benchmarks.bench_enroll_dispatch --students 1001-1500 --instances 1,2 --concurrency 200
+"""
+import argparse
+import asyncio
+import time
+from typing import List, Tuple
+
+from app.dal.stored_procedures import sp
+from app.database import db_pool
+from app.services.enroll_dispatcher import EnrollDispatcher
+from app.utils.exceptions import BusinessError
+from app.utils.metrics import metrics
+from benchmarks.common import Timer, print_report, summarize
+
+
+def lock_retry_count() -> float:
+    """enroll 操作因死锁、锁等待超时发生的重试与重试用尽次数"""
+    total = 0.0
+    for reason in ("deadlock", "lock_wait_timeout"):
+        labels = {"operation": "enroll", "reason": reason}
+        total += metrics.counter("db_retries_total", labels=labels).value
+        total += metrics.counter("db_retry_exhausted_total", labels=labels).value
+    return total
+
+
+async def run_scenario(name: str, dispatcher: EnrollDispatcher,
+                       requests: List[Tuple[int, int]], concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, outcomes = [], {"ok": 0, "business": 0, "error": 0}
+
+    async def one(student_id: int, instance_id: int):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await dispatcher.submit(student_id, instance_id)
+                outcomes["ok"] += 1
+            except BusinessError:
+                outcomes["business"] += 1
+            except Exception:
+                outcomes["error"] += 1
+            latencies.append(time.perf_counter() - start)
+
+    retries_before = lock_retry_count()
+    dispatcher.start()
+    with Timer() as timer:
+        await asyncio.gather(*(one(s, i) for s, i in requests))
+    await dispatcher.stop()
+
+    result = summarize(name, latencies, timer.elapsed)
+    result.update(outcomes, lock_retries=lock_retry_count() - retries_before)
+    return result
+
+
+async def reset(requests: List[Tuple[int, int]]):
+    """退掉本次压测选上的课程"""
+    def _drop_all(cursor):
+        for student_id, instance_id in requests:
+            try:
+                sp.sp_student_drop(cursor, student_id, instance_id)
+            except BusinessError:
+                pass
+
+    async with db_pool.acquire() as cursor:
+        await cursor.run(_drop_all)
+
+
+def parse_range(text: str) -> List[int]:
+    start, _, end = text.partition("-")
+    return list(range(int(start), int(end or start) + 1))
+
+
+async def main(args):
+    students = parse_range(args.students)
+    instances = [int(i) for i in args.instances.split(",")]
+    requests = [(s, i) for s in students for i in instances]
+    await db_pool.warmup()
+
+    results = []
+    scenarios = [
+        ("direct", EnrollDispatcher(shards=0)),
+        ("dispatch", EnrollDispatcher(shards=args.shards, batch_size=args.batch_size)),
+    ]
+    for name, dispatcher in scenarios:
+        results.append(await run_scenario(name, dispatcher, requests, args.concurrency))
+        await reset(requests)
+
+    print_report(results)
+    for r in results:
+        print(f"{r['name']:<10} 成功 {r['ok']:>6}  业务失败 {r['business']:>6}  "
+              f"其他错误 {r['error']:>4}  死锁/锁等待重试 {r['lock_retries']:>6.0f}")
+    db_pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="选课分发器与直接调用的吞吐量、死锁次数对比")
+    parser.add_argument("--students", required=True, help="学生ID范围，如 1001-1500")
+    parser.add_argument("--instances", required=True, help="开课实例ID，逗号分隔")
+    parser.add_argument("--concurrency", type=int, default=200, help="并发请求数")
+    parser.add_argument("--shards", type=int, default=8, help="分发器分片数")
+    parser.add_argument("--batch-size", type=int, default=32, help="每批最多请求数")
+    asyncio.run(main(parser.parse_args()))
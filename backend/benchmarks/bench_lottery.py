@@ -0,0 +1,115 @@
+"""
+抽签选课分配基准（不需要数据库，使用可复现的合成数据）
+
+按 --seed 生成 --students 名学生、--instances 个开课实例（每门课程约 3 个开课实例，
+每个开课实例 1-2 个时间段）和每人 --intents 个按热度偏斜的志愿，分别以不同进程数运行 allocate()：
+- 记录分配耗时和中签/落选统计
+- 校验没有开课实例超出对内/对外名额、没有学生分得时间冲突或同一课程的两个开课实例
+- 校验不同进程数的分配结果完全一致（同一 seed 可复现）
+
+用法（在 backend 目录下）:
+    python -m benchmarks.bench_lottery --students 50000 --instances 3000 --workers 0,4,8
+"""
+import argparse
+import itertools
+import random
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from app.services.lottery import Intent, LotteryInstance, LotteryStudent, allocate
+from app.services.timetable import slot_bitmap
+from benchmarks.common import Timer
+
+DEPARTMENTS = 30
+TIMESLOTS = 25          # 周一至周五，每天 5 节
+
+
+def synthetic_semester(students: int, instances: int, intents: int, seed: int):
+    """生成合成的学生、开课实例和选课意向（相同参数得到相同数据）"""
+    rng = random.Random(seed)
+    courses = max(1, instances // 3)
+    course_dept = [rng.randrange(DEPARTMENTS) for _ in range(courses)]
+    demand = students * intents / instances
+
+    instance_map: Dict[int, LotteryInstance] = {}
+    for instance_id in range(1, instances + 1):
+        course = rng.randrange(courses)
+        bitmap = 0
+        for timeslot in rng.sample(range(1, TIMESLOTS + 1), rng.choice((1, 2))):
+            bitmap |= slot_bitmap(timeslot, 1, 16, rng.choice(("全部", "全部", "单周", "双周")))
+        capacity = max(10, int(rng.gauss(demand * 0.8, demand * 0.3)))
+        inner = int(capacity * 0.75)
+        instance_map[instance_id] = LotteryInstance(
+            instance_id, f"C{course:05d}", course_dept[course], inner, capacity - inner, bitmap)
+
+    student_map = {
+        student_id: LotteryStudent(student_id, rng.randrange(DEPARTMENTS))
+        for student_id in range(1, students + 1)
+    }
+
+    # 热度偏斜：少数热门开课实例吸引大部分第一志愿
+    ids = list(instance_map)
+    cum_weights = list(itertools.accumulate(1.0 / (rank + 20) for rank in range(len(ids))))
+    rng.shuffle(ids)
+    intent_list: List[Intent] = []
+    for student_id in student_map:
+        chosen = list(dict.fromkeys(rng.choices(ids, cum_weights=cum_weights, k=intents)))
+        intent_list.extend(Intent(student_id, instance_id, rank, 1 if rng.random() < 0.05 else 0)
+                           for rank, instance_id in enumerate(chosen, 1))
+    return student_map, instance_map, intent_list
+
+
+def verify(assignments: List[Tuple[int, int]], instances: Dict[int, LotteryInstance],
+           students: Dict[int, LotteryStudent]):
+    """校验名额、时间冲突和同一课程约束"""
+    inner, outer = Counter(), Counter()
+    occupied: Dict[int, int] = {}
+    courses = set()
+    for student_id, instance_id in assignments:
+        instance = instances[instance_id]
+        if students[student_id].dept_id == instance.dept_id:
+            inner[instance_id] += 1
+        else:
+            outer[instance_id] += 1
+        bitmap = occupied.get(student_id, 0)
+        assert not bitmap & instance.bitmap, f"学生 {student_id} 分得时间冲突的课程"
+        occupied[student_id] = bitmap | instance.bitmap
+        assert (student_id, instance.course_id) not in courses, f"学生 {student_id} 分得同一课程两次"
+        courses.add((student_id, instance.course_id))
+    for instance_id, instance in instances.items():
+        assert inner[instance_id] <= instance.inner_left, f"开课实例 {instance_id} 对内名额超出"
+        assert outer[instance_id] <= instance.outer_left, f"开课实例 {instance_id} 对外名额超出"
+
+
+def main(args):
+    worker_counts = [int(w) for w in args.workers.split(",")]
+    baseline = None
+    print(f"{'进程数':>6}{'生成(s)':>10}{'分配(s)':>10}{'意向数':>10}{'中签':>10}{'名额已满':>10}{'时间冲突':>10}{'同课程':>8}")
+    for workers in worker_counts:
+        with Timer() as gen:
+            students, instances, intents = synthetic_semester(
+                args.students, args.instances, args.intents, args.seed)
+        # allocate 会扣减剩余名额，校验使用分配前的名额
+        quotas = {i: LotteryInstance(x.instance_id, x.course_id, x.dept_id, x.inner_left, x.outer_left, x.bitmap)
+                  for i, x in instances.items()}
+        result = allocate(students, instances, intents, seed=args.seed, workers=workers)
+        verify(result.assignments, quotas, students)
+
+        assigned = sorted(result.assignments)
+        if baseline is None:
+            baseline = assigned
+        assert assigned == baseline, "不同进程数的分配结果不一致"
+        print(f"{workers:>6}{gen.elapsed:>10.2f}{result.elapsed:>10.2f}{len(intents):>10}"
+              f"{len(assigned):>10}{result.rejected.get('名额已满', 0):>10}"
+              f"{result.rejected.get('时间冲突', 0):>10}{result.rejected.get('已选同一课程', 0):>8}")
+    print("校验通过: 无超额、无时间冲突、各进程数结果一致")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="抽签选课分配耗时与正确性基准")
+    parser.add_argument("--students", type=int, default=50000, help="学生数")
+    parser.add_argument("--instances", type=int, default=3000, help="开课实例数")
+    parser.add_argument("--intents", type=int, default=6, help="每名学生的志愿数")
+    parser.add_argument("--seed", type=int, default=20250901, help="随机种子")
+    parser.add_argument("--workers", default="0,4", help="抽签进程数，逗号分隔")
+    main(parser.parse_args())
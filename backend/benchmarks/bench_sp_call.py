@@ -0,0 +1,55 @@
+"""
+存储过程调用往返次数对比：callproc vs 单次往返
+
+- classic: cursor.callproc() + SELECT OUT 参数（SET、CALL、SELECT 三次往返）
+- single : CALL ...; SELECT @out 合并为一个多语句请求（一次往返）
+
+每轮对同一学生执行 "选课 + 退课"，分别统计 sp_student_enroll 的延迟。
+需要一个处于选课时间窗口内、有剩余名额且与该学生课表无冲突的开课实例。
+
+用法（在 backend 目录下，需配置好 .env，DB_SP_CALL_MODE=single）:
+    python -m benchmarks.bench_sp_call --student 1001 --instance 1 --rounds 500
+"""
+import argparse
+import time
+
+from app.config import settings
+from app.dal.stored_procedures import sp
+from app.database import db_pool
+from benchmarks.common import Timer, print_report, summarize
+
+
+def run(mode: str, student_id: int, instance_id: int, rounds: int):
+    settings.DB_SP_CALL_MODE = mode
+    latencies = []
+    with db_pool.get_cursor(commit=True) as cursor:
+        with Timer() as timer:
+            for _ in range(rounds):
+                start = time.perf_counter()
+                sp.sp_student_enroll(cursor, student_id, instance_id)
+                latencies.append(time.perf_counter() - start)
+                sp.sp_student_drop(cursor, student_id, instance_id)
+    return summarize(f"{mode} enroll", latencies, timer.elapsed)
+
+
+def main(args):
+    if settings.DB_SP_CALL_MODE != "single":
+        raise SystemExit("请设置 DB_SP_CALL_MODE=single，连接需开启多语句才能对比两种方式")
+    # 预热
+    run("single", args.student, args.instance, 10)
+    results = [
+        run("classic", args.student, args.instance, args.rounds),
+        run("single", args.student, args.instance, args.rounds),
+    ]
+    print_report(results)
+    saved = results[0]["mean_ms"] - results[1]["mean_ms"]
+    print(f"每次选课平均节省: {saved:.2f}ms")
+    db_pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="存储过程调用往返次数对比")
+    parser.add_argument("--student", type=int, required=True, help="学生ID")
+    parser.add_argument("--instance", type=int, required=True, help="开课实例ID")
+    parser.add_argument("--rounds", type=int, default=500, help="选课+退课轮数")
+    main(parser.parse_args())
@@ -0,0 +1,54 @@
+"""
+基准测试公共工具
+"""
+import statistics
+import time
+from typing import Dict, List
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """计算百分位数（最近秩法），samples 为空时返回 0"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(name: str, latencies: List[float], elapsed: float) -> Dict[str, float]:
+    """汇总一组延迟样本（单位：秒）"""
+    return {
+        "name": name,
+        "requests": len(latencies),
+        "elapsed_s": elapsed,
+        "throughput_rps": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def print_report(results: List[Dict[str, float]]):
+    """以表格形式打印结果"""
+    header = f"{'场景':<24}{'请求数':>8}{'耗时(s)':>10}{'吞吐(req/s)':>14}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}"
+    print("=" * len(header))
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['name']:<24}{r['requests']:>8}{r['elapsed_s']:>10.2f}{r['throughput_rps']:>14.1f}"
+            f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}"
+        )
+    print("=" * len(header))
+
+
+class Timer:
+    """简单计时器"""
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
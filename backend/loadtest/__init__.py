@@ -0,0 +1,3 @@
+"""
+选课接口压测（通过 HTTP 驱动 FastAPI 应用，场景定义见 loadtest/scenarios/*.json）
+"""
@@ -0,0 +1,85 @@
+"""
+选课数据一致性检查（压测结束后执行，同步，使用 DictCursor）
+
+- 超额：已选对内/对外人数超过名额
+- 计数偏差：开课实例表的已选人数与选课记录表的实际人数不一致
+  （本院系学生计入对内人数，与触发器和 sp_refresh_enroll_counts 的口径一致）
+- 时间冲突：同一学生在同一学期选了时间位图有交集的两个开课实例
+"""
+from typing import Dict, List, Optional
+
+LIMIT = 20  # 每类问题最多返回的行数
+
+
+def over_quota(cursor, semester_id: Optional[int] = None) -> List[dict]:
+    cursor.execute(
+        "SELECT `开课实例ID`, `对内名额`, `已选对内人数`, `对外名额`, `已选对外人数` "
+        "FROM `开课实例表` "
+        "WHERE (`已选对内人数` > `对内名额` OR `已选对外人数` > `对外名额`) "
+        "  AND (%s IS NULL OR `学期ID` = %s) "
+        f"LIMIT {LIMIT}",
+        (semester_id, semester_id)
+    )
+    return list(cursor.fetchall())
+
+
+def counter_drift(cursor, semester_id: Optional[int] = None) -> List[dict]:
+    cursor.execute(
+        "SELECT oi.`开课实例ID`, oi.`已选对内人数`, oi.`已选对外人数`, "
+        "       COALESCE(actual.`对内`, 0) AS `实际对内`, COALESCE(actual.`对外`, 0) AS `实际对外` "
+        "FROM `开课实例表` oi "
+        "LEFT JOIN ( "
+        "    SELECT sc.`开课实例ID`, "
+        "           SUM(u.`院系ID` = c.`院系ID`) AS `对内`, "
+        "           SUM(u.`院系ID` <> c.`院系ID`) AS `对外` "
+        "    FROM `选课记录表` sc "
+        "    JOIN `用户信息表` u ON sc.`学生ID` = u.`用户ID` "
+        "    JOIN `开课实例表` i ON sc.`开课实例ID` = i.`开课实例ID` "
+        "    JOIN `课程信息表` c ON i.`课程ID` = c.`课程ID` "
+        "    WHERE (%s IS NULL OR i.`学期ID` = %s) "
+        "    GROUP BY sc.`开课实例ID` "
+        ") actual ON oi.`开课实例ID` = actual.`开课实例ID` "
+        "WHERE (%s IS NULL OR oi.`学期ID` = %s) "
+        "  AND (oi.`已选对内人数` <> COALESCE(actual.`对内`, 0) "
+        "       OR oi.`已选对外人数` <> COALESCE(actual.`对外`, 0)) "
+        f"LIMIT {LIMIT}",
+        (semester_id, semester_id, semester_id, semester_id)
+    )
+    return list(cursor.fetchall())
+
+
+def time_conflicts(cursor, semester_id: Optional[int] = None) -> List[dict]:
+    cursor.execute(
+        "SELECT a.`学生ID`, a.`开课实例ID` AS `开课实例A`, b.`开课实例ID` AS `开课实例B` "
+        "FROM `选课记录表` a "
+        "JOIN `选课记录表` b ON a.`学生ID` = b.`学生ID` AND a.`开课实例ID` < b.`开课实例ID` "
+        "JOIN `开课实例表` ia ON a.`开课实例ID` = ia.`开课实例ID` "
+        "JOIN `开课实例表` ib ON b.`开课实例ID` = ib.`开课实例ID` "
+        "WHERE ia.`学期ID` = ib.`学期ID` "
+        "  AND (%s IS NULL OR ia.`学期ID` = %s) "
+        "  AND BIT_COUNT(ia.`时间位图` & ib.`时间位图`) > 0 "
+        f"LIMIT {LIMIT}",
+        (semester_id, semester_id)
+    )
+    return list(cursor.fetchall())
+
+
+def check_invariants(cursor, semester_id: Optional[int] = None) -> Dict[str, List[dict]]:
+    """返回 {检查项: 违反的行}，全部为空表示数据一致"""
+    return {
+        "超额": over_quota(cursor, semester_id),
+        "计数偏差": counter_drift(cursor, semester_id),
+        "时间冲突": time_conflicts(cursor, semester_id),
+    }
+
+
+def deadlock_count(cursor) -> Optional[int]:
+    """InnoDB 累计死锁次数（需要 PROCESS 权限，不可用时返回 None）"""
+    try:
+        cursor.execute(
+            "SELECT `COUNT` AS n FROM information_schema.INNODB_METRICS WHERE `NAME` = 'lock_deadlocks'"
+        )
+        row = cursor.fetchone()
+    except Exception:
+        return None
+    return None if row is None else int(row["n"])
@@ -0,0 +1,337 @@
+"""
+选课接口压测
+
+按场景文件（loadtest/scenarios/*.json，格式见 loadtest/scenario.py）启动一批虚拟学生，
+用异步 HTTP 客户端请求选课、退课、换课、可选课程和课表接口：
+- 按接口统计吞吐量与 p50/p95/p99 延迟，按结果统计成功、业务失败（名额已满、时间冲突等）、
+  选课排队（429）、服务繁忙（503）和其他错误
+- 遇到选课排队时带上排队号，按 Retry-After 等待后重试（排队等待不计入接口延迟）
+- 统计 InnoDB 死锁次数（information_schema.INNODB_METRICS）与应用的死锁重试次数（/api/monitor/metrics）
+- 结束后检查超额、已选人数与选课记录是否一致、学生课表是否有时间冲突（loadtest/checks.py），
+  有问题时以非 0 退出码结束
+- 默认退掉本次压测选上的课程，恢复数据（--keep 保留）
+
+虚拟学生从用户信息表中按 --seed 抽取，选课目标为当前学期的开课实例；
+当前学期需为先到先得模式且处于选课时间内，否则选课请求都会返回业务失败。
+
+用法（在 backend 目录下，需配置好 .env，服务运行在 --base-url）:
+    python -m loadtest.run window_opening
+    python -m loadtest.run hot_course --users 500 --concurrency 200
+    python -m loadtest.run loadtest/scenarios/mixed.json --in-process --output result.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from contextlib import AsyncExitStack
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+import httpx
+
+from app.dal.stored_procedures import sp
+from app.database import db_pool
+from app.services.waiting_room import TICKET_HEADER
+from app.utils.exceptions import BusinessError
+from benchmarks.common import Timer, print_report, summarize
+from loadtest.checks import check_invariants, deadlock_count
+from loadtest.scenario import Scenario, load_scenario
+
+API = "/api/students"
+RETRY_METRIC = re.compile(r'^db_retries_total\{([^}]*)\} (\S+)$', re.MULTILINE)
+
+
+@dataclass
+class Population:
+    """本次压测的学期、虚拟学生和选课目标"""
+    semester_id: int
+    students: List[int]
+    instances: List[int]
+    hot: List[int]          # 名额最少的开课实例
+
+
+@dataclass
+class VirtualStudent:
+    student_id: int
+    rng: random.Random
+    enrolled: Set[int] = field(default_factory=set)     # 本次压测中选上的课程
+    ticket: Optional[str] = None                        # 选课排队号
+
+
+class Recorder:
+    """按接口记录延迟和结果"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.outcomes: Dict[str, Counter] = defaultdict(Counter)
+        self.queue_wait = 0.0
+
+    def record(self, endpoint: str, status_code: int, elapsed: float):
+        self.latencies[endpoint].append(elapsed)
+        if status_code == 200:
+            outcome = "ok"
+        elif status_code in (409, 422):
+            outcome = "business"
+        elif status_code == 503:
+            outcome = "unavailable"
+        else:
+            outcome = "error"
+        self.outcomes[endpoint][outcome] += 1
+
+
+def load_population(scenario: Scenario, seed: int) -> Population:
+    """从数据库抽取虚拟学生和当前学期的开课实例（同步）"""
+    with db_pool.get_cursor() as cursor:
+        cursor.execute("SELECT `学期ID` FROM `学期信息表` WHERE `是否当前学期` = TRUE LIMIT 1")
+        row = cursor.fetchone()
+        if row is None:
+            raise SystemExit("没有当前学期，无法压测")
+        semester_id = row["学期ID"]
+
+        cursor.execute(
+            "SELECT `开课实例ID` FROM `开课实例表` WHERE `学期ID` = %s "
+            "ORDER BY `对内名额` + `对外名额`, `开课实例ID`",
+            (semester_id,)
+        )
+        by_capacity = [r["开课实例ID"] for r in cursor.fetchall()]
+        cursor.execute("SELECT `用户ID` FROM `用户信息表` WHERE `角色` = '学生' ORDER BY `用户ID`")
+        students = [r["用户ID"] for r in cursor.fetchall()]
+
+    if not by_capacity or not students:
+        raise SystemExit("当前学期没有开课实例或没有学生，请先导入数据")
+    rng = random.Random(seed)
+    return Population(
+        semester_id=semester_id,
+        students=rng.sample(students, min(scenario.users, len(students))),
+        instances=sorted(by_capacity),
+        hot=by_capacity[:scenario.hot_instances],
+    )
+
+
+class LoadTest:
+    def __init__(self, scenario: Scenario, population: Population, client: httpx.AsyncClient):
+        self.scenario = scenario
+        self.population = population
+        self.client = client
+        self.recorder = Recorder()
+        self.semaphore = asyncio.Semaphore(scenario.concurrency)
+        self.deadline: Optional[float] = None
+
+    def pick_target(self, user: VirtualStudent) -> int:
+        scenario = self.scenario
+        if scenario.target_mode == "hot" and user.rng.random() < scenario.hot_share:
+            return user.rng.choice(self.population.hot)
+        return user.rng.choice(self.population.instances)
+
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    async def request(self, user: VirtualStudent, endpoint: str, method: str, path: str,
+                      **kwargs) -> Optional[httpx.Response]:
+        """发送请求；选课排队时带上排队号等待后重试，压测时间用完时返回 None"""
+        while not self.expired():
+            headers = {TICKET_HEADER: user.ticket} if user.ticket else {}
+            async with self.semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await self.client.request(method, path, headers=headers, **kwargs)
+                except httpx.HTTPError:
+                    self.recorder.record(endpoint, 0, time.perf_counter() - start)
+                    return None
+                elapsed = time.perf_counter() - start
+            user.ticket = response.headers.get(TICKET_HEADER, user.ticket)
+            if response.status_code != 429:
+                self.recorder.record(endpoint, response.status_code, elapsed)
+                return response
+
+            self.recorder.outcomes[endpoint]["queued"] += 1
+            wait = float(response.headers.get("Retry-After", 1))
+            self.recorder.queue_wait += wait
+            await asyncio.sleep(wait)
+        return None
+
+    async def perform(self, user: VirtualStudent, action: str):
+        base = f"{API}/{user.student_id}"
+        if action == "available_courses":
+            await self.request(user, action, "GET", f"{base}/available-courses")
+        elif action == "schedule":
+            await self.request(user, action, "GET", f"{base}/schedule",
+                               params={"semester_id": self.population.semester_id})
+        elif action == "enroll":
+            instance_id = self.pick_target(user)
+            response = await self.request(user, action, "POST", f"{base}/enroll",
+                                          json={"instance_id": instance_id})
+            if response is not None and response.status_code == 200:
+                user.enrolled.add(instance_id)
+        elif action == "drop" and user.enrolled:
+            instance_id = user.rng.choice(sorted(user.enrolled))
+            response = await self.request(user, action, "POST", f"{base}/drop",
+                                          json={"instance_id": instance_id})
+            if response is not None and response.status_code == 200:
+                user.enrolled.discard(instance_id)
+        elif action == "swap" and user.enrolled:
+            from_id = user.rng.choice(sorted(user.enrolled))
+            to_id = self.pick_target(user)
+            if to_id == from_id:
+                return
+            response = await self.request(user, action, "POST", f"{base}/swap",
+                                          json={"from_instance_id": from_id, "to_instance_id": to_id})
+            if response is not None and response.status_code == 200:
+                user.enrolled.discard(from_id)
+                user.enrolled.add(to_id)
+
+    async def run_user(self, user: VirtualStudent, delay: float):
+        await asyncio.sleep(delay)
+        low, high = self.scenario.think_time
+        iteration = 0
+        while not self.expired():
+            if self.deadline is None and iteration >= self.scenario.iterations:
+                break
+            iteration += 1
+            for step in self.scenario.flow:
+                for _ in range(step.count):
+                    if self.expired():
+                        return
+                    await self.perform(user, step.pick(user.rng))
+                    if high > 0:
+                        await asyncio.sleep(user.rng.uniform(low, high))
+
+    async def run(self, seed: int) -> List[VirtualStudent]:
+        users = [VirtualStudent(student_id, random.Random(f"{seed}:{student_id}"))
+                 for student_id in self.population.students]
+        if self.scenario.duration > 0:
+            self.deadline = time.monotonic() + self.scenario.ramp_up + self.scenario.duration
+        step = self.scenario.ramp_up / len(users)
+        await asyncio.gather(*(self.run_user(user, i * step) for i, user in enumerate(users)))
+        return users
+
+
+async def app_deadlock_retries(client: httpx.AsyncClient) -> Optional[float]:
+    """应用因死锁重试的累计次数（从 /api/monitor/metrics 读取）"""
+    try:
+        response = await client.get("/api/monitor/metrics")
+    except httpx.HTTPError:
+        return None
+    if response.status_code != 200:
+        return None
+    return sum(float(value) for labels, value in RETRY_METRIC.findall(response.text)
+               if 'reason="deadlock"' in labels)
+
+
+def cleanup(users: List[VirtualStudent]) -> int:
+    """退掉本次压测选上的课程（同步），返回退课门数"""
+    dropped = 0
+    with db_pool.get_cursor(commit=True) as cursor:
+        for user in users:
+            for instance_id in sorted(user.enrolled):
+                try:
+                    sp.sp_student_drop(cursor, user.student_id, instance_id)
+                    dropped += 1
+                except BusinessError:
+                    pass
+    return dropped
+
+
+def delta(before: Optional[float], after: Optional[float]) -> Optional[float]:
+    return None if before is None or after is None else after - before
+
+
+async def main(args) -> int:
+    scenario = load_scenario(args.scenario)
+    if args.users:
+        scenario.users = args.users
+    if args.concurrency:
+        scenario.concurrency = args.concurrency
+    if args.duration is not None:
+        scenario.duration = args.duration
+
+    population = await asyncio.to_thread(load_population, scenario, args.seed)
+    print(f"场景 {scenario.name}: {scenario.description}")
+    print(f"学期 {population.semester_id}，虚拟学生 {len(population.students)}，"
+          f"开课实例 {len(population.instances)}，并发上限 {scenario.concurrency}")
+
+    limits = httpx.Limits(max_connections=scenario.concurrency,
+                          max_keepalive_connections=scenario.concurrency)
+    async with AsyncExitStack() as stack:
+        if args.in_process:
+            from app.main import app
+            await stack.enter_async_context(app.router.lifespan_context(app))
+            client_kwargs = {"transport": httpx.ASGITransport(app=app), "base_url": "http://loadtest"}
+        else:
+            client_kwargs = {"base_url": args.base_url}
+        client = await stack.enter_async_context(
+            httpx.AsyncClient(limits=limits, timeout=args.timeout, **client_kwargs))
+
+        deadlocks_before = await asyncio.to_thread(_deadlocks)
+        retries_before = await app_deadlock_retries(client)
+        test = LoadTest(scenario, population, client)
+        with Timer() as timer:
+            users = await test.run(args.seed)
+        deadlocks = delta(deadlocks_before, await asyncio.to_thread(_deadlocks))
+        retries = delta(retries_before, await app_deadlock_retries(client))
+
+        violations = await asyncio.to_thread(_check, population.semester_id)
+        dropped = None if args.keep else await asyncio.to_thread(cleanup, users)
+
+    recorder = test.recorder
+    results = [summarize(endpoint, latencies, timer.elapsed)
+               for endpoint, latencies in sorted(recorder.latencies.items())]
+    print_report(results)
+    for endpoint, outcomes in sorted(recorder.outcomes.items()):
+        print(f"{endpoint:<18} 成功 {outcomes['ok']:>7}  业务失败 {outcomes['business']:>7}  "
+              f"排队 {outcomes['queued']:>6}  繁忙 {outcomes['unavailable']:>6}  其他错误 {outcomes['error']:>5}")
+    print(f"排队累计等待 {recorder.queue_wait:.0f}s  "
+          f"InnoDB 死锁 {'不可用' if deadlocks is None else int(deadlocks)}  "
+          f"应用死锁重试 {'不可用' if retries is None else int(retries)}")
+    for name, rows in violations.items():
+        print(f"检查 {name}: {'通过' if not rows else f'{len(rows)} 处（最多显示 20 处）'}")
+        for row in rows[:5]:
+            print(f"    {row}")
+    if dropped is not None:
+        print(f"已退掉本次压测选上的 {dropped} 门课程")
+    if not args.in_process:
+        db_pool.close()     # 在本进程中运行应用时已由应用关闭
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "scenario": scenario.name,
+                "elapsed_s": timer.elapsed,
+                "endpoints": results,
+                "outcomes": {k: dict(v) for k, v in recorder.outcomes.items()},
+                "queue_wait_s": recorder.queue_wait,
+                "innodb_deadlocks": deadlocks,
+                "app_deadlock_retries": retries,
+                "violations": {k: len(v) for k, v in violations.items()},
+            }, f, ensure_ascii=False, indent=2)
+    return 1 if any(violations.values()) else 0
+
+
+def _deadlocks() -> Optional[int]:
+    with db_pool.get_cursor() as cursor:
+        return deadlock_count(cursor)
+
+
+def _check(semester_id: int) -> Dict[str, List[dict]]:
+    with db_pool.get_cursor() as cursor:
+        return check_invariants(cursor, semester_id)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="选课接口压测（吞吐量、延迟分位数、死锁次数与一致性检查）")
+    parser.add_argument("scenario", help="场景名（loadtest/scenarios 下的文件名）或场景文件路径")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000", help="服务地址")
+    parser.add_argument("--in-process", action="store_true",
+                        help="在本进程中运行应用（不经过网络，便于本地快速验证）")
+    parser.add_argument("--users", type=int, help="覆盖场景的虚拟学生数")
+    parser.add_argument("--concurrency", type=int, help="覆盖场景的并发上限")
+    parser.add_argument("--duration", type=float, help="覆盖场景的持续时间（秒）")
+    parser.add_argument("--seed", type=int, default=20250901, help="随机种子")
+    parser.add_argument("--timeout", type=float, default=30.0, help="单个请求超时（秒）")
+    parser.add_argument("--keep", action="store_true", help="保留压测中选上的课程")
+    parser.add_argument("--output", help="结果写入 JSON 文件")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,127 @@
+"""
+压测场景定义
+
+场景文件为 JSON，每个虚拟学生按 flow 依次执行各步骤，例如：
+
+    {
+      "name": "window_opening",
+      "description": "选课开放瞬间：全部学生同时查询可选课程并选课",
+      "users": 2000,
+      "concurrency": 500,
+      "ramp_up": 0,
+      "iterations": 1,
+      "targets": {"mode": "uniform"},
+      "flow": [
+        {"action": "available_courses"},
+        {"action": "enroll", "count": 3},
+        {"action": "schedule"}
+      ]
+    }
+
+- users / concurrency：虚拟学生数与同时在途的请求数上限
+- ramp_up：在该秒数内逐个启动虚拟学生，0 表示同时开始
+- duration > 0 时每个虚拟学生循环执行 flow 直到时长用完，否则执行 iterations 遍
+- think_time：两个请求之间随机等待 [最小, 最大] 秒
+- targets：选课目标，uniform 在当前学期全部开课实例中随机；
+  hot 以 share 的概率选名额最少的 top 个开课实例（热门课程争抢）
+- action：available_courses / schedule / enroll / drop / swap，
+  或 mix（每次按 weights 随机选一个动作）
+"""
+import json
+import random
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+
+ACTIONS = ("available_courses", "schedule", "enroll", "drop", "swap")
+TARGET_MODES = ("uniform", "hot")
+
+SCENARIO_DIR = Path(__file__).parent / "scenarios"
+
+
+@dataclass
+class Step:
+    """flow 中的一步"""
+    action: str
+    count: int = 1
+    weights: Dict[str, float] = field(default_factory=dict)    # 仅 mix 使用
+
+    def pick(self, rng: random.Random) -> str:
+        if self.action != "mix":
+            return self.action
+        actions = list(self.weights)
+        return rng.choices(actions, weights=[self.weights[a] for a in actions])[0]
+
+
+@dataclass
+class Scenario:
+    name: str
+    flow: List[Step]
+    description: str = ""
+    users: int = 100
+    concurrency: int = 100
+    ramp_up: float = 0.0
+    duration: float = 0.0
+    iterations: int = 1
+    think_time: Tuple[float, float] = (0.0, 0.0)
+    target_mode: str = "uniform"
+    hot_instances: int = 3
+    hot_share: float = 0.9
+
+
+def _parse_step(raw: dict) -> Step:
+    unknown = set(raw) - {"action", "count", "weights"}
+    if unknown:
+        raise ValueError(f"未知的步骤字段: {sorted(unknown)}")
+    step = Step(raw["action"], int(raw.get("count", 1)), dict(raw.get("weights", {})))
+    if step.action == "mix":
+        if not step.weights or not set(step.weights) <= set(ACTIONS):
+            raise ValueError(f"mix 的 weights 只能包含 {ACTIONS}")
+    elif step.action not in ACTIONS:
+        raise ValueError(f"未知的动作: {step.action}")
+    if step.count < 1:
+        raise ValueError("count 至少为 1")
+    return step
+
+
+def parse_scenario(raw: dict) -> Scenario:
+    """校验并解析场景（字段错误时抛出 ValueError）"""
+    known = {"name", "description", "users", "concurrency", "ramp_up", "duration",
+             "iterations", "think_time", "targets", "flow"}
+    unknown = set(raw) - known
+    if unknown:
+        raise ValueError(f"未知的场景字段: {sorted(unknown)}")
+    if not raw.get("flow"):
+        raise ValueError("flow 不能为空")
+
+    targets = raw.get("targets", {})
+    scenario = Scenario(
+        name=raw["name"],
+        description=raw.get("description", ""),
+        flow=[_parse_step(step) for step in raw["flow"]],
+        users=int(raw.get("users", 100)),
+        concurrency=int(raw.get("concurrency", 100)),
+        ramp_up=float(raw.get("ramp_up", 0.0)),
+        duration=float(raw.get("duration", 0.0)),
+        iterations=int(raw.get("iterations", 1)),
+        think_time=tuple(float(t) for t in raw.get("think_time", (0.0, 0.0))),
+        target_mode=targets.get("mode", "uniform"),
+        hot_instances=int(targets.get("top", 3)),
+        hot_share=float(targets.get("share", 0.9)),
+    )
+    if scenario.target_mode not in TARGET_MODES:
+        raise ValueError(f"targets.mode 只能是 {TARGET_MODES}")
+    if scenario.users < 1 or scenario.concurrency < 1:
+        raise ValueError("users、concurrency 至少为 1")
+    if len(scenario.think_time) != 2 or scenario.think_time[0] > scenario.think_time[1]:
+        raise ValueError("think_time 应为 [最小, 最大]")
+    return scenario
+
+
+def load_scenario(path: Union[str, Path]) -> Scenario:
+    """按文件路径或 scenarios 目录下的场景名加载"""
+    path = Path(path)
+    if not path.exists() and not path.suffix:
+        path = SCENARIO_DIR / f"{path}.json"
+    with open(path, encoding="utf-8") as f:
+        return parse_scenario(json.load(f))
@@ -29,3 +29,25 @@ def db_cursor():
     from app.database import db_pool
     with db_pool.get_cursor(commit=True) as cursor:
         yield cursor
+
+
+@pytest.fixture(scope="module")
+def live_pool(request):
+    """
+    连接真实数据库的独立连接池（每个测试模块一个），数据库不可用时跳过该模块
+
+    连接数取测试模块的 CONCURRENCY（并发压测的线程数），未定义时为 10
+    """
+    from app.database import DatabasePool
+
+    size = getattr(request.module, "CONCURRENCY", 10)
+    name = request.module.__name__.rsplit(".", 1)[-1]
+    pool = DatabasePool(name=name, max_size=size, min_size=0, max_wait=60)
+    try:
+        with pool.get_cursor() as cursor:
+            cursor.execute("SELECT 1")
+    except Exception as e:
+        pool.close()
+        pytest.skip(f"数据库不可用: {e}")
+    yield pool
+    pool.close()
@@ -0,0 +1,174 @@
+"""
+连接池准入控制、分区与读写分离路由测试（不需要数据库连接）
+"""
+import time
+
+import pytest
+
+from app.config import settings
+from app.database import DatabasePool, Priority, _request_priority
+from app.utils.circuit_breaker import CircuitBreaker
+from app.utils.exceptions import ServiceUnavailableError
+
+
+def test_circuit_breaker_opens_and_recovers():
+    """测试熔断器：连续失败后打开，冷却后半开放行一个试探请求"""
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    assert breaker.allow() is None
+
+    breaker.record_failure()
+    assert breaker.record_failure() is True
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.allow() >= 1
+
+    time.sleep(0.06)
+    assert breaker.allow() is None      # 试探请求
+    assert breaker.allow() == 1         # 试探期间其余请求仍被拒绝
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_wait_timeouts_do_not_open_breaker():
+    """测试借连接等待超时（负载高峰、数据库正常）不计入熔断，只计入 wait_timeout 拒绝次数"""
+    pool = DatabasePool(name="wait-timeout-test")
+    rejected = pool._m_rejected["wait_timeout"]
+    before = rejected.value
+    for _ in range(settings.DB_CIRCUIT_FAILURE_THRESHOLD + 1):
+        assert pool._wait_timeout().status_code == 503
+    assert pool._breaker.state == CircuitBreaker.CLOSED
+    assert rejected.value == before + settings.DB_CIRCUIT_FAILURE_THRESHOLD + 1
+
+
+def test_low_priority_shed_when_pool_busy():
+    """测试连接池负载较高时拒绝低优先级请求、放行高优先级请求"""
+    pool = DatabasePool(name="admission-test")
+    pool._in_use = settings.DB_POOL_MAX_SIZE
+
+    token = _request_priority.set(Priority.LOW)
+    try:
+        with pytest.raises(ServiceUnavailableError) as exc_info:
+            pool._admit()
+        assert exc_info.value.status_code == 503
+        assert exc_info.value.retry_after == settings.DB_POOL_RETRY_AFTER
+    finally:
+        _request_priority.reset(token)
+
+    token = _request_priority.set(Priority.HIGH)
+    try:
+        pool._admit()
+    finally:
+        _request_priority.reset(token)
+    pool.close()
+
+
+def test_queue_full_rejected():
+    """测试等待队列已满时快速失败"""
+    pool = DatabasePool(name="queue-test")
+    pool._waiting = settings.DB_POOL_MAX_QUEUE
+
+    with pytest.raises(ServiceUnavailableError):
+        pool._admit()
+    pool.close()
+
+
+def test_partition_selected_by_dependency():
+    """测试接口级分区依赖覆盖路由级设置，未配置的分区退回 default"""
+    from fastapi import APIRouter, Depends, FastAPI
+    from fastapi.testclient import TestClient
+    from app.database import db_pool, db_partition
+
+    router = APIRouter()
+
+    @router.get("/read")
+    async def read():
+        return db_pool.current.name
+
+    @router.get("/write", dependencies=[Depends(db_partition("enroll"))])
+    async def write():
+        return db_pool.current.name
+
+    app = FastAPI()
+    app.include_router(router, dependencies=[Depends(db_partition("read"))])
+    client = TestClient(app)
+
+    assert client.get("/read").json() == "read"
+    assert client.get("/write").json() == "enroll"
+    assert db_pool.current.name == "default"
+    assert db_pool.partition("not-configured").name == "default"
+
+
+def test_readonly_routing_respects_lag_and_read_your_writes():
+    """测试只读查询：副本延迟正常时路由到副本，写入后同一 key 回退主库"""
+    from app.database import PartitionedPool, ReplicaPool
+
+    replica = ReplicaPool("replica-test", "127.0.0.1", 3306)
+    router = PartitionedPool({"default": DatabasePool("routing-test")}, [replica])
+
+    assert router._pick_replica() is None   # 尚未完成延迟检查
+
+    replica.lag = 0.0
+    assert router._pick_replica() is replica
+
+    replica.lag = settings.DB_REPLICA_MAX_LAG + 1
+    replica.mark_unavailable("延迟过高")
+    assert router._pick_replica() is None
+
+    router.mark_written("student:1")
+    assert router.is_pinned("student:1")
+    assert not router.is_pinned("student:2")
+    assert not router.is_pinned(None)
+    router.close()
+
+
+def test_request_connection_acquired_lazily():
+    """测试请求级连接：接口未使用数据库时不借出连接"""
+    from fastapi import Depends, FastAPI
+    from fastapi.testclient import TestClient
+    from app.database import RequestConnection, db_pool, get_read_db
+
+    app = FastAPI()
+
+    @app.get("/no-db")
+    async def no_db(db: RequestConnection = Depends(get_read_db)):
+        return "ok"
+
+    checkouts = db_pool.partition().stats()["checkout_errors_total"]
+    assert TestClient(app).get("/no-db").json() == "ok"
+    stats = db_pool.partition().stats()
+    assert stats["in_use"] == 0
+    assert stats["checkout_errors_total"] == checkouts
+
+
+def test_health_does_not_warm_up_and_background_retry_does(monkeypatch):
+    """测试 /health 只读取就绪状态；预热由后台任务按退避重试，直到全部分区就绪"""
+    import asyncio
+    import app.database as database
+    from app.database import PartitionedPool
+    from app.main import health_check
+
+    pool = DatabasePool("health-test", max_size=1, min_size=0)
+    partitioned = PartitionedPool({PartitionedPool.DEFAULT: pool})
+    attempts = []
+
+    async def warmup(timeout=None):
+        attempts.append(timeout)
+        pool.ready = len(attempts) >= 3
+
+    async def no_wait(delay):
+        await real_sleep(0)
+
+    real_sleep = asyncio.sleep
+    monkeypatch.setattr(partitioned, "warmup", warmup)
+    monkeypatch.setattr(database, "db_pool", partitioned)
+    monkeypatch.setattr("app.main.db_pool", partitioned)
+    monkeypatch.setattr(database.asyncio, "sleep", no_wait)
+
+    async def scenario():
+        response = await health_check()
+        assert response.status_code == 503 and attempts == []
+        partitioned.start_warmup_retry()
+        await partitioned._warmup_task
+        await partitioned.stop_warmup_retry()
+
+    asyncio.run(scenario())
+    assert len(attempts) == 3 and partitioned.ready
@@ -0,0 +1,90 @@
+"""
+批量选课测试（不需要数据库连接，sp_enroll_core 替换为按开课实例返回结果的函数）
+"""
+import pytest
+
+from app.dal.stored_procedures import sp
+from app.services.batch_enroll import ALL_OR_NOTHING, BEST_EFFORT, enroll_planned, find_conflicts
+from app.services.enroll_dispatcher import enroll_batch
+from app.services.timetable import slot_bitmap
+from app.utils.exceptions import BusinessError
+
+
+class RecordingCursor:
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, sql, params=None):
+        self.statements.append(sql)
+
+
+@pytest.fixture
+def fake_enroll(monkeypatch):
+    """开课实例 3 名额已满，其余选课成功"""
+    calls = []
+
+    def enroll_core(cursor, student_id, instance_id):
+        calls.append(instance_id)
+        if instance_id == 3:
+            raise BusinessError("选课失败: 本院系名额已满")
+        return f"ok {instance_id}"
+
+    monkeypatch.setattr(sp, "sp_enroll_core", enroll_core)
+    return calls
+
+
+def test_find_conflicts_keeps_earlier_course():
+    """测试同批次时间冲突：先提交的课程保留，后提交的冲突课程被拒绝，未知课程交给数据库"""
+    bitmaps = {
+        1: slot_bitmap(1, 1, 16),
+        2: slot_bitmap(1, 1, 16, "单周"),       # 与 1 冲突
+        3: slot_bitmap(1, 17, 20),              # 与 1 不同周，不冲突
+        4: slot_bitmap(2, 1, 16),
+    }
+    rejected = find_conflicts([1, 2, 3, 4, 99], bitmaps)
+
+    assert list(rejected) == [2]
+    assert "开课实例 1" in rejected[2]
+
+
+def test_best_effort_rolls_back_only_failed_item(fake_enroll):
+    """测试 best_effort：按开课实例ID升序选课，失败的课程只回滚到自己的 SAVEPOINT"""
+    cursor = RecordingCursor()
+    results = enroll_planned(cursor, 16, [5, 3, 1], BEST_EFFORT)
+
+    assert fake_enroll == [1, 3, 5]
+    assert results[0] == "ok 5" and results[2] == "ok 1"
+    assert isinstance(results[1], BusinessError)
+    assert cursor.statements.count("ROLLBACK TO SAVEPOINT enroll_item") == 1
+
+
+def test_all_or_nothing_rolls_back_whole_batch(fake_enroll):
+    """测试 all_or_nothing：一门失败则整批回滚，之后的课程不再选"""
+    cursor = RecordingCursor()
+    results = enroll_planned(cursor, 16, [5, 3, 1], ALL_OR_NOTHING)
+
+    assert fake_enroll == [1, 3]
+    assert all(isinstance(r, BusinessError) for r in results)
+    assert "名额已满" in results[1].message
+    assert "回滚" in results[0].message and "回滚" in results[2].message
+    assert cursor.statements == ["SAVEPOINT enroll_batch", "ROLLBACK TO SAVEPOINT enroll_batch"]
+
+    assert enroll_planned(RecordingCursor(), 16, [2, 1], ALL_OR_NOTHING) == ["ok 2", "ok 1"]
+
+
+def test_dispatcher_batch_locks_students_then_instances_in_order(monkeypatch):
+    """测试分发器批次：先按学生ID升序锁定学生，再按开课实例ID升序选课，结果按排队顺序返回"""
+    calls = []
+
+    def enroll_core(cursor, student_id, instance_id):
+        calls.append((student_id, instance_id))
+        return f"ok {student_id}-{instance_id}"
+
+    monkeypatch.setattr(sp, "sp_enroll_core", enroll_core)
+    cursor = RecordingCursor()
+    items = [(20, 5), (10, 3), (30, 5), (10, 1)]
+    results = enroll_batch(cursor, items)
+
+    assert "FOR UPDATE" in cursor.statements[0]
+    assert calls == [(10, 1), (10, 3), (20, 5), (30, 5)]   # 同一开课实例内保持排队顺序
+    assert results == ["ok 20-5", "ok 10-3", "ok 30-5", "ok 10-1"]
@@ -0,0 +1,158 @@
+"""
+选课分发器、剩余名额缓存与候补补选测试（不需要数据库连接，批次处理替换为记录函数）
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services.enroll_dispatcher import EnrollDispatcher
+from app.services.seat_cache import FULL_INNER, FULL_OUTER, SeatCache, SeatEntry
+from app.services.waitlist import WaitlistPromoter
+from app.utils.exceptions import BusinessError, ServiceUnavailableError
+
+
+def test_requests_sharded_by_instance_and_batched():
+    """测试同一开课实例的请求进入同一分片并合并为一个批次，结果分别返回给各请求"""
+    async def scenario():
+        dispatcher = EnrollDispatcher(shards=2, batch_size=8, batch_wait_ms=20, queue_size=100)
+        batches = []
+
+        async def fake_run_batch(batch):
+            batches.append([(p.student_id, p.instance_id) for p in batch])
+            for pending in batch:
+                if pending.student_id == 3:
+                    pending.future.set_exception(BusinessError("选课失败: 名额已满"))
+                else:
+                    pending.future.set_result(f"ok {pending.student_id}")
+
+        dispatcher._run_batch = fake_run_batch
+        dispatcher.start()
+        try:
+            results = await asyncio.gather(
+                *(dispatcher.submit(student_id, 10) for student_id in range(1, 6)),
+                dispatcher.submit(6, 11),
+                return_exceptions=True,
+            )
+        finally:
+            await dispatcher.stop()
+        return batches, results
+
+    batches, results = asyncio.run(scenario())
+
+    assert sorted(batches) == [[(1, 10), (2, 10), (3, 10), (4, 10), (5, 10)], [(6, 11)]]
+    assert results[0] == "ok 1"
+    assert isinstance(results[2], BusinessError)
+    assert results[5] == "ok 6"
+
+
+def test_full_shard_queue_rejected():
+    """测试分片队列已满时返回 503"""
+    async def scenario():
+        dispatcher = EnrollDispatcher(shards=1, batch_size=1, batch_wait_ms=0, queue_size=1)
+        release = asyncio.Event()
+
+        async def slow_run_batch(batch):
+            await release.wait()
+            for pending in batch:
+                pending.future.set_result("ok")
+
+        dispatcher._run_batch = slow_run_batch
+        dispatcher.start()
+        try:
+            first = asyncio.create_task(dispatcher.submit(1, 1))
+            await asyncio.sleep(0.01)                        # 第一个请求正在处理
+            second = asyncio.create_task(dispatcher.submit(2, 1))
+            await asyncio.sleep(0.01)                        # 第二个请求占满队列
+            with pytest.raises(ServiceUnavailableError):
+                await dispatcher.submit(3, 1)
+            release.set()
+            return await asyncio.gather(first, second)
+        finally:
+            await dispatcher.stop()
+
+    assert asyncio.run(scenario()) == ["ok", "ok"]
+
+
+def test_seat_cache_rejects_only_definitely_full():
+    """测试名额缓存：只拒绝学生所属类别已满的请求，院系未知时交给数据库判断"""
+    cache = SeatCache()
+    cache._seats = {1: SeatEntry(dept_id=10, inner_left=1, outer_left=0)}
+    cache._student_dept = {100: 10, 200: 20}
+    cache._refreshed_at = time.monotonic()
+
+    assert cache.check(100, 1) is None              # 本院系仍有 1 个名额
+    assert cache.check(200, 1) == FULL_OUTER        # 跨院系已满
+    assert cache.check(300, 1) is None              # 院系未知
+    assert cache.check(100, 2) is None              # 不在缓存中
+
+    cache.on_enrolled(100, 1)
+    assert cache.check(100, 1) == FULL_INNER
+    assert cache.check(300, 1) == FULL_INNER        # 两类都已满
+
+    cache.on_dropped(100, 1)
+    assert cache.check(100, 1) is None
+
+    cache._refreshed_at = time.monotonic() - 3600   # 长时间未对账，不再使用缓存
+    assert cache.check(200, 1) is None
+
+
+def test_seat_cache_refresh_keeps_drops_made_while_loading():
+    """测试对账读取期间的退课：旧快照替换缓存后，刚释放的名额不被覆盖成已满"""
+    cache = SeatCache()
+    cache._seats = {1: SeatEntry(dept_id=10, inner_left=0, outer_left=0)}
+    cache._student_dept = {100: 10}
+    cache._students_refreshed_at = time.monotonic()
+    loading, release = threading.Event(), threading.Event()
+
+    def stale_snapshot():
+        # 快照在退课提交之前读取
+        loading.set()
+        release.wait(5)
+        return {1: SeatEntry(dept_id=10, inner_left=0, outer_left=0)}
+
+    cache._load_seats = stale_snapshot
+
+    async def scenario():
+        refresh = asyncio.create_task(cache.refresh())
+        await asyncio.get_running_loop().run_in_executor(None, loading.wait, 5)
+        cache.on_dropped(100, 1)
+        release.set()
+        await refresh
+
+    asyncio.run(scenario())
+    assert cache.check(100, 1) is None
+    assert cache._seats[1].inner_left == 1
+
+    cache.on_dropped(100, 1)                        # 对账结束后的退课不再重放
+    asyncio.run(cache.refresh())
+    assert cache._seats[1].inner_left == 0
+
+
+def test_waitlist_notify_promotes_dropped_instances():
+    """测试退课通知立即触发对应开课实例的候补补选，未启动时通知被忽略"""
+    async def scenario():
+        promoter = WaitlistPromoter()
+        promoted = []
+
+        async def fake_promote(instance_id):
+            promoted.append(instance_id)
+            return 1
+
+        promoter.promote = fake_promote
+        promoter.notify(1)                  # 未启动，忽略
+        promoter.start()
+        try:
+            promoter.notify(3)
+            promoter.notify(2)
+            promoter.notify(3)
+            for _ in range(50):
+                if len(promoted) >= 2:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await promoter.stop()
+        return promoted
+
+    assert asyncio.run(scenario()) == [2, 3]
@@ -0,0 +1,254 @@
+"""
+选课一致性压力测试（需要数据库连接，且已导入最新的触发器与存储过程）
+
+多个线程并发对一组名额很少、上课时间两两冲突的开课实例随机选课、退课、换课、加入候补，
+并随机触发候补补选（与后端补选协程相同，退课后立即补选），同一学生的请求也会并发执行，
+结束后检查（loadtest/checks.py）：
+- 已选对内/对外人数与选课记录表的实际人数一致
+- 已选人数不超过名额
+- 同一学生没有时间冲突的两门课
+
+另外验证学生调整院系后已选人数随之在对内/对外之间转移，之后退课不产生偏差。
+
+规模可通过环境变量调整：
+    STRESS_TEST_STUDENTS     学生数（默认 200）
+    STRESS_TEST_INSTANCES    开课实例数（默认 8，前一半与后一半按时间段两两冲突）
+    STRESS_TEST_QUOTA        每个开课实例的对内名额（默认 10，对外名额为一半）
+    STRESS_TEST_OPS          请求总数（默认 3000）
+    STRESS_TEST_CONCURRENCY  并发线程数（默认 50）
+    STRESS_TEST_SEED         随机种子（默认 1）
+"""
+import os
+import random
+import threading
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.dal.stored_procedures import sp
+from app.utils.exceptions import BusinessError
+from app.utils.retry import retry_reason, retry_sync
+from loadtest.checks import check_invariants, counter_drift
+
+STUDENTS = int(os.getenv("STRESS_TEST_STUDENTS", "200"))
+INSTANCES = max(2, int(os.getenv("STRESS_TEST_INSTANCES", "8")))
+QUOTA = int(os.getenv("STRESS_TEST_QUOTA", "10"))
+OPS = int(os.getenv("STRESS_TEST_OPS", "3000"))
+CONCURRENCY = int(os.getenv("STRESS_TEST_CONCURRENCY", "50"))
+SEED = int(os.getenv("STRESS_TEST_SEED", "1"))
+
+
+@pytest.fixture(scope="module")
+def campus(live_pool):
+    """
+    创建两个院系、INSTANCES 个开课实例（课程交替属于两个院系，各用一间教室）和 STUDENTS 个学生，
+    测试结束后删除。开课实例 k 与 k + INSTANCES/2 在同一时间段上课（全周 / 单周），选课时互相冲突
+    """
+    tag = uuid.uuid4().hex[:8]
+    half = (INSTANCES + 1) // 2
+    outer = max(1, QUOTA // 2)
+    with live_pool.get_cursor(commit=True) as cursor:
+        cursor.execute("SELECT `时间段ID` FROM `时间段信息表` ORDER BY `时间段ID` LIMIT %s", (half,))
+        slot_ids = [row["时间段ID"] for row in cursor.fetchall()]
+        if len(slot_ids) < half:
+            pytest.skip(f"时间段信息表只有 {len(slot_ids)} 个时间段，需要 {half} 个")
+
+        dept_ids = []
+        for n in range(2):
+            cursor.execute("INSERT INTO `院系信息表` (`院系名称`) VALUES (%s)", (f"压力测试院系{tag}-{n}",))
+            dept_ids.append(cursor.lastrowid)
+        cursor.execute(
+            "INSERT INTO `学期信息表` (`学年`, `学期类型`, `开始日期`, `结束日期`, "
+            "`选课开始时间`, `选课结束时间`) VALUES ('2099-2100', '春季', '2100-02-20', "
+            "'2100-06-30', NOW() - INTERVAL 1 DAY, NOW() + INTERVAL 1 DAY)")
+        semester_id = cursor.lastrowid
+
+        room_ids, course_ids, instance_ids = [], [], []
+        for k in range(INSTANCES):
+            cursor.execute(
+                "INSERT INTO `教室信息表` (`教学楼`, `房间号`, `容量`) VALUES (%s, %s, %s)",
+                (f"压力测试楼{tag}", f"{k + 101}", QUOTA + outer))
+            room_ids.append(cursor.lastrowid)
+            course_ids.append(f"S{tag}{k:02d}")
+            cursor.execute(
+                "INSERT INTO `课程信息表` (`课程ID`, `课程名称`, `学分`, `院系ID`) VALUES (%s, %s, 2, %s)",
+                (course_ids[-1], f"压力测试课程{tag}-{k}", dept_ids[k % 2]))
+            cursor.execute(
+                "INSERT INTO `开课实例表` (`课程ID`, `教室ID`, `学期ID`, `对内名额`, `对外名额`) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                (course_ids[-1], room_ids[-1], semester_id, QUOTA, outer))
+            instance_ids.append(cursor.lastrowid)
+            cursor.execute(
+                "INSERT INTO `上课时间表` (`开课实例ID`, `时间段ID`, `起始周`, `结束周`, `单双周`) "
+                "VALUES (%s, %s, 1, 16, %s)",
+                (instance_ids[-1], slot_ids[k % half], "全部" if k < half else "单周"))
+
+        cursor.executemany(
+            "INSERT INTO `用户信息表` (`学号_工号`, `姓名`, `密码哈希`, `角色`, `院系ID`) "
+            "VALUES (%s, %s, 'x', '学生', %s)",
+            [(f"{tag}{i:05d}", f"压力{i}", dept_ids[i % 2]) for i in range(STUDENTS)])
+        cursor.execute("SELECT `用户ID` FROM `用户信息表` WHERE `学号_工号` LIKE %s", (f"{tag}%",))
+        student_ids = [row["用户ID"] for row in cursor.fetchall()]
+
+    yield {"semester_id": semester_id, "dept_ids": dept_ids, "instance_ids": instance_ids,
+           "student_ids": student_ids}
+
+    with live_pool.get_cursor(commit=True) as cursor:
+        placeholders = ", ".join(["%s"] * len(instance_ids))
+        cursor.execute(f"DELETE FROM `选课记录表` WHERE `开课实例ID` IN ({placeholders})", instance_ids)
+        cursor.execute(f"DELETE FROM `开课实例表` WHERE `开课实例ID` IN ({placeholders})", instance_ids)
+        cursor.execute("DELETE FROM `用户信息表` WHERE `学号_工号` LIKE %s", (f"{tag}%",))
+        cursor.executemany("DELETE FROM `课程信息表` WHERE `课程ID` = %s", course_ids)
+        cursor.execute("DELETE FROM `学期信息表` WHERE `学期ID` = %s", (semester_id,))
+        cursor.executemany("DELETE FROM `教室信息表` WHERE `教室ID` = %s", room_ids)
+        cursor.executemany("DELETE FROM `院系信息表` WHERE `院系ID` = %s", dept_ids)
+
+
+def _call(pool, procedure, *args) -> str:
+    """在独立事务中调用存储过程（死锁等可重试错误按默认策略重试），返回结果分类"""
+    def attempt():
+        with pool.get_cursor(commit=True) as cursor:
+            return procedure(cursor, *args)
+
+    try:
+        retry_sync(attempt, "stress_test")
+        return "ok"
+    except BusinessError as e:
+        return "retry_exhausted" if retry_reason(e) else "business"
+    except Exception as e:
+        return "retry_exhausted" if retry_reason(e) else repr(e)
+
+
+def test_concurrent_traffic_keeps_invariants(live_pool, campus):
+    """测试并发选课、退课、换课、候补补选后：已选人数与选课记录一致、不超额、学生没有时间冲突"""
+    instance_ids, student_ids = campus["instance_ids"], campus["student_ids"]
+    enrolled = defaultdict(set)     # 客户端视角的已选课程，只用于挑选退课、换课的对象
+    errors = []
+    lock = threading.Lock()
+
+    def worker(index: int) -> Counter:
+        rng = random.Random(SEED * 1000 + index)
+        outcomes = Counter()
+        for _ in range(index, OPS, CONCURRENCY):
+            student_id = rng.choice(student_ids)
+            with lock:
+                current = sorted(enrolled[student_id])
+            actions = ("enroll", "waitlist", "drop", "swap") if current else ("enroll", "waitlist")
+            action = rng.choices(actions, weights=(5, 2, 2, 3)[:len(actions)])[0]
+            if action == "enroll":
+                target = rng.choice(instance_ids)
+                result = _call(live_pool, sp.sp_student_enroll, student_id, target)
+                changes = ((), (target,))
+            elif action == "waitlist":
+                # 补选录取的课程不计入客户端视角，只影响退课、换课对象的挑选
+                target = rng.choice(instance_ids)
+                result = _call(live_pool, sp.sp_waitlist_join, student_id, target)
+                changes = ((), ())
+            elif action == "drop":
+                source = rng.choice(current)
+                result = _call(live_pool, sp.sp_student_drop, student_id, source)
+                changes = ((source,), ())
+                if result == "ok":
+                    outcomes["promote", _call(live_pool, sp.sp_waitlist_promote, source)] += 1
+            else:
+                source = rng.choice(current)
+                target = rng.choice([i for i in instance_ids if i != source])
+                result = _call(live_pool, sp.sp_student_swap, student_id, source, target)
+                changes = ((source,), (target,))
+            if result == "ok":
+                with lock:
+                    enrolled[student_id].difference_update(changes[0])
+                    enrolled[student_id].update(changes[1])
+            elif result not in ("business", "retry_exhausted"):
+                errors.append((action, result))
+                result = "error"
+            outcomes[action, result] += 1
+            if rng.random() < 0.05:
+                # 其他进程、管理员释放名额后由定时扫描触发的补选
+                outcomes["promote", _call(live_pool, sp.sp_waitlist_promote, rng.choice(instance_ids))] += 1
+        return outcomes
+
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as executor:
+        outcomes = sum(executor.map(worker, range(CONCURRENCY)), Counter())
+
+    promote_errors = {key: n for key, n in outcomes.items()
+                      if key[0] == "promote" and key[1] not in ("ok", "retry_exhausted")}
+    assert not errors, errors[:5]
+    assert not promote_errors, promote_errors
+    assert outcomes["enroll", "ok"] > 0, dict(outcomes)
+
+    # 最后对每个开课实例补选一次：对应类别还有空余名额时不应再有人等待
+    for instance_id in instance_ids:
+        assert _call(live_pool, sp.sp_waitlist_promote, instance_id) == "ok"
+    placeholders = ", ".join(["%s"] * len(instance_ids))
+    with live_pool.get_cursor() as cursor:
+        violations = check_invariants(cursor, campus["semester_id"])
+        cursor.execute(
+            "SELECT w.`候补ID`, w.`学生ID`, w.`开课实例ID`, w.`名额类型` "
+            "FROM `候补队列表` w "
+            "JOIN `开课实例表` oi ON w.`开课实例ID` = oi.`开课实例ID` "
+            f"WHERE w.`开课实例ID` IN ({placeholders}) AND w.`状态` = '等待' AND ("
+            "  (w.`名额类型` = '对内' AND oi.`已选对内人数` < oi.`对内名额`) OR "
+            "  (w.`名额类型` = '对外' AND oi.`已选对外人数` < oi.`对外名额`))",
+            instance_ids)
+        stranded = cursor.fetchall()
+    assert violations == {"超额": [], "计数偏差": [], "时间冲突": []}, violations
+    assert stranded == [], stranded[:5]
+
+
+def test_department_change_moves_counters(live_pool, campus):
+    """测试学生调整院系后已选人数在对内/对外之间转移，退课后计数仍与选课记录一致"""
+    course_dept, other_dept = campus["dept_ids"]
+    source_id = campus["instance_ids"][0]
+
+    with live_pool.get_cursor(commit=True) as cursor:
+        # 选一个没有选课记录的学生，调整院系时不会牵动其他开课实例的名额
+        cursor.execute(
+            "SELECT u.`用户ID` FROM `用户信息表` u "
+            "WHERE u.`院系ID` = %s "
+            "  AND NOT EXISTS (SELECT 1 FROM `选课记录表` sc WHERE sc.`学生ID` = u.`用户ID`) "
+            "ORDER BY u.`用户ID` LIMIT 1",
+            (other_dept,))
+        row = cursor.fetchone()
+        if row is None:
+            pytest.skip("所有学生都已选课（调小 STRESS_TEST_OPS 或调大 STRESS_TEST_STUDENTS）")
+        student_id = row["用户ID"]
+        # 另开一个对内、对外各 1 个名额且没有排课的开课实例，不受前一个测试的名额和时间冲突影响
+        cursor.execute(
+            "INSERT INTO `开课实例表` (`课程ID`, `教室ID`, `学期ID`, `对内名额`, `对外名额`) "
+            "SELECT `课程ID`, `教室ID`, `学期ID`, 1, 1 FROM `开课实例表` WHERE `开课实例ID` = %s",
+            (source_id,))
+        instance_id = cursor.lastrowid
+
+    def counts():
+        with live_pool.get_cursor() as cursor:
+            cursor.execute(
+                "SELECT `已选对内人数`, `已选对外人数` FROM `开课实例表` WHERE `开课实例ID` = %s",
+                (instance_id,))
+            row = cursor.fetchone()
+            return row["已选对内人数"], row["已选对外人数"]
+
+    def move_to(dept_id):
+        with live_pool.get_cursor(commit=True) as cursor:
+            cursor.execute("UPDATE `用户信息表` SET `院系ID` = %s WHERE `用户ID` = %s", (dept_id, student_id))
+
+    try:
+        with live_pool.get_cursor(commit=True) as cursor:
+            sp.sp_student_enroll(cursor, student_id, instance_id)
+        assert counts() == (0, 1)
+
+        move_to(course_dept)
+        assert counts() == (1, 0)
+        with live_pool.get_cursor() as cursor:
+            assert counter_drift(cursor, campus["semester_id"]) == []
+
+        with live_pool.get_cursor(commit=True) as cursor:
+            sp.sp_student_drop(cursor, student_id, instance_id)
+        assert counts() == (0, 0)
+    finally:
+        move_to(other_dept)
+        with live_pool.get_cursor(commit=True) as cursor:
+            cursor.execute("DELETE FROM `选课记录表` WHERE `开课实例ID` = %s", (instance_id,))
+            cursor.execute("DELETE FROM `开课实例表` WHERE `开课实例ID` = %s", (instance_id,))
@@ -0,0 +1,66 @@
+"""
+测试数据生成器测试（只测生成结果，不连接数据库）
+"""
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from app.services.timetable import from_db, slot_bitmap, week_mask
+from tools.gen_data import GenConfig, Offsets, generate
+
+CONFIG = GenConfig(departments=4, students=300, teachers=40, instances=120, enrollments=1500, seed=7)
+
+
+def _generate():
+    return generate(CONFIG, 4, list(range(1, 26)), datetime(2025, 9, 1, 8),
+                    Offsets(department=8, room=30, user=500, instance=60), ["计算机学院"], ["综合楼01"])
+
+
+def test_generated_data_respects_constraints():
+    """测试生成的数据满足触发器原本会检查的约束：教室/教师不冲突、不超额、学生无时间冲突"""
+    data = _generate()
+    rows = data.rows
+    assert data.count("开课实例表") + data.unplaced == CONFIG.instances
+    assert "计算机学院" not in {name for _, name in rows["院系信息表"]}
+    rooms = [(building, number) for _, building, number, _ in rows["教室信息表"]]
+    assert len(set(rooms)) == len(rooms) and "综合楼01" not in {building for building, _ in rooms}
+    assert min(r[0] for r in rows["用户信息表"]) == 500
+
+    room_cap = {r[0]: r[3] for r in rows["教室信息表"]}
+    course_dept = {r[0]: r[3] for r in rows["课程信息表"]}
+    user_dept = {r[0]: r[5] for r in rows["用户信息表"]}
+    instances = {r[0]: r for r in rows["开课实例表"]}
+
+    room_busy, teacher_busy, bitmaps = defaultdict(int), defaultdict(int), defaultdict(int)
+    for instance_id, slot, teacher_id, start, end, parity in rows["上课时间表"]:
+        mask = week_mask(start, end, parity)
+        key = (instances[instance_id][2], slot)
+        assert not room_busy[key] & mask
+        room_busy[key] |= mask
+        if teacher_id is not None:
+            assert not teacher_busy[teacher_id, slot] & mask
+            teacher_busy[teacher_id, slot] |= mask
+        bitmaps[instance_id] |= slot_bitmap(slot, start, end, parity)
+
+    for instance_id, course_id, room_id, semester_id, inner, outer, bitmap in rows["开课实例表"]:
+        assert semester_id == 4 and inner > 0 and inner + outer <= room_cap[room_id]
+        assert from_db(bitmap) == bitmaps[instance_id]
+
+    enrolled = rows["选课记录表"]
+    assert 0.9 * CONFIG.enrollments <= len(enrolled) <= CONFIG.enrollments
+    assert len({(s, i) for s, i, _ in enrolled}) == len(enrolled)
+    counts = Counter((i, user_dept[s] == course_dept[instances[i][1]]) for s, i, _ in enrolled)
+    for instance_id, _, _, _, inner, outer, _ in rows["开课实例表"]:
+        assert counts[instance_id, True] <= inner and counts[instance_id, False] <= outer
+
+    occupied, taken = defaultdict(int), set()
+    for student_id, instance_id, _ in enrolled:
+        assert not occupied[student_id] & bitmaps[instance_id]
+        occupied[student_id] |= bitmaps[instance_id]
+        course = (student_id, instances[instance_id][1])
+        assert course not in taken
+        taken.add(course)
+
+
+def test_generation_is_deterministic():
+    """测试相同参数生成相同数据"""
+    assert _generate().rows == _generate().rows
@@ -0,0 +1,171 @@
+"""
+幂等键结果存储测试（不需要数据库连接，只使用内存存储）
+"""
+import asyncio
+
+import pytest
+
+from app.services.idempotency import IdempotencyStore
+from app.utils.exceptions import BusinessError, ConflictError
+
+
+def make_store(**kwargs) -> IdempotencyStore:
+    return IdempotencyStore(ttl=kwargs.pop("ttl", 60), persist=False, **kwargs)
+
+
+def test_replay_returns_first_result_without_rerunning():
+    """测试同一个键重试时直接返回第一次的结果，业务失败也按原样返回"""
+    async def scenario():
+        store = make_store()
+        calls = []
+
+        async def enroll():
+            calls.append(1)
+            if len(calls) > 1:
+                raise BusinessError("选课失败: 已选修该课程")
+            return "✅ 选课成功"
+
+        first = await store.run("enroll:16", "k1", "1", enroll)
+        second = await store.run("enroll:16", "k1", "1", enroll)
+        # 其他学生使用相同的键互不影响
+        with pytest.raises(BusinessError):
+            await store.run("enroll:17", "k1", "1", enroll)
+        return first, second, len(calls)
+
+    first, second, calls = asyncio.run(scenario())
+
+    assert first == ("✅ 选课成功", False)
+    assert second == ("✅ 选课成功", True)
+    assert calls == 2
+
+
+def test_business_error_stored_and_key_reuse_rejected():
+    """测试业务失败结果被保存，同一个键用于其他开课实例时返回冲突"""
+    async def scenario():
+        store = make_store()
+
+        async def full():
+            raise BusinessError("选课失败: 名额已满")
+
+        with pytest.raises(BusinessError):
+            await store.run("enroll:16", "k2", "1", full)
+
+        async def should_not_run():
+            raise AssertionError("重放时不应再次执行")
+
+        with pytest.raises(BusinessError, match="名额已满"):
+            await store.run("enroll:16", "k2", "1", should_not_run)
+        with pytest.raises(ConflictError):
+            await store.run("enroll:16", "k2", "2", should_not_run)
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_requests_share_result_and_transient_errors_not_stored():
+    """测试并发的同键请求只执行一次；可重试的错误不保存，下次请求重新执行"""
+    async def scenario():
+        store = make_store()
+        calls = []
+
+        async def slow():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "ok"
+
+        results = await asyncio.gather(*(store.run("drop:16", "k3", "1", slow) for _ in range(5)))
+
+        attempts = []
+
+        async def flaky():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RuntimeError("Lost connection to MySQL server")
+            return "ok"
+
+        with pytest.raises(RuntimeError):
+            await store.run("drop:16", "k4", "1", flaky)
+        retried = await store.run("drop:16", "k4", "1", flaky)
+        return results, len(calls), retried
+
+    results, calls, retried = asyncio.run(scenario())
+
+    assert calls == 1
+    assert sorted(results) == [("ok", False)] + [("ok", True)] * 4
+    assert retried == ("ok", False)
+
+
+def test_expired_and_evicted_entries():
+    """测试过期结果不再重放，超过容量时淘汰最早的结果"""
+    async def scenario():
+        store = make_store(ttl=0, max_entries=2)
+
+        async def ok():
+            return "ok"
+
+        await store.run("enroll:1", "a", "1", ok)
+        replayed = (await store.run("enroll:1", "a", "1", ok))[1]
+        store.ttl = 60
+        for key in ("b", "c", "d"):
+            await store.run("enroll:1", key, "1", ok)
+        return replayed, list(store._results)
+
+    replayed, keys = asyncio.run(scenario())
+
+    assert replayed is False
+    assert keys == ["enroll:1:c", "enroll:1:d"]
+
+
+def test_waiters_rerun_one_at_a_time_after_transient_error():
+    """测试执行中的请求出现可重试错误后，等待的同键请求只有一个重新执行，其余等待它的结果"""
+    async def scenario():
+        store = make_store()
+        running, overlaps, calls = [], [], []
+
+        async def flaky():
+            calls.append(1)
+            running.append(1)
+            overlaps.append(len(running))
+            await asyncio.sleep(0.01)
+            running.pop()
+            if len(calls) == 1:
+                raise RuntimeError("Lost connection to MySQL server")
+            return "ok"
+
+        return await asyncio.gather(*(store.run("enroll:16", "k5", "1", flaky) for _ in range(3)),
+                                    return_exceptions=True), len(calls), max(overlaps), store._inflight
+
+    results, calls, overlap, inflight = asyncio.run(scenario())
+
+    assert isinstance(results[0], RuntimeError)
+    assert sorted(results[1:]) == [("ok", False), ("ok", True)]
+    assert calls == 2 and overlap == 1
+    assert inflight == {}
+
+
+def test_persisted_lookup_does_not_let_concurrent_requests_run_twice():
+    """测试开启持久化时，查表期间到达的同键请求等待而不是各自执行"""
+    async def scenario():
+        store = IdempotencyStore(ttl=60, persist=True)
+        calls = []
+
+        async def load(key):
+            await asyncio.sleep(0.01)
+            return None
+
+        async def save(key, result):
+            pass
+
+        store._load, store._save = load, save
+
+        async def enroll():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "ok"
+
+        results = await asyncio.gather(*(store.run("enroll:16", "k6", "1", enroll) for _ in range(2)))
+        return results, len(calls)
+
+    results, calls = asyncio.run(scenario())
+
+    assert calls == 1
+    assert sorted(results) == [("ok", False), ("ok", True)]
@@ -0,0 +1,78 @@
+"""
+压测场景与压测客户端测试（不需要数据库连接，接口由测试应用提供）
+"""
+import asyncio
+
+import httpx
+import pytest
+
+from loadtest.run import LoadTest, Population
+from loadtest.scenario import SCENARIO_DIR, load_scenario, parse_scenario
+from app.services.waiting_room import TICKET_HEADER
+
+
+@pytest.mark.parametrize("path", sorted(SCENARIO_DIR.glob("*.json")), ids=lambda p: p.stem)
+def test_bundled_scenarios_parse(path):
+    """测试自带的场景文件都能解析"""
+    scenario = load_scenario(path.stem)
+    assert scenario.name == path.stem
+    assert scenario.flow
+
+
+def test_invalid_scenario_rejected():
+    """测试场景字段错误时给出明确的错误"""
+    with pytest.raises(ValueError, match="未知的动作"):
+        parse_scenario({"name": "x", "flow": [{"action": "register"}]})
+    with pytest.raises(ValueError, match="weights"):
+        parse_scenario({"name": "x", "flow": [{"action": "mix", "weights": {"enroll": 1, "login": 1}}]})
+    with pytest.raises(ValueError, match="未知的场景字段"):
+        parse_scenario({"name": "x", "flow": [{"action": "enroll"}], "user": 10})
+
+
+def test_load_test_follows_queue_and_tracks_enrollments():
+    """测试压测客户端：429 时带回排队号重试，按响应记录结果并跟踪选上的课程"""
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse
+
+    app = FastAPI()
+    seen_tickets = []
+
+    @app.post("/api/students/{student_id}/enroll")
+    async def enroll(student_id: int, request: Request):
+        ticket = request.headers.get(TICKET_HEADER)
+        seen_tickets.append(ticket)
+        if ticket is None:
+            return JSONResponse({"code": 429}, status_code=429,
+                                headers={TICKET_HEADER: f"t{student_id}", "Retry-After": "0"})
+        body = await request.json()
+        if body["instance_id"] == 2:
+            return JSONResponse({"message": "名额已满"}, status_code=422)
+        return {"success": True}
+
+    @app.post("/api/students/{student_id}/drop")
+    async def drop(student_id: int):
+        return {"success": True}
+
+    scenario = parse_scenario({
+        "name": "unit", "users": 2, "concurrency": 2,
+        "targets": {"mode": "hot", "top": 1, "share": 1.0},
+        "flow": [{"action": "enroll"}, {"action": "drop"}, {"action": "enroll"}],
+    })
+
+    async def run(hot):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            test = LoadTest(scenario, Population(1, [10, 11], [1, 2], hot), client)
+            return test, await test.run(seed=1)
+
+    accepted, accepted_users = asyncio.run(run([1]))
+    full, full_users = asyncio.run(run([2]))
+
+    assert accepted.recorder.outcomes["enroll"] == {"queued": 2, "ok": 4}
+    assert accepted.recorder.outcomes["drop"] == {"ok": 2}
+    assert [u.enrolled for u in accepted_users] == [{1}, {1}]
+    assert {"t10", "t11"} <= set(seen_tickets)
+
+    assert full.recorder.outcomes["enroll"] == {"queued": 2, "business": 4}
+    assert "drop" not in full.recorder.outcomes           # 没有选上的课程，不发退课请求
+    assert all(not u.enrolled for u in full_users)
@@ -0,0 +1,97 @@
+"""
+抽签选课分配测试（不需要数据库连接）
+"""
+from contextlib import contextmanager
+
+import pytest
+
+from app.services import lottery
+from app.services.lottery import Intent, LotteryInstance, LotteryStudent, allocate, write_allocation
+from app.services.timetable import slot_bitmap
+from app.utils.exceptions import BusinessError
+
+MON_1 = slot_bitmap(1, 1, 16)
+MON_2 = slot_bitmap(2, 1, 16)
+
+
+def make_instances():
+    return {
+        1: LotteryInstance(1, "CS101", dept_id=1, inner_left=1, outer_left=1, bitmap=MON_1),
+        2: LotteryInstance(2, "CS101", dept_id=1, inner_left=5, outer_left=5, bitmap=MON_2),
+        3: LotteryInstance(3, "MA101", dept_id=2, inner_left=5, outer_left=5, bitmap=MON_1),
+    }
+
+
+def make_students():
+    return {sid: LotteryStudent(sid, dept_id=1 if sid <= 3 else 2) for sid in range(1, 6)}
+
+
+def test_quotas_priority_and_constraints():
+    """测试对内/对外名额分别计算、优先级优先中签，时间冲突和同一课程的意向落选"""
+    students = make_students()
+    intents = [Intent(sid, 1, rank=1, priority=1 if sid == 3 else 0) for sid in range(1, 6)]
+    intents += [Intent(sid, 2, rank=2) for sid in range(1, 6)]       # 同一课程的另一开课实例
+    intents += [Intent(sid, 3, rank=3) for sid in range(1, 6)]       # 与开课实例 1 时间冲突
+
+    result = allocate(students, make_instances(), intents, seed=7)
+    won_first = [s for s, i in result.assignments if i == 1]
+
+    assert len(won_first) == 2
+    assert 3 in won_first                                   # 本院系学生中优先级最高
+    assert sum(1 for s in won_first if s > 3) == 1          # 对外名额 1 个
+    # 中签开课实例 1 的学生：同课程的 2 和时间冲突的 3 都落选
+    for student_id in won_first:
+        assert (student_id, 2) not in result.assignments
+        assert (student_id, 3) not in result.assignments
+    assert result.rejected["已选同一课程"] == 2
+    assert result.rejected["时间冲突"] == 2
+    assert result.rejected["名额已满"] == 3
+
+
+def test_existing_enrollment_counts_as_occupied():
+    """测试学生已有选课占用的时间参与冲突检查"""
+    students = make_students()
+    students[1].occupied = MON_2
+    result = allocate(students, make_instances(), [Intent(1, 2, rank=1), Intent(1, 3, rank=2)], seed=1)
+
+    assert result.assignments == [(1, 3)]
+
+
+def test_same_seed_same_result_with_process_pool():
+    """测试同一 seed 在当前进程和进程池中的分配结果一致"""
+    intents = [Intent(sid, i, rank=r) for sid in range(1, 6) for r, i in enumerate((3, 2, 1), 1)]
+
+    inline = allocate(make_students(), make_instances(), intents, seed=42, workers=0)
+    pooled = allocate(make_students(), make_instances(), intents, seed=42, workers=2)
+
+    assert sorted(inline.assignments) == sorted(pooled.assignments)
+
+
+class PendingCursor:
+    """只回答待分配意向数的游标，记录执行过的语句"""
+
+    def __init__(self, pending):
+        self.pending = pending
+        self.statements = []
+
+    def execute(self, sql, params=None):
+        self.statements.append(sql)
+
+    def fetchone(self):
+        return {"n": self.pending}
+
+
+def test_write_rejected_when_intents_already_allocated(monkeypatch):
+    """测试重复触发分配：锁定学期行后发现意向已被处理，拒绝写入"""
+    cursor = PendingCursor(pending=0)
+
+    @contextmanager
+    def get_cursor(**kwargs):
+        yield cursor
+
+    monkeypatch.setattr(lottery.db_pool, "get_cursor", get_cursor)
+    with pytest.raises(BusinessError, match="其他分配"):
+        write_allocation(9, [(1, 1), (2, 1)], pending=2)
+
+    assert "FOR UPDATE" in cursor.statements[0] and "`学期信息表`" in cursor.statements[0]
+    assert not any("INSERT" in sql for sql in cursor.statements)
@@ -0,0 +1,102 @@
+"""
+指标收集与连接池监控测试
+"""
+from app.utils.metrics import MetricsRegistry
+
+
+def test_histogram_quantile_and_render():
+    """测试直方图分位数估算与 Prometheus 导出"""
+    registry = MetricsRegistry()
+    hist = registry.histogram("demo_seconds", "示例", labels={"pool": "test"}, buckets=(0.01, 0.1, 1.0))
+    for value in (0.005, 0.005, 0.05, 0.5):
+        hist.observe(value)
+
+    assert hist.quantile(0.5) == 0.01
+    assert hist.quantile(0.99) == 1.0
+    assert hist.snapshot()["count"] == 4
+
+    text = registry.render_prometheus()
+    assert '# TYPE demo_seconds histogram' in text
+    assert 'demo_seconds_bucket{pool="test",le="+Inf"} 4' in text
+    assert 'demo_seconds_count{pool="test"} 4' in text
+
+
+def test_counter_and_gauge_snapshot():
+    """测试计数器与仪表盘快照"""
+    registry = MetricsRegistry()
+    registry.counter("demo_total", labels={"pool": "a"}).inc(3)
+    gauge = registry.gauge("demo_in_use", labels={"pool": "a"})
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+
+    snapshot = registry.snapshot(prefix="demo_")
+    assert snapshot["demo_total"][0]["value"] == 3
+    assert snapshot["demo_in_use"][0]["value"] == 1
+
+
+def test_pool_stats_endpoint(test_client):
+    """测试连接池状态接口（不需要数据库连接）"""
+    response = test_client.get("/api/monitor/pool")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["success"] is True
+    stats = data["data"]["stats"]
+    assert "in_use" in stats["default"]
+    assert stats["enroll"]["pool"] == "enroll"
+
+
+def test_metrics_endpoint(test_client):
+    """测试 Prometheus 指标导出接口"""
+    response = test_client.get("/api/monitor/metrics")
+
+    assert response.status_code == 200
+    assert "db_pool_checkout_seconds" in response.text
+
+
+def test_dal_hook_records_call_shape():
+    """测试 DAL 钩子记录耗时、行数和参数类型（不记录参数值）"""
+    from app.dal.hooks import profiled, register_hook, unregister_hook
+
+    records = []
+
+    @profiled
+    def sp_fake_query(cursor, student_id, name):
+        return [{"id": 1}, {"id": 2}]
+
+    hook = register_hook(records.append)
+    try:
+        sp_fake_query(None, 1001, "张三")
+    finally:
+        unregister_hook(hook)
+
+    assert len(records) == 1
+    record = records[0]
+    assert record.procedure == "sp_fake_query"
+    assert record.rows == 2
+    assert record.error is None
+    assert record.arg_shape == "(int, str)"
+    from app.utils.metrics import metrics
+    assert "dal_call_seconds" in metrics.snapshot(prefix="dal_")
+
+
+def test_slow_query_normalize_and_full_scan_detection():
+    """测试慢查询 SQL 归一化与执行计划全表扫描识别"""
+    from app.utils.slow_query import full_scan_tables, normalize_sql
+
+    sql = """
+        SELECT t.`开课实例ID`, u.`姓名` -- 教师
+        FROM `授课关系表` t JOIN `用户信息表` u ON t.`教师ID` = u.`用户ID`
+        WHERE t.`开课实例ID` IN (1, 2, 30) AND u.`姓名` = '张三'
+    """
+    assert normalize_sql(sql) == (
+        "SELECT t.`开课实例ID`, u.`姓名` FROM `授课关系表` t JOIN `用户信息表` u "
+        "ON t.`教师ID` = u.`用户ID` WHERE t.`开课实例ID` IN (?+) AND u.`姓名` = ?"
+    )
+
+    plan = {"query_block": {"nested_loop": [
+        {"table": {"table_name": "选课记录表", "access_type": "ALL"}},
+        {"table": {"table_name": "用户信息表", "access_type": "eq_ref"}},
+    ]}}
+    assert full_scan_tables(plan) == ["选课记录表"]
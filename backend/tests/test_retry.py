@@ -0,0 +1,55 @@
+"""
+重试策略测试（不需要数据库连接）
+"""
+import asyncio
+
+import pymysql
+import pytest
+
+from app.utils.exceptions import DatabaseError
+from app.utils.retry import RetryPolicy, current_attempt, mysql_error_code, retry_async, retry_reason
+
+FAST = RetryPolicy(max_attempts=3, base_delay=0.001, max_delay=0.002)
+
+
+def _deadlock():
+    try:
+        raise pymysql.err.OperationalError(1213, "Deadlock found when trying to get lock")
+    except pymysql.Error as e:
+        raise DatabaseError(f"选课操作失败: {str(e)}") from e
+
+
+def test_error_code_found_through_exception_chain():
+    """测试沿异常链识别被 DAL 包装的 MySQL 错误码"""
+    with pytest.raises(DatabaseError) as exc_info:
+        _deadlock()
+    assert mysql_error_code(exc_info.value) == 1213
+    assert retry_reason(exc_info.value) == "deadlock"
+    assert retry_reason(pymysql.err.IntegrityError(1062, "Duplicate entry")) is None
+
+
+def test_retry_async_retries_deadlock_until_success():
+    """测试死锁时退避重试，成功后返回结果"""
+    attempts = []
+
+    async def _operation():
+        attempts.append(current_attempt())
+        if len(attempts) < 3:
+            _deadlock()
+        return "ok"
+
+    assert asyncio.run(retry_async(_operation, "test-deadlock", FAST)) == "ok"
+    assert attempts == [0, 1, 2]
+
+
+def test_retry_async_does_not_retry_business_errors():
+    """测试不可重试错误立即抛出"""
+    attempts = []
+
+    async def _operation():
+        attempts.append(1)
+        raise pymysql.err.OperationalError(1644, "名额已满")
+
+    with pytest.raises(pymysql.err.OperationalError):
+        asyncio.run(retry_async(_operation, "test-business", FAST))
+    assert len(attempts) == 1
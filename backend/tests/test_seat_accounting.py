@@ -0,0 +1,155 @@
+"""
+选课名额并发测试（需要数据库连接，且已导入最新的触发器与存储过程）
+
+大量学生同时选同一个开课实例，验证条件 UPDATE 占用名额后：
+- 选课成功人数恰好等于名额，没有超选
+- 开课实例表中的已选人数与选课记录表一致
+
+换课（sp_student_swap）在新课程名额已满时整体回滚，原课程保留。
+
+并发规模可通过环境变量调整：
+    SEAT_TEST_ENROLLS      选课请求数（默认 1000）
+    SEAT_TEST_CONCURRENCY  并发线程数（默认 100）
+    SEAT_TEST_QUOTA        对内名额（默认 50）
+"""
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.dal.stored_procedures import sp
+from app.utils.exceptions import BusinessError
+
+ENROLLS = int(os.getenv("SEAT_TEST_ENROLLS", "1000"))
+CONCURRENCY = int(os.getenv("SEAT_TEST_CONCURRENCY", "100"))
+QUOTA = int(os.getenv("SEAT_TEST_QUOTA", "50"))
+
+
+@pytest.fixture(scope="module")
+def crowded_instance(live_pool):
+    """创建一个对内名额为 QUOTA 的开课实例和 ENROLLS 个本院系学生，测试结束后删除"""
+    tag = uuid.uuid4().hex[:8]
+    with live_pool.get_cursor(commit=True) as cursor:
+        cursor.execute("INSERT INTO `院系信息表` (`院系名称`) VALUES (%s)", (f"并发测试院系{tag}",))
+        dept_id = cursor.lastrowid
+        cursor.execute(
+            "INSERT INTO `教室信息表` (`教学楼`, `房间号`, `容量`) VALUES (%s, %s, %s)",
+            (f"并发测试楼{tag}", "101", QUOTA))
+        classroom_id = cursor.lastrowid
+        cursor.execute(
+            "INSERT INTO `学期信息表` (`学年`, `学期类型`, `开始日期`, `结束日期`, "
+            "`选课开始时间`, `选课结束时间`) VALUES ('2099-2100', '秋季', '2099-09-01', "
+            "'2100-01-15', NOW() - INTERVAL 1 DAY, NOW() + INTERVAL 1 DAY)")
+        semester_id = cursor.lastrowid
+        course_id = f"T{tag}"
+        cursor.execute(
+            "INSERT INTO `课程信息表` (`课程ID`, `课程名称`, `学分`, `院系ID`) VALUES (%s, %s, 1, %s)",
+            (course_id, f"并发测试课程{tag}", dept_id))
+        cursor.execute(
+            "INSERT INTO `开课实例表` (`课程ID`, `教室ID`, `学期ID`, `对内名额`, `对外名额`) "
+            "VALUES (%s, %s, %s, %s, 0)",
+            (course_id, classroom_id, semester_id, QUOTA))
+        instance_id = cursor.lastrowid
+        cursor.executemany(
+            "INSERT INTO `用户信息表` (`学号_工号`, `姓名`, `密码哈希`, `角色`, `院系ID`) "
+            "VALUES (%s, %s, 'x', '学生', %s)",
+            [(f"{tag}{i:05d}", f"并发{i}", dept_id) for i in range(ENROLLS)])
+        cursor.execute("SELECT `用户ID` FROM `用户信息表` WHERE `院系ID` = %s", (dept_id,))
+        student_ids = [row["用户ID"] for row in cursor.fetchall()]
+
+    yield instance_id, student_ids
+
+    with live_pool.get_cursor(commit=True) as cursor:
+        # 有选课记录的开课实例不能删除（trg_before_course_instance_delete_check），先删选课记录
+        cursor.execute("DELETE FROM `选课记录表` WHERE `开课实例ID` = %s", (instance_id,))
+        cursor.execute(
+            "DELETE sc FROM `选课记录表` sc JOIN `用户信息表` u ON sc.`学生ID` = u.`用户ID` "
+            "WHERE u.`院系ID` = %s", (dept_id,))
+        cursor.execute(
+            "DELETE w FROM `候补队列表` w JOIN `用户信息表` u ON w.`学生ID` = u.`用户ID` "
+            "WHERE u.`院系ID` = %s", (dept_id,))
+        cursor.execute("DELETE FROM `开课实例表` WHERE `开课实例ID` = %s", (instance_id,))
+        cursor.execute("DELETE FROM `用户信息表` WHERE `院系ID` = %s", (dept_id,))
+        cursor.execute("DELETE FROM `课程信息表` WHERE `课程ID` = %s", (course_id,))
+        cursor.execute("DELETE FROM `学期信息表` WHERE `学期ID` = %s", (semester_id,))
+        cursor.execute("DELETE FROM `教室信息表` WHERE `教室ID` = %s", (classroom_id,))
+        cursor.execute("DELETE FROM `院系信息表` WHERE `院系ID` = %s", (dept_id,))
+
+
+def test_parallel_enroll_never_oversubscribes(live_pool, crowded_instance):
+    """测试大量并发选课：成功人数等于名额，已选人数与选课记录一致，且没有死锁"""
+    instance_id, student_ids = crowded_instance
+
+    def enroll(student_id):
+        try:
+            with live_pool.get_cursor(commit=True) as cursor:
+                sp.sp_student_enroll(cursor, student_id, instance_id)
+            return "ok"
+        except BusinessError as e:
+            return "full" if "名额已满" in e.message else e.message
+        except Exception as e:
+            return repr(e)
+
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as executor:
+        results = list(executor.map(enroll, student_ids))
+
+    unexpected = [r for r in results if r not in ("ok", "full")]
+    assert not unexpected, unexpected[:5]
+    assert results.count("ok") == min(QUOTA, len(student_ids))
+
+    with live_pool.get_cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) AS n FROM `选课记录表` WHERE `开课实例ID` = %s", (instance_id,))
+        enrolled = cursor.fetchone()["n"]
+        cursor.execute("SELECT `已选对内人数` FROM `开课实例表` WHERE `开课实例ID` = %s", (instance_id,))
+        counter = cursor.fetchone()["已选对内人数"]
+    assert enrolled == counter == min(QUOTA, len(student_ids))
+
+
+def test_swap_rolls_back_when_target_full(live_pool, crowded_instance):
+    """测试换课：新开课实例有名额时换课成功，名额已满时回滚并保留原课程"""
+    instance_id, student_ids = crowded_instance
+
+    with live_pool.get_cursor(commit=True) as cursor:
+        cursor.execute(
+            "INSERT INTO `开课实例表` (`课程ID`, `教室ID`, `学期ID`, `对内名额`, `对外名额`) "
+            "SELECT `课程ID`, `教室ID`, `学期ID`, 1, 0 FROM `开课实例表` WHERE `开课实例ID` = %s",
+            (instance_id,))
+        target_id = cursor.lastrowid
+        cursor.execute("SELECT `学生ID` FROM `选课记录表` WHERE `开课实例ID` = %s", (instance_id,))
+        enrolled = [row["学生ID"] for row in cursor.fetchall()]
+        # 单独运行本测试时先选上两名学生
+        for student_id in student_ids:
+            if len(enrolled) >= 2:
+                break
+            if student_id not in enrolled:
+                sp.sp_student_enroll(cursor, student_id, instance_id)
+                enrolled.append(student_id)
+
+    def counts():
+        with live_pool.get_cursor() as cursor:
+            cursor.execute(
+                "SELECT `开课实例ID`, `已选对内人数` FROM `开课实例表` WHERE `开课实例ID` IN (%s, %s)",
+                (instance_id, target_id))
+            return {row["开课实例ID"]: row["已选对内人数"] for row in cursor.fetchall()}
+
+    try:
+        before = counts()
+        first, second = enrolled[:2]
+        with live_pool.get_cursor(commit=True) as cursor:
+            assert "换课成功" in sp.sp_student_swap(cursor, first, instance_id, target_id)
+        with pytest.raises(BusinessError, match="名额已满"):
+            with live_pool.get_cursor(commit=True) as cursor:
+                sp.sp_student_swap(cursor, second, instance_id, target_id)
+
+        after = counts()
+        assert after[instance_id] == before[instance_id] - 1
+        assert after[target_id] == 1
+        with live_pool.get_cursor() as cursor:
+            cursor.execute(
+                "SELECT `开课实例ID` FROM `选课记录表` WHERE `学生ID` = %s", (second,))
+            assert [row["开课实例ID"] for row in cursor.fetchall()] == [instance_id]
+    finally:
+        with live_pool.get_cursor(commit=True) as cursor:
+            cursor.execute("DELETE FROM `选课记录表` WHERE `开课实例ID` = %s", (target_id,))
+            cursor.execute("DELETE FROM `开课实例表` WHERE `开课实例ID` = %s", (target_id,))
@@ -0,0 +1,62 @@
+"""
+课表时间位图测试（不需要数据库连接）
+"""
+import itertools
+
+import pytest
+
+from app.services import timetable
+from app.services.timetable import BitmapMatrix, instance_bitmap, slot_bitmap, week_mask
+
+PARITIES = ("全部", "单周", "双周")
+
+
+def _weeks(start, end, parity):
+    return {w for w in range(start, end + 1)
+            if parity == "全部" or (w % 2 == 1) == (parity == "单周")}
+
+
+def test_week_mask_matches_actual_weeks():
+    """测试周次掩码按位与等价于"两者有共同的上课周"（含单双周规则）"""
+    ranges = [(s, e) for s in range(1, 21) for e in range(s, 21, 3)]
+    for (s1, e1), (s2, e2) in itertools.product(ranges[::7], ranges[::5]):
+        for p1, p2 in itertools.product(PARITIES, repeat=2):
+            overlap = (week_mask(s1, e1, p1) & week_mask(s2, e2, p2)) != 0
+            assert overlap == bool(_weeks(s1, e1, p1) & _weeks(s2, e2, p2))
+
+
+def test_week_mask_values():
+    assert week_mask(1, 20) == 0xFFFFF
+    assert week_mask(1, 8, "单周") == 0b01010101
+    assert week_mask(9, 16, "双周") == 0b1010101000000000
+    with pytest.raises(ValueError):
+        week_mask(0, 5)
+
+
+def test_instance_bitmap_and_batch_checks():
+    """测试开课实例位图合并，以及批量空闲/冲突矩阵检查"""
+    a = instance_bitmap([{"时间段ID": 1, "起始周": 1, "结束周": 16, "单双周": "全部"}])
+    b = instance_bitmap([{"时间段ID": 1, "起始周": 1, "结束周": 16, "单双周": "单周"},
+                         {"时间段ID": 6, "起始周": 1, "结束周": 8, "单双周": "全部"}])
+    c = instance_bitmap([{"时间段ID": 2, "起始周": 1, "结束周": 16, "单双周": "全部"}])
+    assert a & b and not a & c
+    assert slot_bitmap(102, 20, 20) == 1 << (102 * 20 - 1)
+    assert timetable.from_db(timetable.to_db(b)) == b
+
+    matrix = BitmapMatrix({1: a, 2: b, 3: c})
+    assert matrix.free_with(a) == [3]
+    assert [list(map(bool, row)) for row in matrix.conflict_matrix()] == [
+        [False, True, False],
+        [True, False, False],
+        [False, False, False],
+    ]
+
+
+def test_batch_checks_without_numpy(monkeypatch):
+    """测试未安装 NumPy 时的纯 Python 实现"""
+    monkeypatch.setattr(timetable, "np", None)
+    a = slot_bitmap(3, 1, 16)
+    b = slot_bitmap(3, 9, 16, "双周")
+    matrix = BitmapMatrix({1: a, 2: b, 3: slot_bitmap(4, 1, 16)})
+    assert matrix.free_with(b) == [3]
+    assert matrix.conflict_matrix()[0][1] is True
@@ -0,0 +1,163 @@
+"""
+选课排队测试（不需要数据库连接，排队时间直接设置）
+"""
+import subprocess
+import sys
+import time
+import uuid
+
+import pytest
+
+from app.config import settings
+from app.services.waiting_room import (
+    TICKET_HEADER, GateWindow, WaitingRoom, WaitingRoomMiddleware, _SharedCounter,
+)
+
+
+@pytest.fixture
+def room(monkeypatch):
+    """选课刚开始：立即放行 2 个排队号，之后每秒放行 1 个"""
+    monkeypatch.setattr(settings, "WAITING_ROOM_BURST", 2)
+    monkeypatch.setattr(settings, "WAITING_ROOM_RATE", 1.0)
+    room = WaitingRoom(shared=False)
+    now = time.monotonic()
+    room.window = GateWindow(semester_id=1, key=(1 << 40) | 1756684800, opens_at=now, closes_at=now + 60)
+    return room
+
+
+def test_tickets_admitted_by_rate(room):
+    """测试按排队号放行：前 BURST 个立即放行，之后按速率放行，位次和预计等待时间随时间减少"""
+    opens_at = room.window.opens_at
+    first, second, third = (room.admit(student_id, now=opens_at) for student_id in (1, 2, 3))
+
+    assert first.admitted and second.admitted
+    assert not third.admitted
+    assert third.position == 1 and third.eta == pytest.approx(1.0)
+
+    # 带回原排队号重试：排队号不变，1 秒后放行
+    assert not room.admit(3, third.ticket, now=opens_at + 0.5).admitted
+    retry = room.admit(3, third.ticket, now=opens_at + 1.0)
+    assert retry.admitted and retry.ticket == third.ticket
+
+
+def test_ticket_bound_to_student_and_window(room):
+    """测试排队号校验：篡改、换学生使用或上一轮排队的排队号都视为无效"""
+    ticket = room.issue(5)
+
+    assert room.parse(ticket, 5) == 1
+    assert room.parse(ticket, 6) is None
+    assert room.parse(ticket.replace(".1.", ".0.", 1), 5) is None
+    assert room.parse("not-a-ticket", 5) is None
+
+    room.window = GateWindow(1, room.window.key + 1, room.window.opens_at, room.window.closes_at)
+    assert room.parse(ticket, 5) is None
+    assert room.issue(5).split(".")[2] == "1"   # 新一轮排队重新编号
+
+
+def test_ticketless_retries_keep_their_number(room):
+    """测试不带排队号重复请求：每个学生每轮排队只领一个号，不挤占后面学生的位次"""
+    opens_at = room.window.opens_at
+    for student_id in (1, 2, 3):
+        room.admit(student_id, now=opens_at)
+    retries = [room.admit(3, now=opens_at) for _ in range(5)]
+
+    assert {admission.ticket for admission in retries} == {retries[0].ticket}
+    assert all(admission.position == 1 for admission in retries)
+    assert room.admit(4, now=opens_at).position == 2
+    assert room.counter.current(room.window.key) == 4
+
+
+def test_middleware_queues_gated_paths(room):
+    """测试中间件：排队期间只拦截选课/可选课程接口，未放行的请求返回 429 和排队号"""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    app = FastAPI()
+
+    @app.post("/api/students/{student_id}/enroll")
+    async def enroll(student_id: int):
+        return "enrolled"
+
+    @app.get("/api/students/{student_id}/schedule")
+    async def schedule(student_id: int):
+        return "schedule"
+
+    room.window.opens_at = time.monotonic() + 3600      # 未到选课开始时间：不排队
+    room.window.closes_at = room.window.opens_at + 60
+    app.add_middleware(WaitingRoomMiddleware, room=room)
+    client = TestClient(app)
+    assert client.post("/api/students/1/enroll").json() == "enrolled"
+
+    room.window.opens_at = time.monotonic()
+    room.window.closes_at = room.window.opens_at + 60
+    for student_id in (1, 2):
+        response = client.post(f"/api/students/{student_id}/enroll")
+        assert response.json() == "enrolled"
+        assert response.headers[TICKET_HEADER]
+
+    queued = client.post("/api/students/3/enroll")
+    assert queued.status_code == 429
+    assert queued.json()["data"]["position"] == 1
+    assert queued.headers["Retry-After"] == "1"
+    assert queued.headers[TICKET_HEADER] == queued.json()["data"]["ticket"]
+
+    assert client.get("/api/students/3/schedule").json() == "schedule"
+
+
+def test_shared_counter_across_handles():
+    """测试共享内存计数：同名的多个计数器（模拟多个工作进程）共用排队号"""
+    try:
+        first = _SharedCounter(f"test_waiting_room_{uuid.uuid4().hex[:8]}")
+    except (ImportError, OSError) as e:
+        pytest.skip(f"共享内存不可用: {e}")
+    second = _SharedCounter(first._shm.name.lstrip("/"))
+    try:
+        assert [first.next(7), second.next(7), first.next(7)] == [1, 2, 3]
+        assert second.current(7) == 3
+        assert second.next(8) == 1      # 新一轮排队重新编号
+    finally:
+        second.close()
+        first.unlink()
+        first.close()
+
+
+def test_shared_counter_survives_worker_exit_and_restart():
+    """测试共享内存段不随某个工作进程退出而删除，重启后的进程继续递增，不重复发号"""
+    name = f"test_waiting_room_{uuid.uuid4().hex[:8]}"
+    try:
+        first = _SharedCounter(name)
+    except (ImportError, OSError) as e:
+        pytest.skip(f"共享内存不可用: {e}")
+    try:
+        assert first.next(7) == 1
+        # 另一个工作进程连接、发号后退出
+        worker = ("from app.services.waiting_room import _SharedCounter\n"
+                  f"counter = _SharedCounter({name!r})\n"
+                  "print(counter.next(7))\n"
+                  "counter.close()\n")
+        output = subprocess.run([sys.executable, "-c", worker], capture_output=True, text=True,
+                                check=True, timeout=60)
+        assert output.stdout.strip() == "2"
+        assert "leaked" not in output.stderr
+
+        first.close()                   # 本进程也重启：重新连接同一个段
+        first = _SharedCounter(name)
+        assert first.next(7) == 3
+    finally:
+        first.unlink()
+        first.close()
+
+
+def test_shared_counter_unlink_leaves_resource_tracker_quiet():
+    """测试删除共享内存段：不会再向 resource_tracker 注销一次（进程退出时不报 KeyError）"""
+    name = f"test_waiting_room_{uuid.uuid4().hex[:8]}"
+    script = ("from app.services.waiting_room import _SharedCounter\n"
+              f"counter = _SharedCounter({name!r})\n"
+              "counter.next(7)\n"
+              "counter.unlink()\n"
+              "counter.close()\n")
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, timeout=60)
+    if output.returncode != 0 and ("ImportError" in output.stderr or "OSError" in output.stderr):
+        pytest.skip(f"共享内存不可用: {output.stderr.strip().splitlines()[-1]}")
+    assert output.returncode == 0, output.stderr
+    assert "KeyError" not in output.stderr and "leaked" not in output.stderr
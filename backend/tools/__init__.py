@@ -0,0 +1,3 @@
+"""
+运维与测试数据工具（python -m tools.<模块>）
+"""
@@ -0,0 +1,468 @@
+"""
+大规模测试数据生成
+按学校规模生成院系、教室、课程、教师、学生、当前学期的开课实例、排课和选课记录，
+为基准测试、压测（loadtest）和索引调优提供接近真实的数据量与分布：
+
+- 排课：每个开课实例 1-3 个时间段（以全学期为主，含前/后 8 周、单双周），
+  教室按 --density 的时段占用率分配，同一教室、同一教师的上课时间互不冲突
+- 选课：每名学生平均 --enrollments / --students 门，约 70% 选本院系课程，课程热度偏斜；
+  不超过对内/对外名额、同一学生没有时间冲突、不重复选同一课程
+- 写入：独立连接上关闭外键与唯一性检查，设置 @_bulk_load 让排课、选课触发器跳过逐行检查，
+  按 --batch 行批量写入（多行 INSERT，或 --method infile 使用 LOAD DATA LOCAL INFILE）；
+  时间位图随开课实例一起写入，已选人数写入后由 sp_refresh_enroll_counts 一次重算，
+  最后用 loadtest/checks.py 检查超额、计数偏差和时间冲突
+
+生成的账号密码均为 123456（测试密码格式），学号/工号以 GS/GT 开头。
+默认追加到现有数据之后（ID 接在各表最大值之后）；--reset 先执行 database/00_clear_data.sql 清空全部数据。
+
+用法（在 backend 目录下，需配置好 .env）:
+    python -m tools.gen_data                              # 6 万学生、3000 教师、8000 开课实例、40 万选课记录
+    python -m tools.gen_data --scale 0.1 --reset
+    python -m tools.gen_data --method infile --batch 20000
+    python -m tools.gen_data --dry-run                    # 只生成并统计，不连接数据库
+"""
+import argparse
+import bisect
+import itertools
+import math
+import os
+import random
+import tempfile
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import pymysql
+
+from app.config import settings
+from app.database import ssl_config
+from app.services.timetable import slot_bitmap, to_db, week_mask
+from benchmarks.common import Timer
+
+CLEAR_DATA_SQL = Path(__file__).resolve().parents[2] / "database" / "00_clear_data.sql"
+
+WEEKDAY_SLOTS = 25      # 周一至周五，每天 5 节（与 04_insert_data.sql 相同）
+PERIODS = [("08:00:00", "09:40:00"), ("10:00:00", "11:40:00"), ("14:00:00", "15:40:00"),
+           ("16:00:00", "17:40:00"), ("19:00:00", "20:40:00")]
+
+# (单双周, 起始周, 结束周), 权重
+WEEK_PATTERNS = [(("全部", 1, 16), 70), (("全部", 1, 8), 8), (("全部", 9, 16), 8),
+                 (("单周", 1, 16), 7), (("双周", 1, 16), 7)]
+SLOTS_PER_INSTANCE = [(1, 25), (2, 60), (3, 15)]
+ROOM_CAPACITIES = [(30, 10), (40, 15), (60, 30), (80, 20), (120, 15), (200, 10)]
+CREDITS = [1.0, 1.5, 2.0, 2.5, 3.0, 3.0, 3.5, 4.0, 4.0, 5.0]
+OWN_DEPT_SHARE = 0.7    # 选本院系课程的比例
+
+COLLEGES = ["计算机学院", "软件学院", "电子信息工程学院", "自动化学院", "机械工程学院", "材料科学与工程学院",
+            "航空科学与工程学院", "能源与动力工程学院", "交通科学与工程学院", "可靠性与系统工程学院",
+            "数学科学学院", "物理学院", "化学学院", "生物与医学工程学院", "经济管理学院", "法学院",
+            "外国语学院", "人文社会科学学院", "新闻传播学院", "马克思主义学院", "仪器科学与光电工程学院",
+            "宇航学院", "网络空间安全学院", "人工智能研究院", "集成电路科学与工程学院", "空间与环境学院",
+            "体育部", "艺术学院", "国际学院", "高等工程学院"]
+SUBJECTS = ["程序设计", "数据结构", "高等数学", "线性代数", "概率统计", "大学物理", "电路分析", "信号与系统",
+            "工程力学", "材料力学", "机械原理", "控制理论", "数字逻辑", "操作系统", "计算机网络", "数据库原理",
+            "编译技术", "软件工程", "人工智能导论", "机器学习", "微观经济学", "管理学原理", "大学英语",
+            "学术写作", "中国近现代史纲要", "思想道德与法治", "体育", "有机化学", "热力学", "流体力学"]
+LEVELS = ["", "A", "B", "(1)", "(2)", "基础", "进阶", "实验"]
+SURNAMES = "王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘于蒋蔡余杜叶程苏魏吕丁任沈姚卢姜崔钟谭陆汪范金石廖贾夏韦付方白邹孟熊秦邱江尹薛闫段雷侯龙史陶黎贺顾毛郝龚邵万钱严覃武戴莫孔向汤"
+GIVEN = "伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂英华玉兰萍红鹏飞宇浩然子轩涵欣怡诺思远博文佳琪晨阳睿泽雨萱梓"
+PASSWORD_HASH = "hash_gen"
+
+# 各表写入的列（按写入顺序）
+TABLES: Dict[str, Tuple[str, ...]] = {
+    "院系信息表": ("院系ID", "院系名称"),
+    "教室信息表": ("教室ID", "教学楼", "房间号", "容量"),
+    "课程信息表": ("课程ID", "课程名称", "学分", "院系ID"),
+    "用户信息表": ("用户ID", "学号_工号", "姓名", "密码哈希", "角色", "院系ID"),
+    "开课实例表": ("开课实例ID", "课程ID", "教室ID", "学期ID", "对内名额", "对外名额", "时间位图"),
+    "授课关系表": ("教师ID", "开课实例ID"),
+    "上课时间表": ("开课实例ID", "时间段ID", "教师ID", "起始周", "结束周", "单双周"),
+    "选课记录表": ("学生ID", "开课实例ID", "选课时间"),
+}
+BINARY_COLUMNS = {"时间位图"}
+
+
+@dataclass
+class GenConfig:
+    departments: int = 30
+    students: int = 60000
+    teachers: int = 3000
+    instances: int = 8000
+    enrollments: int = 400000
+    courses: Optional[int] = None       # 默认 instances * 2 / 5
+    rooms: Optional[int] = None         # 默认按 density 计算
+    density: float = 0.6                # 教室时段占用率
+    seed: int = 20250901
+
+    def scaled(self, scale: float) -> "GenConfig":
+        for name in ("students", "teachers", "instances", "enrollments"):
+            setattr(self, name, max(1, int(getattr(self, name) * scale)))
+        return self
+
+
+@dataclass
+class Offsets:
+    """追加写入时各表的起始ID（各表当前最大ID + 1）"""
+    department: int = 1
+    room: int = 1
+    user: int = 1
+    instance: int = 1
+
+
+@dataclass
+class Dataset:
+    semester_id: int
+    rows: Dict[str, List[tuple]] = field(default_factory=lambda: defaultdict(list))
+    unplaced: int = 0       # 找不到无冲突教室/时段而未生成的开课实例数
+
+    def count(self, table: str) -> int:
+        return len(self.rows[table])
+
+
+def _weighted(rng: random.Random, choices: Sequence[Tuple[object, int]]):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights=weights)[0]
+
+
+def _name(rng: random.Random) -> str:
+    return rng.choice(SURNAMES) + "".join(rng.choice(GIVEN) for _ in range(rng.choice((1, 2, 2))))
+
+
+def generate(config: GenConfig, semester_id: int, slot_ids: Sequence[int], window_start: datetime,
+             offsets: Optional[Offsets] = None, existing_departments: Sequence[str] = (),
+             existing_buildings: Sequence[str] = ()) -> Dataset:
+    """生成全部数据（不访问数据库，相同参数得到相同数据）"""
+    rng = random.Random(config.seed)
+    offsets = offsets or Offsets()
+    data = Dataset(semester_id)
+    rows = data.rows
+
+    # 院系
+    taken = set(existing_departments)
+    dept_ids = []
+    for n in range(config.departments):
+        name = COLLEGES[n % len(COLLEGES)]
+        suffix = n // len(COLLEGES) + 1
+        while name in taken:
+            suffix += 1
+            name = f"{COLLEGES[n % len(COLLEGES)]}{suffix}"
+        taken.add(name)
+        dept_ids.append(offsets.department + n)
+        rows["院系信息表"].append((dept_ids[-1], name))
+
+    # 教室：按目标占用率估算数量，容量按常见教室分布
+    mean_slots = sum(k * w for k, w in SLOTS_PER_INSTANCE) / sum(w for _, w in SLOTS_PER_INSTANCE)
+    room_count = config.rooms or math.ceil(config.instances * mean_slots / (len(slot_ids) * config.density))
+    rooms = sorted((_weighted(rng, ROOM_CAPACITIES), offsets.room + n) for n in range(room_count))
+    room_caps = [cap for cap, _ in rooms]
+    # 每栋楼 60 间，楼名跳过已有教学楼（追加写入时不与已有教室的 教学楼+房间号 重复）
+    taken_buildings = set(existing_buildings)
+    building_no, building = 0, ""
+    for n, (cap, room_id) in enumerate(rooms):
+        if n % 60 == 0:
+            building_no += 1
+            while f"综合楼{building_no:02d}" in taken_buildings:
+                building_no += 1
+            building = f"综合楼{building_no:02d}"
+        rows["教室信息表"].append((room_id, building, f"{n % 60 // 20 + 1}{n % 20 + 1:02d}", cap))
+
+    # 课程：每个院系若干门，热度按 Zipf 分布（少数公共课、必修课开很多个班）
+    course_count = config.courses or max(config.departments, config.instances * 2 // 5)
+    course_dept: Dict[str, int] = {}
+    courses = []
+    for n in range(course_count):
+        dept_id = dept_ids[n % len(dept_ids)]
+        course_id = f"G{dept_id % 1000:03d}{n:05d}"
+        course_dept[course_id] = dept_id
+        courses.append(course_id)
+        rows["课程信息表"].append(
+            (course_id, f"{rng.choice(SUBJECTS)}{rng.choice(LEVELS)}", rng.choice(CREDITS), dept_id))
+    rng.shuffle(courses)
+    popularity = {course_id: 1.0 / (rank + 1) ** 0.6 for rank, course_id in enumerate(courses)}
+
+    # 用户：教师、学生按院系均匀分布
+    user_id = offsets.user
+    teachers_by_dept: Dict[int, List[int]] = defaultdict(list)
+    student_dept: Dict[int, int] = {}
+    for n in range(config.teachers):
+        dept_id = dept_ids[n % len(dept_ids)]
+        rows["用户信息表"].append((user_id, f"GT{user_id:07d}", _name(rng), PASSWORD_HASH, "教师", dept_id))
+        teachers_by_dept[dept_id].append(user_id)
+        user_id += 1
+    for n in range(config.students):
+        dept_id = rng.choice(dept_ids)
+        rows["用户信息表"].append((user_id, f"GS{user_id:08d}", _name(rng), PASSWORD_HASH, "学生", dept_id))
+        student_dept[user_id] = dept_id
+        user_id += 1
+
+    # 开课实例：每门课至少一个班，其余按热度分配；为每个实例找无冲突的教室、时段和教师
+    instance_courses = list(courses[:min(len(courses), config.instances)])
+    cum = list(itertools.accumulate(popularity[c] for c in courses))
+    instance_courses += rng.choices(courses, cum_weights=cum, k=config.instances - len(instance_courses))
+
+    room_busy: Dict[Tuple[int, int], int] = defaultdict(int)
+    teacher_busy: Dict[Tuple[int, int], int] = defaultdict(int)
+    instances: Dict[int, Tuple[str, int]] = {}      # 开课实例ID -> (课程ID, 时间位图)
+    inner_left: Dict[int, int] = {}
+    outer_left: Dict[int, int] = {}
+    instance_id = offsets.instance
+    for course_id in instance_courses:
+        wanted = _weighted(rng, ROOM_CAPACITIES)
+        candidates = rooms[bisect.bisect_left(room_caps, wanted):] or rooms
+        placed = None
+        for attempt in range(60):
+            count = 1 if attempt >= 40 else _weighted(rng, SLOTS_PER_INSTANCE)
+            slots = [(slot, _weighted(rng, WEEK_PATTERNS)) for slot in rng.sample(slot_ids, count)]
+            masks = [(slot, week_mask(start, end, parity)) for slot, (parity, start, end) in slots]
+            cap, room_id = rng.choice(candidates)
+            if all(not room_busy[room_id, slot] & mask for slot, mask in masks):
+                placed = cap, room_id, slots, masks
+                break
+        if placed is None:
+            data.unplaced += 1
+            continue
+        cap, room_id, slots, masks = placed
+        for slot, mask in masks:
+            room_busy[room_id, slot] |= mask
+
+        # 教师：本院系中所有时段都空闲的 1-2 名教师，找不到时该时段不指定教师
+        dept_teachers = teachers_by_dept.get(course_dept[course_id]) or [None]
+        wanted_teachers = 2 if rng.random() < 0.2 else 1
+        assigned: List[int] = []
+        for teacher_id in rng.sample(dept_teachers, min(len(dept_teachers), 12)):
+            if teacher_id is None or len(assigned) == wanted_teachers:
+                break
+            if all(not teacher_busy[teacher_id, slot] & mask for slot, mask in masks):
+                assigned.append(teacher_id)
+        for teacher_id in assigned:
+            rows["授课关系表"].append((teacher_id, instance_id))
+
+        bitmap = 0
+        for n, ((slot, (parity, start, end)), (_, mask)) in enumerate(zip(slots, masks)):
+            teacher_id = assigned[n % len(assigned)] if assigned else None
+            if teacher_id is not None:
+                teacher_busy[teacher_id, slot] |= mask
+            rows["上课时间表"].append((instance_id, slot, teacher_id, start, end, parity))
+            bitmap |= slot_bitmap(slot, start, end, parity)
+
+        total = max(2, int(cap * rng.uniform(0.6, 1.0)))
+        outer = int(total * rng.uniform(0.1, 0.3))
+        rows["开课实例表"].append(
+            (instance_id, course_id, room_id, semester_id, total - outer, outer, to_db(bitmap)))
+        instances[instance_id] = (course_id, bitmap)
+        inner_left[instance_id], outer_left[instance_id] = total - outer, outer
+        instance_id += 1
+
+    # 选课：本院系课程与全校课程两个候选池，按课程热度抽取
+    by_dept: Dict[int, List[int]] = defaultdict(list)
+    for iid, (course_id, _) in instances.items():
+        by_dept[course_dept[course_id]].append(iid)
+    everything = list(instances)
+    pools = {dept_id: (ids, list(itertools.accumulate(popularity[instances[i][0]] for i in ids)))
+             for dept_id, ids in by_dept.items()}
+    global_pool = (everything, list(itertools.accumulate(popularity[instances[i][0]] for i in everything)))
+
+    mean = config.enrollments / max(1, config.students)
+    remaining = config.enrollments
+    students = list(student_dept)
+    rng.shuffle(students)
+    for student_id in students:
+        if remaining <= 0 or not everything:
+            break
+        dept_id = student_dept[student_id]
+        target = min(remaining, max(0, min(12, round(rng.gauss(mean, 2)))))
+        occupied, chosen_courses, chosen = 0, set(), 0
+        for _ in range(target * 15):
+            if chosen >= target:
+                break
+            ids, cw = pools[dept_id] if dept_id in pools and rng.random() < OWN_DEPT_SHARE else global_pool
+            iid = rng.choices(ids, cum_weights=cw)[0]
+            course_id, bitmap = instances[iid]
+            if course_id in chosen_courses or occupied & bitmap:
+                continue
+            left = inner_left if course_dept[course_id] == dept_id else outer_left
+            if left[iid] <= 0:
+                continue
+            left[iid] -= 1
+            occupied |= bitmap
+            chosen_courses.add(course_id)
+            chosen += 1
+            enrolled_at = window_start + timedelta(seconds=int(rng.expovariate(1 / 7200)))
+            rows["选课记录表"].append((student_id, iid, enrolled_at.strftime("%Y-%m-%d %H:%M:%S")))
+        remaining -= chosen
+    return data
+
+
+# ---------- 写入数据库 ----------
+
+def connect(local_infile: bool = False) -> pymysql.connections.Connection:
+    """导入专用连接（会话变量和 LOAD DATA 需要固定在同一个连接上，不使用连接池）"""
+    return pymysql.connect(
+        host=settings.DB_HOST, port=settings.DB_PORT, user=settings.DB_USER,
+        password=settings.DB_PASSWORD, database=settings.DB_NAME, charset=settings.DB_CHARSET,
+        ssl=ssl_config(), cursorclass=pymysql.cursors.DictCursor, autocommit=False,
+        local_infile=local_infile, read_timeout=3600, write_timeout=3600,
+    )
+
+
+def reset(cursor):
+    """执行 database/00_clear_data.sql 清空全部数据"""
+    lines = [line for line in CLEAR_DATA_SQL.read_text(encoding="utf-8").splitlines()
+             if not line.strip().startswith("--")]
+    for statement in "\n".join(lines).split(";"):
+        if statement.strip():
+            cursor.execute(statement)
+
+
+def prepare(cursor) -> Tuple[int, List[int], datetime, Offsets, List[str], List[str]]:
+    """读取（必要时创建）当前学期和时间段、各表的起始ID，以及已有的院系名称和教学楼"""
+    cursor.execute("SELECT `时间段ID` FROM `时间段信息表` WHERE `时间段ID` <= 102 ORDER BY `时间段ID`")
+    slot_ids = [row["时间段ID"] for row in cursor.fetchall()]
+    if not slot_ids:
+        cursor.executemany(
+            "INSERT INTO `时间段信息表` (`星期`, `开始时间`, `结束时间`) VALUES (%s, %s, %s)",
+            [(day, start, end) for day in range(1, 6) for start, end in PERIODS])
+        cursor.execute("SELECT `时间段ID` FROM `时间段信息表` ORDER BY `时间段ID`")
+        slot_ids = [row["时间段ID"] for row in cursor.fetchall()]
+
+    cursor.execute("SELECT `学期ID`, `选课开始时间` FROM `学期信息表` WHERE `是否当前学期` = TRUE LIMIT 1")
+    semester = cursor.fetchone()
+    if semester is None:
+        cursor.execute(
+            "INSERT INTO `学期信息表` (`学年`, `学期类型`, `开始日期`, `结束日期`, "
+            "                          `选课开始时间`, `选课结束时间`, `是否当前学期`) "
+            "VALUES ('2025-2026', '春季', CURDATE(), DATE_ADD(CURDATE(), INTERVAL 120 DAY), "
+            "        NOW(), DATE_ADD(NOW(), INTERVAL 30 DAY), TRUE)")
+        cursor.execute("SELECT `学期ID`, `选课开始时间` FROM `学期信息表` WHERE `学期ID` = LAST_INSERT_ID()")
+        semester = cursor.fetchone()
+
+    def next_id(table: str, column: str) -> int:
+        cursor.execute(f"SELECT COALESCE(MAX(`{column}`), 0) + 1 AS n FROM `{table}`")
+        return int(cursor.fetchone()["n"])
+
+    offsets = Offsets(next_id("院系信息表", "院系ID"), next_id("教室信息表", "教室ID"),
+                      next_id("用户信息表", "用户ID"), next_id("开课实例表", "开课实例ID"))
+    cursor.execute("SELECT `院系名称` FROM `院系信息表`")
+    departments = [row["院系名称"] for row in cursor.fetchall()]
+    cursor.execute("SELECT DISTINCT `教学楼` FROM `教室信息表`")
+    buildings = [row["教学楼"] for row in cursor.fetchall()]
+    return (semester["学期ID"], slot_ids, semester["选课开始时间"] or datetime.now(),
+            offsets, departments, buildings)
+
+
+def insert_rows(cursor, table: str, rows: List[tuple], batch: int):
+    """多行 INSERT（PyMySQL 的 executemany 会把 VALUES 合并为一条语句）"""
+    columns = TABLES[table]
+    sql = (f"INSERT INTO `{table}` ({', '.join(f'`{c}`' for c in columns)}) "
+           f"VALUES ({', '.join(['%s'] * len(columns))})")
+    for start in range(0, len(rows), batch):
+        cursor.executemany(sql, rows[start:start + batch])
+
+
+def _tsv_value(value) -> str:
+    if value is None:
+        return r"\N"
+    if isinstance(value, bytes):
+        return value.hex()
+    return str(value)
+
+
+def load_rows(cursor, table: str, rows: List[tuple], batch: int):
+    """写入临时 TSV 文件后 LOAD DATA LOCAL INFILE（二进制列以十六进制写入，导入时 UNHEX）"""
+    columns = TABLES[table]
+    targets = [f"@`{c}`" if c in BINARY_COLUMNS else f"`{c}`" for c in columns]
+    assignments = [f"`{c}` = UNHEX(@`{c}`)" for c in columns if c in BINARY_COLUMNS]
+    sql = (f"LOAD DATA LOCAL INFILE %s INTO TABLE `{table}` CHARACTER SET utf8mb4 "
+           f"FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' ({', '.join(targets)})"
+           + (f" SET {', '.join(assignments)}" if assignments else ""))
+    for start in range(0, len(rows), batch):
+        fd, path = tempfile.mkstemp(suffix=".tsv", prefix=f"gen_{start}_")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8", newline="\n") as f:
+                for row in rows[start:start + batch]:
+                    f.write("\t".join(_tsv_value(v) for v in row) + "\n")
+            cursor.execute(sql, (path,))
+        finally:
+            os.unlink(path)
+
+
+def write(connection, data: Dataset, method: str, batch: int):
+    """按表写入，触发器跳过逐行检查；写入后重算已选人数"""
+    writer = load_rows if method == "infile" else insert_rows
+    with connection.cursor() as cursor:
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 0, UNIQUE_CHECKS = 0, @_bulk_load = 1")
+        try:
+            for table in TABLES:
+                rows = data.rows[table]
+                with Timer() as timer:
+                    writer(cursor, table, rows, batch)
+                    connection.commit()
+                rate = len(rows) / timer.elapsed if timer.elapsed > 0 else 0
+                print(f"  {table:<8}{len(rows):>10} 行{timer.elapsed:>9.1f}s{rate:>12.0f} 行/s")
+        finally:
+            cursor.execute("SET FOREIGN_KEY_CHECKS = 1, UNIQUE_CHECKS = 1, @_bulk_load = NULL")
+
+        with Timer() as timer:
+            cursor.execute("CALL sp_refresh_enroll_counts(%s)", (data.semester_id,))
+            connection.commit()
+        print(f"  重算已选人数 {timer.elapsed:.1f}s")
+
+
+def main(args):
+    config = GenConfig(departments=args.departments, students=args.students, teachers=args.teachers,
+                       instances=args.instances, enrollments=args.enrollments, courses=args.courses,
+                       rooms=args.rooms, density=args.density, seed=args.seed).scaled(args.scale)
+
+    connection = None
+    if args.dry_run:
+        semester_id, slot_ids, window_start = 1, list(range(1, WEEKDAY_SLOTS + 1)), datetime.now()
+        offsets, departments, buildings = Offsets(), [], []
+    else:
+        connection = connect(local_infile=args.method == "infile")
+        with connection.cursor() as cursor:
+            if args.reset:
+                reset(cursor)
+            semester_id, slot_ids, window_start, offsets, departments, buildings = prepare(cursor)
+        connection.commit()
+
+    with Timer() as timer:
+        data = generate(config, semester_id, slot_ids, window_start, offsets, departments, buildings)
+    print(f"生成完成 {timer.elapsed:.1f}s（学期 {semester_id}，{len(slot_ids)} 个时间段）")
+    for table in TABLES:
+        print(f"  {table:<8}{data.count(table):>10} 行")
+    if data.unplaced:
+        print(f"  {data.unplaced} 个开课实例找不到无冲突的教室/时段，未生成（可增加 --rooms 或降低 --density）")
+    if connection is None:
+        return
+
+    print(f"写入数据库（{args.method}，每批 {args.batch} 行）")
+    try:
+        write(connection, data, args.method, args.batch)
+        from loadtest.checks import check_invariants
+        with connection.cursor() as cursor:
+            for name, rows in check_invariants(cursor, semester_id).items():
+                print(f"检查 {name}: {'通过' if not rows else f'{len(rows)} 处，如 {rows[0]}'}")
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="按学校规模生成测试数据并批量导入")
+    parser.add_argument("--departments", type=int, default=30, help="院系数")
+    parser.add_argument("--students", type=int, default=60000, help="学生数")
+    parser.add_argument("--teachers", type=int, default=3000, help="教师数")
+    parser.add_argument("--instances", type=int, default=8000, help="当前学期开课实例数")
+    parser.add_argument("--enrollments", type=int, default=400000, help="选课记录数（上限，受名额与冲突约束）")
+    parser.add_argument("--courses", type=int, help="课程数，默认为开课实例数的 2/5")
+    parser.add_argument("--rooms", type=int, help="教室数，默认按 --density 计算")
+    parser.add_argument("--density", type=float, default=0.6, help="教室时段占用率")
+    parser.add_argument("--scale", type=float, default=1.0, help="学生、教师、开课实例、选课记录数的缩放比例")
+    parser.add_argument("--seed", type=int, default=20250901, help="随机种子")
+    parser.add_argument("--method", choices=("insert", "infile"), default="insert",
+                        help="insert: 多行 INSERT；infile: LOAD DATA LOCAL INFILE（需服务端开启 local_infile）")
+    parser.add_argument("--batch", type=int, default=5000, help="每条 INSERT / 每个文件的行数")
+    parser.add_argument("--reset", action="store_true", help="先清空全部数据（00_clear_data.sql）")
+    parser.add_argument("--dry-run", action="store_true", help="只生成并统计，不连接数据库")
+    main(parser.parse_args())
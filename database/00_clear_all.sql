@@ -17,10 +17,14 @@ DROP TRIGGER IF EXISTS `trg_before_schedule_check_teacher`;
 DROP TRIGGER IF EXISTS `trg_before_schedule_check_room`;
 DROP TRIGGER IF EXISTS `trg_before_schedule_update_check_teacher`;
 DROP TRIGGER IF EXISTS `trg_before_schedule_update_check_room`;
+DROP TRIGGER IF EXISTS `trg_after_schedule_insert_bitmap`;
+DROP TRIGGER IF EXISTS `trg_after_schedule_update_bitmap`;
+DROP TRIGGER IF EXISTS `trg_after_schedule_delete_bitmap`;
 DROP TRIGGER IF EXISTS `trg_before_enroll_update_prevent`;
 DROP TRIGGER IF EXISTS `trg_before_course_instance_delete_check`;
 DROP TRIGGER IF EXISTS `trg_before_course_instance_check_capacity`;
 DROP TRIGGER IF EXISTS `trg_before_course_instance_update_check_capacity`;
+DROP TRIGGER IF EXISTS `trg_after_user_dept_update`;
 
 -- 3. 删除所有存储过程
 DROP PROCEDURE IF EXISTS `sp_add_department`;
@@ -30,16 +34,27 @@ DROP PROCEDURE IF EXISTS `sp_add_user`;
 DROP PROCEDURE IF EXISTS `sp_create_course_instance`;
 DROP PROCEDURE IF EXISTS `sp_assign_teacher`;
 DROP PROCEDURE IF EXISTS `sp_add_schedule_time`;
+DROP PROCEDURE IF EXISTS `sp_enroll_core`;
 DROP PROCEDURE IF EXISTS `sp_student_enroll`;
 DROP PROCEDURE IF EXISTS `sp_student_drop`;
+DROP PROCEDURE IF EXISTS `sp_waitlist_join`;
+DROP PROCEDURE IF EXISTS `sp_waitlist_leave`;
+DROP PROCEDURE IF EXISTS `sp_waitlist_promote`;
+DROP PROCEDURE IF EXISTS `sp_student_swap`;
+DROP PROCEDURE IF EXISTS `sp_refresh_enroll_counts`;
 DROP PROCEDURE IF EXISTS `sp_get_student_schedule`;
 DROP PROCEDURE IF EXISTS `sp_get_teacher_schedule`;
 DROP PROCEDURE IF EXISTS `sp_get_available_courses`;
 DROP PROCEDURE IF EXISTS `sp_batch_add_students`;
 DROP PROCEDURE IF EXISTS `sp_get_enrollment_statistics`;
+DROP PROCEDURE IF EXISTS `sp_refresh_time_bitmap`;
+DROP FUNCTION IF EXISTS `fn_week_mask`;
 
 -- 4. 删除所有表（含外键依赖顺序）
+DROP TABLE IF EXISTS `幂等记录表`;
 DROP TABLE IF EXISTS `上课时间表`;
+DROP TABLE IF EXISTS `候补队列表`;
+DROP TABLE IF EXISTS `选课意向表`;
 DROP TABLE IF EXISTS `选课记录表`;
 DROP TABLE IF EXISTS `授课关系表`;
 DROP TABLE IF EXISTS `开课实例表`;
@@ -5,7 +5,10 @@
 SET FOREIGN_KEY_CHECKS = 0;
 
 -- 清空所有表数据（按外键依赖顺序）
+TRUNCATE TABLE `幂等记录表`;
 TRUNCATE TABLE `上课时间表`;
+TRUNCATE TABLE `候补队列表`;
+TRUNCATE TABLE `选课意向表`;
 TRUNCATE TABLE `选课记录表`;
 TRUNCATE TABLE `授课关系表`;
 TRUNCATE TABLE `开课实例表`;
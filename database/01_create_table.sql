@@ -47,6 +47,8 @@ CREATE TABLE `学期信息表` (
   `结束日期` DATE NOT NULL,
   `选课开始时间` DATETIME DEFAULT NULL,
   `选课结束时间` DATETIME DEFAULT NULL,
+  -- 先到先得：选课时间内直接选课；抽签：选课时间内只收集选课意向，结束后统一分配
+  `选课模式` ENUM('先到先得','抽签') NOT NULL DEFAULT '先到先得',
   `是否当前学期` BOOLEAN NOT NULL DEFAULT FALSE,
   PRIMARY KEY (`学期ID`),
   KEY `idx_当前学期` (`是否当前学期`)
@@ -94,6 +96,7 @@ CREATE TABLE `开课实例表` (
   `对外名额` INT(11) NOT NULL,
   `已选对内人数` INT(11) NOT NULL DEFAULT 0,
   `已选对外人数` INT(11) NOT NULL DEFAULT 0,
+  `时间位图` BINARY(256) DEFAULT NULL COMMENT '上课时间占用位图(第 (时间段ID-1)*20+(周次-1) 位)，由上课时间表触发器维护',
   PRIMARY KEY (`开课实例ID`),
   KEY `idx_课程` (`课程ID`),
   KEY `idx_教室` (`教室ID`),
@@ -136,6 +139,43 @@ CREATE TABLE `选课记录表` (
   CONSTRAINT `fk_选课_开课实例` FOREIGN KEY (`开课实例ID`) REFERENCES `开课实例表` (`开课实例ID`) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
+-- 候补队列表（名额已满时学生排队，有人退课后按加入顺序自动补选）
+DROP TABLE IF EXISTS `候补队列表`;
+CREATE TABLE `候补队列表` (
+  `候补ID` BIGINT NOT NULL AUTO_INCREMENT,
+  `学生ID` INT(11) NOT NULL,
+  `开课实例ID` INT(11) NOT NULL,
+  `名额类型` ENUM('对内','对外') NOT NULL,
+  `状态` ENUM('等待','已录取','已失效','已取消') NOT NULL DEFAULT '等待',
+  `加入时间` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `处理时间` TIMESTAMP NULL DEFAULT NULL,
+  `备注` VARCHAR(255) DEFAULT NULL,
+  -- 等待中的记录为 1，其余为 NULL：同一学生对同一开课实例只能有一条等待记录，历史记录不受限制
+  `等待标记` TINYINT GENERATED ALWAYS AS (IF(`状态` = '等待', 1, NULL)) STORED,
+  PRIMARY KEY (`候补ID`),
+  UNIQUE KEY `uk_学生_开课实例_等待` (`学生ID`, `开课实例ID`, `等待标记`),
+  KEY `idx_开课实例_状态` (`开课实例ID`, `状态`, `名额类型`, `候补ID`),
+  CONSTRAINT `fk_候补_学生` FOREIGN KEY (`学生ID`) REFERENCES `用户信息表` (`用户ID`),
+  CONSTRAINT `fk_候补_开课实例` FOREIGN KEY (`开课实例ID`) REFERENCES `开课实例表` (`开课实例ID`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 选课意向表（抽签选课学期：学生在选课时间内提交按志愿排序的意向，结束后统一分配）
+DROP TABLE IF EXISTS `选课意向表`;
+CREATE TABLE `选课意向表` (
+  `意向ID` BIGINT NOT NULL AUTO_INCREMENT,
+  `学生ID` INT(11) NOT NULL,
+  `开课实例ID` INT(11) NOT NULL,
+  `志愿序号` TINYINT UNSIGNED NOT NULL,            -- 1 为第一志愿
+  `优先级` TINYINT NOT NULL DEFAULT 0,            -- 教务可按需调整（如毕业年级、本专业必修课），越大越优先
+  `状态` ENUM('待分配','已中签','未中签') NOT NULL DEFAULT '待分配',
+  `提交时间` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`意向ID`),
+  UNIQUE KEY `uk_学生_开课实例` (`学生ID`, `开课实例ID`),
+  KEY `idx_开课实例_状态` (`开课实例ID`, `状态`),
+  CONSTRAINT `fk_意向_学生` FOREIGN KEY (`学生ID`) REFERENCES `用户信息表` (`用户ID`) ON DELETE CASCADE,
+  CONSTRAINT `fk_意向_开课实例` FOREIGN KEY (`开课实例ID`) REFERENCES `开课实例表` (`开课实例ID`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
 -- 上课时间表（开课实例 M:N 时间段，支持周次范围和单双周设置）
 DROP TABLE IF EXISTS `上课时间表`;
 CREATE TABLE `上课时间表` (
@@ -146,6 +186,12 @@ CREATE TABLE `上课时间表` (
   `起始周` INT(11) NOT NULL DEFAULT 1,
   `结束周` INT(11) NOT NULL DEFAULT 16,
   `单双周` ENUM('全部','单周','双周') NOT NULL DEFAULT '全部',
+  -- 上课周次掩码：第 (周次-1) 位表示该周上课，已按单双周过滤（与 fn_week_mask 的计算方式一致）
+  -- 349525 = 0x55555（单周），699050 = 0xAAAAA（双周），1048575 = 0xFFFFF（1-20 周全部）
+  `周次掩码` INT UNSIGNED GENERATED ALWAYS AS (
+      ((1 << `结束周`) - (1 << (`起始周` - 1)))
+      & (CASE `单双周` WHEN '单周' THEN 349525 WHEN '双周' THEN 699050 ELSE 1048575 END)
+  ) STORED,
   PRIMARY KEY (`上课时间ID`),
   UNIQUE KEY `uk_开课实例_时间段_周次` (`开课实例ID`, `时间段ID`, `起始周`, `结束周`, `单双周`),
   KEY `idx_时间段` (`时间段ID`),
@@ -159,6 +205,18 @@ CREATE TABLE `上课时间表` (
   CHECK (`结束周` >= `起始周`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='记录开课实例的上课时间安排,支持分周次、单双周等灵活排课';
 
+-- 幂等记录表（选课/退课接口 Idempotency-Key 的处理结果，后端开启 IDEMPOTENCY_PERSIST 时使用）
+DROP TABLE IF EXISTS `幂等记录表`;
+CREATE TABLE `幂等记录表` (
+  `幂等键` VARCHAR(128) NOT NULL,
+  `请求摘要` VARCHAR(64) NOT NULL,
+  `是否成功` TINYINT(1) NOT NULL,
+  `消息` VARCHAR(255) NOT NULL,
+  `过期时间` DATETIME NOT NULL,
+  PRIMARY KEY (`幂等键`),
+  KEY `idx_过期时间` (`过期时间`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
 -- 视图
 
 -- 视图1: 当前学期开课实例视图（自动筛选当前学期并计算剩余名额）
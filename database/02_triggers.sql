@@ -10,7 +10,7 @@ DELIMITER $$
 CREATE TRIGGER `trg_before_enroll_check`
 BEFORE INSERT ON `选课记录表`
 FOR EACH ROW
-BEGIN
+trg: BEGIN
     DECLARE v_课程ID VARCHAR(20);
     DECLARE v_院系ID INT;
     DECLARE v_学生院系ID INT;
@@ -22,15 +22,21 @@ BEGIN
     DECLARE v_选课开始时间 DATETIME;
     DECLARE v_选课结束时间 DATETIME;
     DECLARE v_是否本院系 BOOLEAN;
-    DECLARE v_冲突数 INT;
+    DECLARE v_课程位图 VARBINARY(256);
+    DECLARE v_已选位图 VARBINARY(256);
+    
+    -- 批量写入（抽签分配、tools/gen_data.py）：名额、时间冲突已由写入程序检查，人数写入后统一重算（sp_refresh_enroll_counts）
+    IF @_bulk_load = 1 THEN
+        LEAVE trg;
+    END IF;
     
     -- 获取开课实例信息
     SELECT oi.`课程ID`, c.`院系ID`, oi.`学期ID`,
            oi.`对内名额`, oi.`对外名额`, 
-           oi.`已选对内人数`, oi.`已选对外人数`
+           oi.`已选对内人数`, oi.`已选对外人数`, oi.`时间位图`
     INTO v_课程ID, v_院系ID, v_学期ID,
          v_对内名额, v_对外名额,
-         v_已选对内人数, v_已选对外人数
+         v_已选对内人数, v_已选对外人数, v_课程位图
     FROM `开课实例表` oi
     JOIN `课程信息表` c ON oi.`课程ID` = c.`课程ID`
     WHERE oi.`开课实例ID` = NEW.`开课实例ID`;
@@ -55,16 +61,18 @@ BEGIN
     -- 判断是否本院系学生
     SET v_是否本院系 = (v_学生院系ID = v_院系ID);
     
-    -- 1. 检查名额是否已满
-    IF v_是否本院系 THEN
-        IF v_已选对内人数 >= v_对内名额 THEN
-            SIGNAL SQLSTATE '45000'
-            SET MESSAGE_TEXT = '选课失败: 本院系名额已满';
-        END IF;
-    ELSE
-        IF v_已选对外人数 >= v_对外名额 THEN
-            SIGNAL SQLSTATE '45000'
-            SET MESSAGE_TEXT = '选课失败: 跨院系名额已满';
+    -- 1. 检查名额是否已满（sp_student_enroll 已通过条件 UPDATE 占用名额时跳过）
+    IF NOT (@_seat_reserved <=> NEW.`开课实例ID`) THEN
+        IF v_是否本院系 THEN
+            IF v_已选对内人数 >= v_对内名额 THEN
+                SIGNAL SQLSTATE '45000'
+                SET MESSAGE_TEXT = '选课失败: 本院系名额已满';
+            END IF;
+        ELSE
+            IF v_已选对外人数 >= v_对外名额 THEN
+                SIGNAL SQLSTATE '45000'
+                SET MESSAGE_TEXT = '选课失败: 跨院系名额已满';
+            END IF;
         END IF;
     END IF;
     
@@ -91,24 +99,14 @@ BEGIN
     END IF;
     
     -- 4. 检查时间冲突(考虑周次，排除同一门课)
-    SELECT COUNT(*) INTO v_冲突数
+    -- 已选课程的时间位图按位或得到学生的占用位图，与本课程位图按位与不为 0 即冲突
+    SELECT BIT_OR(oi.`时间位图`) INTO v_已选位图
     FROM `选课记录表` sc
-    JOIN `上课时间表` t1 ON sc.`开课实例ID` = t1.`开课实例ID`
-    JOIN `上课时间表` t2 ON t2.`开课实例ID` = NEW.`开课实例ID`
+    JOIN `开课实例表` oi ON sc.`开课实例ID` = oi.`开课实例ID`
     WHERE sc.`学生ID` = NEW.`学生ID`
-      AND sc.`开课实例ID` != NEW.`开课实例ID`  -- 排除同一门课
-      AND t1.`时间段ID` = t2.`时间段ID`
-      -- 周次范围重叠检查
-      AND t1.`起始周` <= t2.`结束周`
-      AND t1.`结束周` >= t2.`起始周`
-      -- 单双周冲突检查
-      AND (
-          t1.`单双周` = '全部' OR 
-          t2.`单双周` = '全部' OR 
-          t1.`单双周` = t2.`单双周`
-      );
+      AND sc.`开课实例ID` != NEW.`开课实例ID`;  -- 排除同一门课
     
-    IF v_冲突数 > 0 THEN
+    IF BIT_COUNT(v_已选位图 & v_课程位图) > 0 THEN
         SIGNAL SQLSTATE '45000'
         SET MESSAGE_TEXT = '选课失败: 上课时间冲突';
     END IF;
@@ -122,10 +120,15 @@ DELIMITER $$
 CREATE TRIGGER `trg_after_enroll_update_count`
 AFTER INSERT ON `选课记录表`
 FOR EACH ROW
-BEGIN
+trg: BEGIN
     DECLARE v_课程院系ID INT;
     DECLARE v_学生院系ID INT;
     
+    -- 批量写入，人数写入后统一重算
+    IF @_bulk_load = 1 THEN
+        LEAVE trg;
+    END IF;
+    
     -- 获取课程所属院系
     SELECT c.`院系ID` INTO v_课程院系ID
     FROM `开课实例表` oi
@@ -137,15 +140,23 @@ BEGIN
     FROM `用户信息表`
     WHERE `用户ID` = NEW.`学生ID`;
     
-    -- 根据是否本院系更新对应的已选人数
-    IF v_学生院系ID = v_课程院系ID THEN
-        UPDATE `开课实例表`
-        SET `已选对内人数` = `已选对内人数` + 1
-        WHERE `开课实例ID` = NEW.`开课实例ID`;
-    ELSE
-        UPDATE `开课实例表`
-        SET `已选对外人数` = `已选对外人数` + 1
-        WHERE `开课实例ID` = NEW.`开课实例ID`;
+    -- sp_student_enroll 已在插入前占用名额，不再重复计数
+    IF NOT (@_seat_reserved <=> NEW.`开课实例ID`) THEN
+        -- 其他途径直接插入选课记录时同样使用条件 UPDATE，名额已满则整条插入失败
+        IF v_学生院系ID = v_课程院系ID THEN
+            UPDATE `开课实例表`
+            SET `已选对内人数` = `已选对内人数` + 1
+            WHERE `开课实例ID` = NEW.`开课实例ID` AND `已选对内人数` < `对内名额`;
+        ELSE
+            UPDATE `开课实例表`
+            SET `已选对外人数` = `已选对外人数` + 1
+            WHERE `开课实例ID` = NEW.`开课实例ID` AND `已选对外人数` < `对外名额`;
+        END IF;
+        
+        IF ROW_COUNT() = 0 THEN
+            SIGNAL SQLSTATE '45000'
+            SET MESSAGE_TEXT = '选课失败: 名额已满';
+        END IF;
     END IF;
 END$$
 DELIMITER ;
@@ -195,8 +206,8 @@ FOR EACH ROW
 BEGIN
     DECLARE v_冲突数 INT;
     
-    -- 如果没有指定教师,跳过教师冲突检查
-    IF NEW.`教师ID` IS NULL THEN
+    -- 如果没有指定教师或批量导入(已由导入程序排除冲突),跳过教师冲突检查
+    IF NEW.`教师ID` IS NULL OR @_bulk_load = 1 THEN
         SET v_冲突数 = 0;
     ELSE
         -- 检查教师时间冲突(同一时间段+周次重叠+单双周冲突)
@@ -204,15 +215,8 @@ BEGIN
         FROM `上课时间表` t
         WHERE t.`教师ID` = NEW.`教师ID`
           AND t.`时间段ID` = NEW.`时间段ID`
-          -- 周次范围重叠
-          AND t.`起始周` <= NEW.`结束周`
-          AND t.`结束周` >= NEW.`起始周`
-          -- 单双周冲突
-          AND (
-              t.`单双周` = '全部' OR 
-              NEW.`单双周` = '全部' OR 
-              t.`单双周` = NEW.`单双周`
-          )
+          -- 上课周次重叠(周次掩码按位与，已包含单双周规则)
+          AND (t.`周次掩码` & fn_week_mask(NEW.`起始周`, NEW.`结束周`, NEW.`单双周`)) != 0
           AND t.`开课实例ID` != NEW.`开课实例ID`;
         
         IF v_冲突数 > 0 THEN
@@ -229,10 +233,15 @@ DELIMITER $$
 CREATE TRIGGER `trg_before_schedule_check_room`
 BEFORE INSERT ON `上课时间表`
 FOR EACH ROW
-BEGIN
+trg: BEGIN
     DECLARE v_教室ID INT;
     DECLARE v_冲突数 INT;
     
+    -- 批量导入：教室冲突已由导入程序排除
+    IF @_bulk_load = 1 THEN
+        LEAVE trg;
+    END IF;
+    
     -- 获取当前开课实例的教室
     SELECT `教室ID` INTO v_教室ID
     FROM `开课实例表`
@@ -250,15 +259,8 @@ BEGIN
     JOIN `开课实例表` oi ON t.`开课实例ID` = oi.`开课实例ID`
     WHERE oi.`教室ID` = v_教室ID
       AND t.`时间段ID` = NEW.`时间段ID`
-      -- 周次范围重叠
-      AND t.`起始周` <= NEW.`结束周`
-      AND t.`结束周` >= NEW.`起始周`
-      -- 单双周冲突
-      AND (
-          t.`单双周` = '全部' OR 
-          NEW.`单双周` = '全部' OR 
-          t.`单双周` = NEW.`单双周`
-      )
+      -- 上课周次重叠(周次掩码按位与，已包含单双周规则)
+      AND (t.`周次掩码` & fn_week_mask(NEW.`起始周`, NEW.`结束周`, NEW.`单双周`)) != 0
       AND t.`开课实例ID` != NEW.`开课实例ID`;
     
     IF v_冲突数 > 0 THEN
@@ -286,13 +288,7 @@ BEGIN
         FROM `上课时间表` t
         WHERE t.`教师ID` = NEW.`教师ID`
           AND t.`时间段ID` = NEW.`时间段ID`
-          AND t.`起始周` <= NEW.`结束周`
-          AND t.`结束周` >= NEW.`起始周`
-          AND (
-              t.`单双周` = '全部' OR 
-              NEW.`单双周` = '全部' OR 
-              t.`单双周` = NEW.`单双周`
-          )
+          AND (t.`周次掩码` & fn_week_mask(NEW.`起始周`, NEW.`结束周`, NEW.`单双周`)) != 0
           AND t.`上课时间ID` != NEW.`上课时间ID`;
         
         IF v_冲突数 > 0 THEN
@@ -330,13 +326,7 @@ BEGIN
     JOIN `开课实例表` oi ON t.`开课实例ID` = oi.`开课实例ID`
     WHERE oi.`教室ID` = v_教室ID
       AND t.`时间段ID` = NEW.`时间段ID`
-      AND t.`起始周` <= NEW.`结束周`
-      AND t.`结束周` >= NEW.`起始周`
-      AND (
-          t.`单双周` = '全部' OR 
-          NEW.`单双周` = '全部' OR 
-          t.`单双周` = NEW.`单双周`
-      )
+      AND (t.`周次掩码` & fn_week_mask(NEW.`起始周`, NEW.`结束周`, NEW.`单双周`)) != 0
       AND t.`上课时间ID` != NEW.`上课时间ID`;
     
     IF v_冲突数 > 0 THEN
@@ -346,6 +336,43 @@ BEGIN
 END$$
 DELIMITER ;
 
+-- 触发器7-1: 上课时间变化后重新计算开课实例的时间位图(sp_refresh_time_bitmap 见 03_procedures.sql)
+DROP TRIGGER IF EXISTS `trg_after_schedule_insert_bitmap`;
+DELIMITER $$
+CREATE TRIGGER `trg_after_schedule_insert_bitmap`
+AFTER INSERT ON `上课时间表`
+FOR EACH ROW
+BEGIN
+    -- 批量导入时时间位图随开课实例一起写入，不逐行重算
+    IF NOT (@_bulk_load <=> 1) THEN
+        CALL `sp_refresh_time_bitmap`(NEW.`开课实例ID`);
+    END IF;
+END$$
+DELIMITER ;
+
+DROP TRIGGER IF EXISTS `trg_after_schedule_update_bitmap`;
+DELIMITER $$
+CREATE TRIGGER `trg_after_schedule_update_bitmap`
+AFTER UPDATE ON `上课时间表`
+FOR EACH ROW
+BEGIN
+    CALL `sp_refresh_time_bitmap`(NEW.`开课实例ID`);
+    IF OLD.`开课实例ID` != NEW.`开课实例ID` THEN
+        CALL `sp_refresh_time_bitmap`(OLD.`开课实例ID`);
+    END IF;
+END$$
+DELIMITER ;
+
+DROP TRIGGER IF EXISTS `trg_after_schedule_delete_bitmap`;
+DELIMITER $$
+CREATE TRIGGER `trg_after_schedule_delete_bitmap`
+AFTER DELETE ON `上课时间表`
+FOR EACH ROW
+BEGIN
+    CALL `sp_refresh_time_bitmap`(OLD.`开课实例ID`);
+END$$
+DELIMITER ;
+
 -- 3. 数据一致性维护触发器
 
 -- 触发器8: 防止修改已有选课记录的开课实例
@@ -457,6 +484,27 @@ BEGIN
 END$$
 DELIMITER ;
 
+-- 4. 用户相关触发器
+
+-- 触发器12: 学生调整院系后转移已选人数
+-- 已选人数按学生院系与课程院系是否相同计入对内/对外，院系变化后不转移的话，
+-- 之后退课会从另一类人数中扣减；对应名额已满时触发器11拒绝更新，院系调整失败
+DROP TRIGGER IF EXISTS `trg_after_user_dept_update`;
+DELIMITER $$
+CREATE TRIGGER `trg_after_user_dept_update`
+AFTER UPDATE ON `用户信息表`
+FOR EACH ROW
+BEGIN
+    IF NOT (OLD.`院系ID` <=> NEW.`院系ID`) THEN
+        UPDATE `开课实例表` oi
+        JOIN `选课记录表` sc ON sc.`开课实例ID` = oi.`开课实例ID` AND sc.`学生ID` = NEW.`用户ID`
+        JOIN `课程信息表` c ON oi.`课程ID` = c.`课程ID`
+        SET oi.`已选对内人数` = oi.`已选对内人数` + (c.`院系ID` <=> NEW.`院系ID`) - (c.`院系ID` <=> OLD.`院系ID`),
+            oi.`已选对外人数` = oi.`已选对外人数` + (c.`院系ID` <=> OLD.`院系ID`) - (c.`院系ID` <=> NEW.`院系ID`);
+    END IF;
+END$$
+DELIMITER ;
+
 -- 触发器创建完成
 
 -- 查看所有触发器
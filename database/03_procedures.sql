@@ -470,12 +470,59 @@ BEGIN
 END$$
 DELIMITER ;
 
+-- 存储过程7-1: 上课时间位图
+-- 周次掩码：第 (周次-1) 位表示该周上课（已按单双周过滤），与上课时间表的 `周次掩码` 生成列计算方式一致
+-- 时间位图：BINARY(256) 共 2048 位，第 (时间段ID-1)*20 + (周次-1) 位表示该时间段该周上课，
+--           时间段ID 最大为 102；两个开课实例位图按位与不为 0 即时间冲突
+DROP FUNCTION IF EXISTS `fn_week_mask`;
+DELIMITER $$
+CREATE FUNCTION `fn_week_mask`(
+    p_起始周 INT,
+    p_结束周 INT,
+    p_单双周 ENUM('全部','单周','双周')
+) RETURNS INT UNSIGNED
+DETERMINISTIC NO SQL
+BEGIN
+    -- 349525 = 0x55555（单周），699050 = 0xAAAAA（双周），1048575 = 0xFFFFF（1-20 周全部）
+    RETURN ((1 << p_结束周) - (1 << (p_起始周 - 1)))
+           & (CASE p_单双周 WHEN '单周' THEN 349525 WHEN '双周' THEN 699050 ELSE 1048575 END);
+END$$
+DELIMITER ;
+
+-- 由上课时间表的触发器调用，不控制事务
+DROP PROCEDURE IF EXISTS `sp_refresh_time_bitmap`;
+DELIMITER $$
+CREATE PROCEDURE `sp_refresh_time_bitmap`(
+    IN p_开课实例ID INT
+)
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM `上课时间表`
+        WHERE `开课实例ID` = p_开课实例ID AND `时间段ID` > 102
+    ) THEN
+        SIGNAL SQLSTATE '45000'
+        SET MESSAGE_TEXT = '排课失败: 时间段ID超出时间位图范围(最大102)';
+    END IF;
+    
+    -- 每条上课时间的周次掩码左移到该时间段的位置，再按位或合并
+    UPDATE `开课实例表`
+    SET `时间位图` = (
+        SELECT BIT_OR(UNHEX(LPAD(HEX(`周次掩码`), 512, '0')) << ((`时间段ID` - 1) * 20))
+        FROM `上课时间表`
+        WHERE `开课实例ID` = p_开课实例ID
+    )
+    WHERE `开课实例ID` = p_开课实例ID;
+END$$
+DELIMITER ;
+
 -- 3. 学生选课与退课存储过程
 
 -- 存储过程8: 学生选课
-DROP PROCEDURE IF EXISTS `sp_student_enroll`;
+-- sp_enroll_core 只包含选课逻辑、不控制事务，供 sp_student_enroll 以及
+-- 后端批量选课（同一事务内用 SAVEPOINT 隔离每个学生的选课）复用
+DROP PROCEDURE IF EXISTS `sp_enroll_core`;
 DELIMITER $$
-CREATE PROCEDURE `sp_student_enroll`(
+CREATE PROCEDURE `sp_enroll_core`(
     IN p_学生ID INT,
     IN p_开课实例ID INT,
     OUT p_message VARCHAR(255)
@@ -483,42 +530,96 @@ CREATE PROCEDURE `sp_student_enroll`(
 BEGIN
     DECLARE v_角色 ENUM('学生','教师','教务');
     DECLARE v_学生姓名 VARCHAR(50);
+    DECLARE v_学生院系ID INT;
     DECLARE v_课程名称 VARCHAR(100);
+    DECLARE v_课程院系ID INT;
+    DECLARE v_选课模式 VARCHAR(10);
     
-    -- 移除 EXIT HANDLER，让触发器的具体错误直接返回
-    -- 触发器会返回：名额已满、时间冲突、不在选课窗口等具体信息
-    
-    START TRANSACTION;
+    -- 不吞掉错误：触发器的具体错误（时间冲突、不在选课窗口等）原样返回，
+    -- 只清除会话变量，避免影响连接池中该连接的后续请求
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        SET @_seat_reserved = NULL;
+        RESIGNAL;
+    END;
     
-    -- 检查用户是否存在且为学生
-    SELECT `角色`, `姓名` INTO v_角色, v_学生姓名
+    -- 检查用户是否存在且为学生，并锁定学生行：同一学生的并发选课、换课依次执行，
+    -- 后执行的事务在拿到锁之后才建立一致性读快照，触发器检查时间冲突时能看到前一个事务的选课
+    SELECT `角色`, `姓名`, `院系ID` INTO v_角色, v_学生姓名, v_学生院系ID
     FROM `用户信息表` 
-    WHERE `用户ID` = p_学生ID;
+    WHERE `用户ID` = p_学生ID
+    FOR UPDATE;
+    
+    -- 获取课程名称、开课院系和学期选课模式
+    SELECT c.`课程名称`, c.`院系ID`, s.`选课模式` INTO v_课程名称, v_课程院系ID, v_选课模式
+    FROM `开课实例表` oi
+    JOIN `课程信息表` c ON oi.`课程ID` = c.`课程ID`
+    JOIN `学期信息表` s ON oi.`学期ID` = s.`学期ID`
+    WHERE oi.`开课实例ID` = p_开课实例ID;
     
     IF v_角色 IS NULL THEN
         SET p_message = CONCAT('❌ 选课失败: 学生ID ', p_学生ID, ' 不存在');
-        ROLLBACK;
     ELSEIF v_角色 != '学生' THEN
         SET p_message = CONCAT('❌ 选课失败: 用户"', v_学生姓名, '"的角色是"', v_角色, '"，不是学生');
-        ROLLBACK;
     -- 检查开课实例是否存在
-    ELSEIF NOT EXISTS (SELECT 1 FROM `开课实例表` WHERE `开课实例ID` = p_开课实例ID) THEN
+    ELSEIF v_课程名称 IS NULL THEN
         SET p_message = CONCAT('❌ 选课失败: 开课实例ID ', p_开课实例ID, ' 不存在');
-        ROLLBACK;
+    ELSEIF v_选课模式 = '抽签' THEN
+        SET p_message = '❌ 选课失败: 本学期为抽签选课，请在选课时间内提交选课意向';
     ELSE
-        -- 获取课程名称
-        SELECT c.`课程名称` INTO v_课程名称
-        FROM `开课实例表` oi
-        JOIN `课程信息表` c ON oi.`课程ID` = c.`课程ID`
-        WHERE oi.`开课实例ID` = p_开课实例ID;
-        
-        -- 触发器会自动检查名额、时间冲突、重复选课、选课时间窗口等
-        -- 如果失败，触发器会抛出 SQLSTATE '45000' 并返回具体错误信息
-        INSERT INTO `选课记录表` (`学生ID`, `开课实例ID`, `选课时间`) 
-        VALUES (p_学生ID, p_开课实例ID, NOW());
+        -- 先用带条件的 UPDATE 原子地占用一个名额（行锁 + 条件判断在同一条语句内完成），
+        -- 影响行数为 0 说明名额已满；之后的 INSERT 不再需要读取并更新计数，
+        -- 并发选课既不会超选，也不会因 INSERT 的共享锁升级为排他锁而死锁
+        IF v_学生院系ID = v_课程院系ID THEN
+            UPDATE `开课实例表`
+            SET `已选对内人数` = `已选对内人数` + 1
+            WHERE `开课实例ID` = p_开课实例ID AND `已选对内人数` < `对内名额`;
+        ELSE
+            UPDATE `开课实例表`
+            SET `已选对外人数` = `已选对外人数` + 1
+            WHERE `开课实例ID` = p_开课实例ID AND `已选对外人数` < `对外名额`;
+        END IF;
         
-        SET p_message = CONCAT('✅ 选课成功: ', v_学生姓名, ' 已成功选修《', v_课程名称, '》');
+        IF ROW_COUNT() = 0 THEN
+            SET p_message = IF(v_学生院系ID = v_课程院系ID,
+                               '❌ 选课失败: 本院系名额已满',
+                               '❌ 选课失败: 跨院系名额已满');
+        ELSE
+            -- 通知触发器名额已由本过程占用，跳过名额检查和人数更新；
+            -- 时间冲突、重复选课、选课时间窗口仍由触发器检查
+            SET @_seat_reserved = p_开课实例ID;
+            INSERT INTO `选课记录表` (`学生ID`, `开课实例ID`, `选课时间`) 
+            VALUES (p_学生ID, p_开课实例ID, NOW());
+            SET @_seat_reserved = NULL;
+            
+            SET p_message = CONCAT('✅ 选课成功: ', v_学生姓名, ' 已成功选修《', v_课程名称, '》');
+        END IF;
+    END IF;
+END$$
+DELIMITER ;
+
+DROP PROCEDURE IF EXISTS `sp_student_enroll`;
+DELIMITER $$
+CREATE PROCEDURE `sp_student_enroll`(
+    IN p_学生ID INT,
+    IN p_开课实例ID INT,
+    OUT p_message VARCHAR(255)
+)
+BEGIN
+    -- 回滚后原样返回触发器的具体错误（名额已满、时间冲突、不在选课窗口等）
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        ROLLBACK;
+        RESIGNAL;
+    END;
+    
+    START TRANSACTION;
+    CALL `sp_enroll_core`(p_学生ID, p_开课实例ID, p_message);
+    
+    IF p_message LIKE '✅%' THEN
         COMMIT;
+    ELSE
+        ROLLBACK;
     END IF;
 END$$
 DELIMITER ;
@@ -579,6 +680,336 @@ BEGIN
 END$$
 DELIMITER ;
 
+-- 存储过程9-1: 加入候补队列（只有学生所属类别名额已满时才能候补）
+DROP PROCEDURE IF EXISTS `sp_waitlist_join`;
+DELIMITER $$
+CREATE PROCEDURE `sp_waitlist_join`(
+    IN p_学生ID INT,
+    IN p_开课实例ID INT,
+    OUT p_位次 INT,
+    OUT p_message VARCHAR(255)
+)
+BEGIN
+    DECLARE v_角色 ENUM('学生','教师','教务');
+    DECLARE v_学生院系ID INT;
+    DECLARE v_课程名称 VARCHAR(100);
+    DECLARE v_名额类型 ENUM('对内','对外');
+    DECLARE v_剩余名额 INT;
+    DECLARE v_候补ID BIGINT;
+    
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        ROLLBACK;
+        RESIGNAL;
+    END;
+    
+    SET p_位次 = -1;
+    START TRANSACTION;
+    
+    -- 先锁定学生行（加锁顺序约定），同一学生的重复提交串行执行，之后的读取都在拿到锁之后
+    SELECT `角色`, `院系ID` INTO v_角色, v_学生院系ID
+    FROM `用户信息表`
+    WHERE `用户ID` = p_学生ID
+    FOR UPDATE;
+    
+    SELECT c.`课程名称`,
+           IF(c.`院系ID` = v_学生院系ID, '对内', '对外'),
+           IF(c.`院系ID` = v_学生院系ID,
+              oi.`对内名额` - oi.`已选对内人数`,
+              oi.`对外名额` - oi.`已选对外人数`)
+    INTO v_课程名称, v_名额类型, v_剩余名额
+    FROM `开课实例表` oi
+    JOIN `课程信息表` c ON oi.`课程ID` = c.`课程ID`
+    WHERE oi.`开课实例ID` = p_开课实例ID;
+    
+    -- 已在队列中时返回当前位次（重复提交不会重复排队）
+    SELECT `候补ID` INTO v_候补ID
+    FROM `候补队列表`
+    WHERE `学生ID` = p_学生ID AND `开课实例ID` = p_开课实例ID AND `状态` = '等待';
+    
+    IF v_角色 IS NULL OR v_角色 != '学生' THEN
+        SET p_message = CONCAT('❌ 候补失败: 学生ID ', p_学生ID, ' 不存在或不是学生');
+        ROLLBACK;
+    ELSEIF v_课程名称 IS NULL THEN
+        SET p_message = CONCAT('❌ 候补失败: 开课实例ID ', p_开课实例ID, ' 不存在');
+        ROLLBACK;
+    ELSEIF EXISTS (
+        SELECT 1 FROM `选课记录表`
+        WHERE `学生ID` = p_学生ID AND `开课实例ID` = p_开课实例ID
+    ) THEN
+        SET p_message = CONCAT('❌ 候补失败: 已选修《', v_课程名称, '》');
+        ROLLBACK;
+    ELSEIF v_候补ID IS NULL AND v_剩余名额 > 0 THEN
+        SET p_message = CONCAT('❌ 候补失败: 《', v_课程名称, '》仍有剩余名额，请直接选课');
+        ROLLBACK;
+    ELSE
+        IF v_候补ID IS NULL THEN
+            INSERT INTO `候补队列表` (`学生ID`, `开课实例ID`, `名额类型`)
+            VALUES (p_学生ID, p_开课实例ID, v_名额类型);
+            SET v_候补ID = LAST_INSERT_ID();
+        END IF;
+        
+        SELECT COUNT(*) INTO p_位次
+        FROM `候补队列表`
+        WHERE `开课实例ID` = p_开课实例ID AND `名额类型` = v_名额类型
+          AND `状态` = '等待' AND `候补ID` <= v_候补ID;
+        
+        SET p_message = CONCAT('✅ 已加入《', v_课程名称, '》', v_名额类型, '候补队列，当前第 ', p_位次, ' 位');
+        COMMIT;
+    END IF;
+END$$
+DELIMITER ;
+
+-- 存储过程9-2: 退出候补队列
+DROP PROCEDURE IF EXISTS `sp_waitlist_leave`;
+DELIMITER $$
+CREATE PROCEDURE `sp_waitlist_leave`(
+    IN p_学生ID INT,
+    IN p_开课实例ID INT,
+    OUT p_message VARCHAR(255)
+)
+BEGIN
+    UPDATE `候补队列表`
+    SET `状态` = '已取消', `处理时间` = NOW()
+    WHERE `学生ID` = p_学生ID AND `开课实例ID` = p_开课实例ID AND `状态` = '等待';
+    
+    IF ROW_COUNT() = 0 THEN
+        SET p_message = CONCAT('❌ 取消候补失败: 学生ID ', p_学生ID, ' 不在开课实例 ', p_开课实例ID, ' 的候补队列中');
+    ELSE
+        SET p_message = '✅ 已退出候补队列';
+    END IF;
+END$$
+DELIMITER ;
+
+-- 存储过程9-3: 候补补选
+-- 按加入顺序为等待中的学生选课，每个学生一个事务：
+-- 成功则标记为已录取；对应类别名额已满则继续等待；时间冲突、不在选课时间窗口等失败则标记为已失效。
+-- 每个事务遵守加锁顺序约定：先锁学生行，再锁开课实例行，之后才做一致性读（已选课程、时间冲突检查），
+-- 读到的是拿到锁之后的最新数据，与分发器批次、换课之间不会交叉等待。
+-- 死锁、锁等待超时时只回滚当前学生的事务，之前已录取的学生保留，后端重试时从仍在等待的学生继续。
+-- 由后端候补工作协程在有人退课后调用。
+DROP PROCEDURE IF EXISTS `sp_waitlist_promote`;
+DELIMITER $$
+CREATE PROCEDURE `sp_waitlist_promote`(
+    IN p_开课实例ID INT,
+    OUT p_录取人数 INT
+)
+BEGIN
+    DECLARE v_候补ID BIGINT;
+    DECLARE v_上一候补ID BIGINT DEFAULT 0;
+    DECLARE v_学生ID INT;
+    DECLARE v_名额类型 ENUM('对内','对外');
+    DECLARE v_状态 ENUM('等待','已录取','已失效','已取消');
+    DECLARE v_对内已满 BOOLEAN DEFAULT FALSE;
+    DECLARE v_对外已满 BOOLEAN DEFAULT FALSE;
+    DECLARE v_错误码 INT;
+    DECLARE v_message VARCHAR(255);
+    
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        ROLLBACK;
+        RESIGNAL;
+    END;
+    
+    SET p_录取人数 = 0;
+    
+    promote_loop: LOOP
+        -- 下一个等待中的候补（在学生事务之外读取，START TRANSACTION 会结束这次读取的快照）
+        SET v_候补ID = NULL;
+        SELECT `候补ID`, `学生ID`, `名额类型`
+        INTO v_候补ID, v_学生ID, v_名额类型
+        FROM `候补队列表`
+        WHERE `开课实例ID` = p_开课实例ID AND `状态` = '等待' AND `候补ID` > v_上一候补ID
+          AND ((`名额类型` = '对内' AND NOT v_对内已满) OR (`名额类型` = '对外' AND NOT v_对外已满))
+        ORDER BY `候补ID`
+        LIMIT 1;
+        IF v_候补ID IS NULL THEN
+            LEAVE promote_loop;
+        END IF;
+        SET v_上一候补ID = v_候补ID;
+        
+        START TRANSACTION;
+        
+        -- 加锁顺序：学生行 -> 开课实例行 -> 候补记录
+        SELECT `用户ID` INTO v_学生ID
+        FROM `用户信息表`
+        WHERE `用户ID` = v_学生ID
+        FOR UPDATE;
+        
+        SET v_对内已满 = NULL;
+        SELECT `已选对内人数` >= `对内名额`, `已选对外人数` >= `对外名额`
+        INTO v_对内已满, v_对外已满
+        FROM `开课实例表`
+        WHERE `开课实例ID` = p_开课实例ID
+        FOR UPDATE;
+        
+        IF v_对内已满 IS NULL OR (v_对内已满 AND v_对外已满) THEN
+            COMMIT;
+            LEAVE promote_loop;
+        END IF;
+        
+        SELECT `状态` INTO v_状态
+        FROM `候补队列表`
+        WHERE `候补ID` = v_候补ID
+        FOR UPDATE;
+        
+        IF v_状态 != '等待'
+           OR (v_名额类型 = '对内' AND v_对内已满) OR (v_名额类型 = '对外' AND v_对外已满) THEN
+            -- 等待期间已退出候补，或该类别名额已满（后面同类别的学生不再读取）
+            COMMIT;
+            ITERATE promote_loop;
+        END IF;
+        
+        IF EXISTS (
+            SELECT 1 FROM `选课记录表`
+            WHERE `学生ID` = v_学生ID AND `开课实例ID` = p_开课实例ID
+        ) THEN
+            -- 等待期间学生已自行选上
+            UPDATE `候补队列表`
+            SET `状态` = '已录取', `处理时间` = NOW(), `备注` = '已自行选课'
+            WHERE `候补ID` = v_候补ID;
+            COMMIT;
+            ITERATE promote_loop;
+        END IF;
+        
+        SET v_message = NULL;
+        SAVEPOINT waitlist_item;
+        BEGIN
+            DECLARE EXIT HANDLER FOR SQLEXCEPTION
+            BEGIN
+                GET DIAGNOSTICS CONDITION 1 v_错误码 = MYSQL_ERRNO, v_message = MESSAGE_TEXT;
+                -- 死锁、锁等待超时时当前事务已回滚，交给后端重试
+                IF v_错误码 IN (1213, 1205) THEN
+                    RESIGNAL;
+                END IF;
+                ROLLBACK TO SAVEPOINT waitlist_item;
+            END;
+            CALL `sp_enroll_core`(v_学生ID, p_开课实例ID, v_message);
+        END;
+        
+        IF v_message LIKE '✅%' THEN
+            UPDATE `候补队列表`
+            SET `状态` = '已录取', `处理时间` = NOW(), `备注` = v_message
+            WHERE `候补ID` = v_候补ID;
+            SET p_录取人数 = p_录取人数 + 1;
+        ELSEIF v_message LIKE '%名额已满%' THEN
+            -- 该类别已没有名额，后面同类别的学生继续等待
+            IF v_名额类型 = '对内' THEN
+                SET v_对内已满 = TRUE;
+            ELSE
+                SET v_对外已满 = TRUE;
+            END IF;
+        ELSE
+            UPDATE `候补队列表`
+            SET `状态` = '已失效', `处理时间` = NOW(), `备注` = LEFT(v_message, 255)
+            WHERE `候补ID` = v_候补ID;
+        END IF;
+        COMMIT;
+    END LOOP;
+END$$
+DELIMITER ;
+
+-- 存储过程9-4: 换课（同一事务内退选原课程并选修新课程）
+-- 先删除原选课记录再调用 sp_enroll_core，时间冲突、重复选课检查自然不再包含原课程；
+-- 新课程选课失败时整个事务回滚，原课程（及其名额）保留，不会出现退了课却没选上的情况
+DROP PROCEDURE IF EXISTS `sp_student_swap`;
+DELIMITER $$
+CREATE PROCEDURE `sp_student_swap`(
+    IN p_学生ID INT,
+    IN p_原开课实例ID INT,
+    IN p_新开课实例ID INT,
+    OUT p_message VARCHAR(255)
+)
+BEGIN
+    DECLARE v_锁定数 INT;
+    DECLARE v_原课程名称 VARCHAR(100);
+    DECLARE v_新课程名称 VARCHAR(100);
+    DECLARE v_选课消息 VARCHAR(255);
+    
+    -- 回滚后原样返回触发器的具体错误（时间冲突、不在选课窗口等）
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        ROLLBACK;
+        SET @_seat_reserved = NULL;
+        RESIGNAL;
+    END;
+    
+    IF p_原开课实例ID = p_新开课实例ID THEN
+        SET p_message = '❌ 换课失败: 原课程与新课程相同';
+    ELSE
+        START TRANSACTION;
+        
+        -- 先锁定学生行（与 sp_enroll_core 的加锁顺序一致：学生、开课实例），
+        -- 同一学生的并发选课、换课依次执行
+        SELECT COUNT(*) INTO v_锁定数
+        FROM `用户信息表`
+        WHERE `用户ID` = p_学生ID
+        FOR UPDATE;
+        
+        -- 再锁定两个开课实例（主键 IN 查询按开课实例ID升序加锁），
+        -- 两名学生互换课程时不会因交叉加锁而死锁
+        SELECT COUNT(*) INTO v_锁定数
+        FROM `开课实例表`
+        WHERE `开课实例ID` IN (p_原开课实例ID, p_新开课实例ID)
+        FOR UPDATE;
+        
+        SELECT c.`课程名称` INTO v_原课程名称
+        FROM `选课记录表` sc
+        JOIN `开课实例表` oi ON sc.`开课实例ID` = oi.`开课实例ID`
+        JOIN `课程信息表` c ON oi.`课程ID` = c.`课程ID`
+        WHERE sc.`学生ID` = p_学生ID AND sc.`开课实例ID` = p_原开课实例ID;
+        
+        IF v_原课程名称 IS NULL THEN
+            SET p_message = CONCAT('❌ 换课失败: 未选修开课实例 ', p_原开课实例ID);
+            ROLLBACK;
+        ELSE
+            -- 删除原选课记录，触发器会自动减少原课程的已选人数
+            DELETE FROM `选课记录表`
+            WHERE `学生ID` = p_学生ID AND `开课实例ID` = p_原开课实例ID;
+            
+            CALL `sp_enroll_core`(p_学生ID, p_新开课实例ID, v_选课消息);
+            
+            IF v_选课消息 LIKE '✅%' THEN
+                SELECT c.`课程名称` INTO v_新课程名称
+                FROM `开课实例表` oi
+                JOIN `课程信息表` c ON oi.`课程ID` = c.`课程ID`
+                WHERE oi.`开课实例ID` = p_新开课实例ID;
+                
+                SET p_message = CONCAT('✅ 换课成功: 已退选《', v_原课程名称, '》并选修《', v_新课程名称, '》');
+                COMMIT;
+            ELSE
+                SET p_message = CONCAT(REPLACE(v_选课消息, '选课失败', '换课失败'), '，已保留原课程');
+                ROLLBACK;
+            END IF;
+        END IF;
+    END IF;
+END$$
+DELIMITER ;
+
+-- 存储过程9-5: 按选课记录重算某学期各开课实例的已选人数
+-- 抽签分配批量写入选课记录时触发器不逐行计数，写入后调用本过程一次性重算；也可用于修复计数偏差
+DROP PROCEDURE IF EXISTS `sp_refresh_enroll_counts`;
+DELIMITER $$
+CREATE PROCEDURE `sp_refresh_enroll_counts`(
+    IN p_学期ID INT
+)
+BEGIN
+    UPDATE `开课实例表` oi
+    JOIN `课程信息表` c ON oi.`课程ID` = c.`课程ID`
+    SET oi.`已选对内人数` = (
+            SELECT COUNT(*) FROM `选课记录表` sc
+            JOIN `用户信息表` u ON sc.`学生ID` = u.`用户ID`
+            WHERE sc.`开课实例ID` = oi.`开课实例ID` AND u.`院系ID` = c.`院系ID`
+        ),
+        oi.`已选对外人数` = (
+            SELECT COUNT(*) FROM `选课记录表` sc
+            JOIN `用户信息表` u ON sc.`学生ID` = u.`用户ID`
+            WHERE sc.`开课实例ID` = oi.`开课实例ID` AND NOT (u.`院系ID` <=> c.`院系ID`)
+        )
+    WHERE oi.`学期ID` = p_学期ID;
+END$$
+DELIMITER ;
+
 -- 4. 查询存储过程
 
 -- 存储过程10: 查询学生课表(按学期)
@@ -660,12 +1091,19 @@ CREATE PROCEDURE `sp_get_available_courses`(
 BEGIN
     DECLARE v_学生院系ID INT;
     DECLARE v_学生姓名 VARCHAR(50);
+    DECLARE v_已选位图 VARBINARY(256);
     
     -- 获取学生信息
     SELECT `院系ID`, `姓名` INTO v_学生院系ID, v_学生姓名
     FROM `用户信息表` 
     WHERE `用户ID` = p_学生ID AND `角色` = '学生';
     
+    -- 学生已选课程占用的上课时间
+    SELECT BIT_OR(oi.`时间位图`) INTO v_已选位图
+    FROM `选课记录表` sc
+    JOIN `开课实例表` oi ON sc.`开课实例ID` = oi.`开课实例ID`
+    WHERE sc.`学生ID` = p_学生ID;
+    
     -- 检查学生是否存在
     IF v_学生院系ID IS NULL THEN
         -- 返回空结果集，带错误提示
@@ -718,25 +1156,9 @@ BEGIN
               SELECT 1 FROM `选课记录表` 
               WHERE `学生ID` = p_学生ID AND `开课实例ID` = oi.`开课实例ID`
           )
-          -- 【关键修复】排除时间冲突的课程（不包括同一门课）
-          AND NOT EXISTS (
-              SELECT 1
-              FROM `选课记录表` sc
-              JOIN `上课时间表` t1 ON sc.`开课实例ID` = t1.`开课实例ID`
-              JOIN `上课时间表` t2 ON t2.`开课实例ID` = oi.`开课实例ID`
-              WHERE sc.`学生ID` = p_学生ID
-                AND sc.`开课实例ID` != oi.`开课实例ID`  -- 排除同一门课
-                AND t1.`时间段ID` = t2.`时间段ID`
-                -- 周次范围重叠检查
-                AND t1.`起始周` <= t2.`结束周`
-                AND t1.`结束周` >= t2.`起始周`
-                -- 单双周冲突检查
-                AND (
-                    t1.`单双周` = '全部' OR 
-                    t2.`单双周` = '全部' OR 
-                    t1.`单双周` = t2.`单双周`
-                )
-          )
+          -- 排除时间冲突的课程：课程时间位图与学生已选课程的占用位图按位与为 0
+          AND (v_已选位图 IS NULL OR oi.`时间位图` IS NULL
+               OR BIT_COUNT(oi.`时间位图` & v_已选位图) = 0)
         ORDER BY c.`课程ID`;
     END IF;
 END$$